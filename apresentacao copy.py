@@ -1,257 +1,448 @@
 import streamlit as st
 import pandas as pd
-import mysql.connector
-from sqlalchemy import create_engine
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import altair as alt
 import datetime
-import numpy as np
+import functools
+import threading
+
+from prazos import (
+    COLS_PREVISOES, COLS_DATAS_ORCAMENTO,
+    calcular_medias_marcos, datas_limite_obra,
+    preparar_orcamentos, normalizar_orcamentos, orcamentos_para_editor, preencher_lacunas_cumsum, filtrar_janela,
+    aplicar_orcamentos, aplicar_previsoes_editadas, logica_corte, calcular_tabela_geral,
+    datas_por_medias, datas_por_referencia, projetar_por_familia, perfis_da_obra, perfil_medio,
+    duracoes_marcos, simular_cronograma, ETAPAS_PLANEJADOR, PERCENTIS_SIMULACAO, CENARIOS_PADRAO,
+    CacheLRU, impressao_digital, dados_grafico,
+)
+from prazos.banco import (
+    url_banco, criar_engine, carregar_em_paralelo, ler_snapshot, ler_marcos, novo_estado_semanal, atualizar_semanal,
+    ler_catalogo_obras, ler_semanal_janela, ler_semanal, ler_gerais, ler_familias, TABELA_PLANNIX,
+    ler_dados_usuario as ler_tabelas_usuario, garantir_esquema_usuario as criar_ou_migrar_esquema,
+    salvar_registros_usuario,
+)
+from prazos.rollup import ler_semanal_rollup, ler_gerais_rollup, ler_familias_rollup
+from prazos.disco import novo_conjunto, obter_conjunto, iniciar_agendador
+from prazos.plantas import (
+    ler_config_plantas, nova_planta, ler_todas, situacao_plantas, obras_da_planta, herdar_nomes_sem_planta,
+    juntar_snapshot, juntar_semanal, juntar_gerais, juntar_familias, juntar_catalogo, juntar_marcos,
+)
+from prazos.memoria import compactar_frame, compactar_frames, relatorio_memoria
+from prazos.diagnostico import (
+    Metricas, novo_registro, definir_registro, registro_proprio, medir_etapa, instrumentar_engine,
+    instrumentar_carregador, chamar_com_cache, registrar_payload, registrar_log, configurar_log,
+)
 
 # ========================================================
 #          CONFIGURAÇÕES DO BANCO DE DADOS
 # ========================================================
-DB_CONFIG = {
-    "host": st.secrets["db_host"],
-    "user": st.secrets["db_user"],
-    "password": st.secrets["db_password"],
-    "database": st.secrets["db_name"],
-    "port": 3306
-}
+DB_URL = url_banco(st.secrets)
+
+# Carga semanal: "completa" (snapshot inteiro a cada TTL), "incremental" (só semanas recentes/alteradas)
+# "janela" (filtros de obra e datas aplicados no banco; só vem o que a visão usa) ou "rollup"
+# (lê as tabelas plannix_semanal/plannix_totais/plannix_familias mantidas pelo job `python -m prazos.rollup`)
+MODO_CARGA = st.secrets.get("modo_carga", "completa")
+# Coluna de data/hora de alteração da peça no plannix (opcional, usada como watermark)
+COLUNA_ALTERACAO = st.secrets.get("plannix_coluna_alteracao")
+# Mesmo no modo incremental, recarrega tudo de tempos em tempos (pega exclusões e datas movidas para trás)
+INTERVALO_CARGA_COMPLETA = pd.Timedelta(hours=st.secrets.get("horas_carga_completa", 6))
+# Snapshot em disco (Parquet) para a partida a frio; "" desliga
+PASTA_SNAPSHOT = st.secrets.get("pasta_snapshot", ".snapshot")
+SNAPSHOT_MMAP = st.secrets.get("snapshot_mmap", True)
+# Cadência da atualização em segundo plano dos dados compartilhados
+INTERVALO_ATUALIZACAO = pd.Timedelta(minutes=st.secrets.get("minutos_atualizacao", 5))
+# "compacto": Obra/Família categóricas e volumes float32 nos frames carregados e derivados
+MODO_MEMORIA = st.secrets.get("modo_memoria", "normal")
+# Painel de diagnóstico (também abre com ?diagnostico=1) e arquivo .prom para o node_exporter; "" desliga
+DIAGNOSTICO = st.secrets.get("diagnostico", False)
+ARQUIVO_METRICAS = st.secrets.get("arquivo_metricas", "")
+# Linha JSON por rerun no logger "prazos.diagnostico": "INFO" emite, "WARNING" silencia; arquivo "" = stderr
+NIVEL_LOG_DIAGNOSTICO = st.secrets.get("nivel_log_diagnostico", "INFO")
+ARQUIVO_LOG_DIAGNOSTICO = st.secrets.get("arquivo_log_diagnostico", "")
+# Várias plantas ([[plantas]], ver prazos/plantas.py): cada carga lê todas em paralelo e junta;
+# sem a seção, só o plannix do banco do app
+PLANTAS = ler_config_plantas(st.secrets)
+# Segundos que cada planta tem para responder; depois disso entra com a última leitura boa dela
+PRAZO_PLANTA = st.secrets.get("segundos_planta", 20)
+# Espera máxima por uma planta sem leitura anterior; também é o timeout de socket das engines das plantas
+LIMITE_PLANTA = st.secrets.get("segundos_limite_planta", 120)
+# O rollup é mantido pelo job num banco só: com várias plantas a carga volta a ser a completa
+ROLLUP_IGNORADO = bool(PLANTAS) and MODO_CARGA == "rollup"
+if ROLLUP_IGNORADO:
+    MODO_CARGA = "completa"
+
+@st.cache_resource
+def metricas_processo():
+    # Agregados de todas as sessões: etapas, leituras do banco, caches e payloads
+    return Metricas()
+
+@st.cache_resource
+def preparar_log_diagnostico():
+    # Uma vez por processo: o logger não tem handler nem nível até aqui
+    configurar_log(NIVEL_LOG_DIAGNOSTICO, ARQUIVO_LOG_DIAGNOSTICO)
+    return True
+
+@st.cache_resource
+def obter_engine():
+    # Uma engine com pool por processo, usada por todos os carregadores e pelo salvamento
+    return instrumentar_engine(criar_engine(DB_URL), metricas_processo())
 
-DB_URL = f"mysql+mysqlconnector://{st.secrets['db_user']}:{st.secrets['db_password']}@{st.secrets['db_host']}:3306/{st.secrets['db_name']}"
+# ========================================================
+#     CONJUNTOS COMPARTILHADOS (STALE-WHILE-REVALIDATE)
+# ========================================================
+# Cada conjunto é lido do banco uma vez (ou do snapshot em disco, na partida a
+# frio) e depois relido por um agendador em segundo plano a cada
+# INTERVALO_ATUALIZACAO. Quem lê recebe sempre a última versão boa, sem esperar o
+# banco; se o MySQL falhar, os dados ficam só mais velhos. A versão
+# (attrs['versao']) entra na chave dos frames derivados.
+@st.cache_resource
+def conjuntos_dados():
+    # Compartilhados por todas as sessões do processo
+    conjuntos = {nome: novo_conjunto(nome) for nome in (
+        'plannix', 'usuario', 'incremental', 'catalogo', 'rollup', 'marcos', 'gerais', 'familias', 'semanal',
+    )}
+    iniciar_agendador(list(conjuntos.values()), INTERVALO_ATUALIZACAO)
+    return conjuntos
+
+def carregar_conjunto(nome, ler_banco, ttl=INTERVALO_ATUALIZACAO):
+    if MODO_MEMORIA == "compacto" and nome != 'usuario':
+        ler_banco = lambda ler=ler_banco: compactar_frames(ler())
+    metricas = metricas_processo()
+    return chamar_com_cache(
+        metricas, nome, obter_conjunto,
+        conjuntos_dados()[nome], instrumentar_carregador(metricas, nome, ler_banco),
+        pasta=PASTA_SNAPSHOT, ttl=ttl, memory_map=SNAPSHOT_MMAP,
+    )
 
 # ========================================================
-#     FUNÇÃO PARA LER DADOS (POR SEMANA)
+#     VÁRIAS PLANTAS (LEITURA EM PARALELO + RESERVA POR PLANTA)
 # ========================================================
-@st.cache_data(ttl=300)
-def carregar_dados():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = """
-        WITH AllData AS (
-            SELECT 
-                nomeObra AS Obra, 
-                CAST(DATE_SUB(data_Projeto, INTERVAL WEEKDAY(data_Projeto) DAY) AS DATE) AS Semana_Inicio, 
-                volumeProjetado AS Volume_Projetado, 0 AS Volume_Fabricado, 0 AS Volume_Montado
-            FROM `plannix-db`.`plannix` WHERE data_Projeto IS NOT NULL AND volumeProjetado > 0
-            UNION ALL
-            SELECT 
-                nomeObra AS Obra, 
-                CAST(DATE_SUB(data_Acabamento, INTERVAL WEEKDAY(data_Acabamento) DAY) AS DATE) AS Semana_Inicio, 
-                0 AS Volume_Projetado, volumeFabricado AS Volume_Fabricado, 0 AS Volume_Montado
-            FROM `plannix-db`.`plannix` WHERE data_Acabamento IS NOT NULL AND volumeFabricado > 0
-            UNION ALL
-            SELECT 
-                nomeObra AS Obra, 
-                CAST(DATE_SUB(dataMontada, INTERVAL WEEKDAY(dataMontada) DAY) AS DATE) AS Semana_Inicio, 
-                0 AS Volume_Projetado, 0 AS Volume_Fabricado, volumeMontado AS Volume_Montado
-            FROM `plannix-db`.`plannix` WHERE dataMontada IS NOT NULL AND volumeMontado > 0
+@st.cache_resource
+def estados_plantas():
+    # Uma engine por servidor (as plantas no servidor do app usam a dele) e as reservas de cada planta
+    engines = {DB_URL: obter_engine()}
+    for config in PLANTAS:
+        if config['url'] not in engines:
+            engine = criar_engine(config['url'], connect_args={'connection_timeout': LIMITE_PLANTA})
+            engines[config['url']] = instrumentar_engine(engine, metricas_processo())
+    return [nova_planta(config, engines[config['url']]) for config in PLANTAS]
+
+def ler_plantas(grupo, ler, juntar, pasta=PASTA_SNAPSHOT, plantas=None):
+    # ler(planta) -> {nome: frame} em todas as plantas (ou só nas de `plantas`); juntar consolida nos frames de uma fonte só
+    if MODO_MEMORIA == "compacto":
+        ler = lambda planta, ler_planta=ler: compactar_frames(ler_planta(planta))
+    plantas = estados_plantas() if plantas is None else plantas
+    return juntar(ler_todas(plantas, grupo, ler, PRAZO_PLANTA, pasta or None, LIMITE_PLANTA))
+
+def carregar_agregado(nome, ler, juntar):
+    # Conjunto de uma consulta agregada no banco, ler(conn, tabela) -> frame (em todas as plantas, se houver)
+    def ler_engine(engine, tabela=TABELA_PLANNIX):
+        with engine.connect() as conn:
+            return {nome: ler(conn, tabela)}
+
+    if PLANTAS:
+        ler_banco = lambda: {nome: ler_plantas(
+            nome, lambda planta: ler_engine(planta['engine'], planta['tabela']), juntar,
+        )}
+    else:
+        ler_banco = lambda: ler_engine(obter_engine())
+    return carregar_conjunto(nome, ler_banco)[nome]
+
+# ========================================================
+#     SNAPSHOT ÚNICO DA TABELA PLANNIX (UMA SÓ LEITURA)
+# ========================================================
+def carregar_snapshot():
+    if PLANTAS:
+        ler_banco = lambda: ler_plantas(
+            'plannix', lambda planta: ler_snapshot(planta['engine'], planta['tabela']), juntar_snapshot,
         )
-        SELECT
-            Obra, Semana_Inicio AS Semana, 
-            SUM(Volume_Projetado) AS Volume_Projetado,
-            SUM(Volume_Fabricado) AS Volume_Fabricado,
-            SUM(Volume_Montado) AS Volume_Montado
-        FROM AllData
-        GROUP BY Obra, Semana_Inicio ORDER BY Obra, Semana_Inicio;
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
+    else:
+        engine = obter_engine()
+        ler_banco = lambda: ler_snapshot(engine)
+    return carregar_conjunto('plannix', ler_banco)
 
-    # --- LÓGICA DE UNIFICAÇÃO ---
-    df.loc[df['Obra'] == 'MALL SILVIO SILVEIRA - LOJAS', 'Obra'] = 'MALL SILVIO SILVEIRA - POA'
-    df = df.groupby(['Obra', 'Semana'], as_index=False)[['Volume_Projetado', 'Volume_Fabricado', 'Volume_Montado']].sum()
+# ========================================================
+#     ATUALIZAÇÃO INCREMENTAL DO SEMANAL (WATERMARK)
+# ========================================================
+@st.cache_resource
+def estado_semanal_incremental():
+    # Compartilhado entre sessões: guarda o último df_base e o watermark (um por planta)
+    return {planta: {**novo_estado_semanal(), 'lock': threading.Lock()} for planta in [p['nome'] for p in PLANTAS] or [None]}
+
+def carregar_dados_incremental():
+    estados = estado_semanal_incremental()
+
+    def atualizar(engine, estado, tabela=TABELA_PLANNIX):
+        with estado['lock'], engine.connect() as conn:
+            return {'semanal': atualizar_semanal(
+                estado, conn, pd.Timestamp.now(), COLUNA_ALTERACAO, INTERVALO_CARGA_COMPLETA, tabela,
+            )}
+
+    if PLANTAS:
+        ler_banco = lambda: {'semanal': ler_plantas(
+            'incremental', lambda planta: atualizar(planta['engine'], estados[planta['nome']], planta['tabela']), juntar_semanal,
+        )}
+    else:
+        ler_banco = lambda: atualizar(obter_engine(), estados[None])
+    return carregar_conjunto('incremental', ler_banco)['semanal']
+
+# ========================================================
+#     CARGA FILTRADA NO BANCO (MODO "JANELA")
+# ========================================================
+def carregar_catalogo_obras():
+    return carregar_agregado('catalogo', ler_catalogo_obras, juntar_catalogo)
+
+# Depende das obras e datas escolhidas: fica no cache por filtro, não no agendador
+@st.cache_data(ttl=300, max_entries=50)
+def carregar_dados_janela(obras, data_inicio, data_fim):
+    def ler(engine, obras, tabela=TABELA_PLANNIX):
+        with engine.connect() as conn:
+            return ler_semanal_janela(conn, list(obras), data_inicio, data_fim, tabela)
+
+    def ler_banco():
+        if not PLANTAS:
+            return ler(obter_engine(), obras)
+        # Cada planta lê só as suas obras (pelo nome no plannix dela); reserva só em memória: o grupo muda com os filtros
+        grupo = f"janela-{impressao_digital(obras, data_inicio, data_fim)}"
+        return ler_plantas(
+            grupo, lambda planta: {'semanal': ler(planta['engine'], obras_da_planta(planta, obras), planta['tabela'])},
+            juntar_semanal, pasta="", plantas=[planta for planta in estados_plantas() if obras_da_planta(planta, obras)],
+        )
+    df = instrumentar_carregador(metricas_processo(), 'janela', ler_banco)()
+    if MODO_MEMORIA == "compacto":
+        df = compactar_frame(df)
+    df.attrs['versao'] = datetime.datetime.now().isoformat()
     return df
 
+# ========================================================
+#     ROLLUP NO BANCO (MODO "ROLLUP")
+# ========================================================
+def carregar_rollup():
+    engine = obter_engine()
+
+    def ler_banco():
+        with engine.connect() as conn:
+            return {
+                'semanal': ler_semanal_rollup(conn), 'gerais': ler_gerais_rollup(conn),
+                'familias': ler_familias_rollup(conn),
+            }
+    return carregar_conjunto('rollup', ler_banco)
+
+# ========================================================
+#     FUNÇÃO PARA LER DADOS (POR SEMANA)
+# ========================================================
+CONJUNTO_SEMANAL = {"incremental": "incremental", "rollup": "rollup", "janela": "catalogo"}.get(MODO_CARGA, "plannix")
+
+def carregar_dados():
+    if MODO_CARGA == "incremental":
+        return carregar_dados_incremental()
+    if MODO_CARGA == "rollup":
+        return carregar_rollup()['semanal']
+    return carregar_snapshot()['semanal']
+
 # ========================================================
 # FUNÇÃO PARA LER DADOS (TOTAIS POR OBRA)
 # ========================================================
-@st.cache_data(ttl=300)
 def carregar_dados_gerais():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = """
-        SELECT
-            nomeObra AS Obra,
-            SUM(volumeProjetado) AS Projetado,
-            SUM(volumeFabricado) AS Fabricado,
-            SUM(volumeAcabado) AS Acabado,
-            SUM(volumeExpedido) AS Expedido,
-            SUM(volumeMontado) AS Montado,
-            AVG(peso_frouxo_por_volume) AS "Taxa de Aço" 
-        FROM `plannix-db`.`plannix`
-        GROUP BY nomeObra
-        ORDER BY nomeObra;
-    """
-    df_geral = pd.read_sql(query, conn)
-    conn.close()
-
-    # --- LÓGICA DE UNIFICAÇÃO ---
-    df_geral.loc[df_geral['Obra'] == 'MALL SILVIO SILVEIRA - LOJAS', 'Obra'] = 'MALL SILVIO SILVEIRA - POA'
-    df_geral = df_geral.groupby('Obra', as_index=False).agg({
-        'Projetado': 'sum', 'Fabricado': 'sum', 'Acabado': 'sum',
-        'Expedido': 'sum', 'Montado': 'sum', 'Taxa de Aço': 'mean' 
-    })
-    return df_geral
+    if MODO_CARGA == "rollup":
+        return carregar_rollup()['gerais']
+    if CONJUNTO_SEMANAL == "plannix":
+        return carregar_snapshot()['gerais']
+    # Fora da carga completa o snapshot (uma linha por peça) não é lido: totais agregados no banco
+    return carregar_agregado('gerais', ler_gerais, juntar_gerais)
 
 # ========================================================
 # FUNÇÃO PARA LER DADOS (POR FAMÍLIA)
 # ========================================================
-@st.cache_data(ttl=300)
 def carregar_dados_familias():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = """
-        SELECT nomeObra AS Obra, familia AS Familia, COUNT(nomePeca) AS unidade, SUM(volumeReal) AS Volume
-        FROM `plannix-db`.`plannix`
-        WHERE familia IS NOT NULL AND nomePeca IS NOT NULL AND volumeReal IS NOT NULL
-        GROUP BY nomeObra, familia ORDER BY Obra, Familia;
-    """
-    df_familias = pd.read_sql(query, conn)
-    conn.close()
-    
-    # --- LÓGICA DE UNIFICAÇÃO ---
-    df_familias.loc[df_familias['Obra'] == 'MALL SILVIO SILVEIRA - LOJAS', 'Obra'] = 'MALL SILVIO SILVEIRA - POA'
-    df_familias = df_familias.groupby(['Obra', 'Familia'], as_index=False).sum()
-    return df_familias
+    if MODO_CARGA == "rollup":
+        return carregar_rollup()['familias']
+    if CONJUNTO_SEMANAL == "plannix":
+        return carregar_snapshot()['familias']
+    return carregar_agregado('familias', ler_familias, juntar_familias)
 
 # ========================================================
 # FUNÇÕES RESTAURADAS PARA O PLANEJADOR
 # ========================================================
-@st.cache_data(ttl=300)
+def carregar_marcos():
+    # Início/fim das etapas de todas as obras, em memória: trocar a obra de referência não vai ao banco
+    if CONJUNTO_SEMANAL == "plannix":
+        return carregar_snapshot()['marcos']  # já vem no snapshot completo
+    return carregar_agregado('marcos', ler_marcos, juntar_marcos)
+
 def carregar_datas_limite_etapas(obra_nome):
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = f"""
-        SELECT 
-            MIN(data_Projeto) as ini_proj, MAX(data_Projeto) as fim_proj,
-            MIN(data_Acabamento) as ini_fab, MAX(data_Acabamento) as fim_fab,
-            MIN(dataMontada) as ini_mont, MAX(dataMontada) as fim_mont
-        FROM `plannix-db`.`plannix`
-        WHERE nomeObra = '{obra_nome}'
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    return datas_limite_obra(carregar_marcos(), obra_nome)
 
-@st.cache_data(ttl=300)
 def calcular_medias_cronograma():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    query = """
-        SELECT
-            AVG(DATEDIFF(fim_p, ini_p)) as dias_duracao_proj,
-            AVG(DATEDIFF(ini_f, ini_p)) as dias_lag_fab, 
-            AVG(DATEDIFF(fim_f, ini_f)) as dias_duracao_fab,
-            AVG(DATEDIFF(ini_m, ini_p)) as dias_lag_mont, 
-            AVG(DATEDIFF(fim_m, ini_m)) as dias_duracao_mont
-        FROM (
-            SELECT
-                nomeObra,
-                MIN(data_Projeto) as ini_p, MAX(data_Projeto) as fim_p,
-                MIN(data_Acabamento) as ini_f, MAX(data_Acabamento) as fim_f,
-                MIN(dataMontada) as ini_m, MAX(dataMontada) as fim_m
-            FROM `plannix-db`.`plannix`
-            GROUP BY nomeObra
-            HAVING ini_p IS NOT NULL AND ini_f IS NOT NULL AND ini_m IS NOT NULL
-        ) as sub
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
-
-# ========================================================
-# FUNÇÃO PARA CARREGAR DADOS SALVOS DO USUÁRIO
-# ========================================================
-def carregar_dados_usuario():
-    engine = create_engine(DB_URL)
-    df_orcamentos_salvos = pd.DataFrame(columns=["Obra", "Orcamento", "Orcamento Lajes"])
-    df_previsoes_salvas = pd.DataFrame(columns=["Obra", "Semana", "Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"])
+    return calcular_medias_marcos(carregar_marcos())
 
-    try:
-        df_orcamentos_salvos = pd.read_sql("SELECT * FROM orcamentos_usuario", con=engine)
-    except:
-        # Tabela ainda não existe, será criada depois
-        pass
-    
-    try:
-        df_previsoes_salvas = pd.read_sql("SELECT * FROM previsoes_usuario", con=engine)
-        if not df_previsoes_salvas.empty:
-            df_previsoes_salvas['Semana'] = pd.to_datetime(df_previsoes_salvas['Semana'])
-    except:
-        pass
+def carregar_duracoes_historicas():
+    return duracoes_marcos(carregar_marcos())
 
-    engine.dispose()
-    return df_orcamentos_salvos, df_previsoes_salvas
+def carregar_semanal_completo():
+    # Curvas reais para os perfis do planejador; no modo "janela" o semanal carregado é só o filtrado,
+    # então vem o semanal inteiro já agregado por obra x semana no banco (não o snapshot por peça)
+    if MODO_CARGA != "janela":
+        return carregar_dados()
+    return carregar_agregado('semanal', lambda conn, tabela: ler_semanal(conn, tabela=tabela), juntar_semanal)
 
 # ========================================================
-# FUNÇÃO HELPER PARA FORMATAR A SEMANA
+# FUNÇÃO PARA CARREGAR DADOS SALVOS DO USUÁRIO
 # ========================================================
-def formatar_semana(date):
-    if pd.isna(date): return None
-    if isinstance(date, str):
-        try: date = pd.to_datetime(date)
-        except: return date
-    start_str = date.strftime('%d/%m')
-    end_str = (date + pd.Timedelta(days=6)).strftime('%d/%m')
-    return f"{start_str} á {end_str} ({date.strftime('%Y')})"
+def invalidar_dados_usuario():
+    # A próxima leitura (desta ou de outra sessão) vai ao banco e ganha versão nova
+    conjunto = conjuntos_dados()['usuario']
+    with conjunto['lock']:
+        conjunto['vencido'] = True
+
+def ler_dados_usuario(engine):
+    df_orcamentos_salvos, df_previsoes_salvas = ler_tabelas_usuario(engine)
+    if PLANTAS:
+        # Com várias plantas as obras são "Planta · Obra"; o que foi salvo pelo nome sem planta continua valendo
+        df_orcamentos_salvos = herdar_nomes_sem_planta(PLANTAS, df_orcamentos_salvos, ['Obra'])
+        df_previsoes_salvas = herdar_nomes_sem_planta(PLANTAS, df_previsoes_salvas, ['Obra', 'Semana'])
+    return {'orcamentos': df_orcamentos_salvos, 'previsoes': df_previsoes_salvas}
+
+def carregar_dados_usuario():
+    # Reruns e outras sessões reaproveitam a leitura até o próximo salvamento
+    # Sem ttl: fora do agendador, só relê depois de um salvamento (vencido)
+    engine = obter_engine()
+    frames = carregar_conjunto('usuario', lambda: ler_dados_usuario(engine), ttl=None)
+    return frames['orcamentos'], frames['previsoes']
+
+@st.cache_resource
+def garantir_esquema_usuario(_engine):
+    # Roda uma vez por processo: cria as tabelas ou migra as antigas sem chave primária
+    criar_ou_migrar_esquema(_engine)
+    return True
 
 # ========================================================
 # FUNÇÃO PARA SALVAR DADOS NO MYSQL
 # ========================================================
 def salvar_dados_usuario(df_previsoes, df_orcamentos):
-    engine = create_engine(DB_URL)
+    """Grava (upsert) só as linhas recebidas; o resto das tabelas fica intacto."""
     try:
-        df_previsoes_limpo = df_previsoes.dropna(subset=['Obra', 'Semana'])
-        df_save_previsoes = df_previsoes_limpo[[
-            "Obra", "Semana", "Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"
-        ]].copy()
-        df_save_previsoes['Semana'] = pd.to_datetime(df_save_previsoes['Semana']).dt.strftime('%Y-%m-%d')
-        
-        df_save_previsoes.to_sql('previsoes_usuario', con=engine, if_exists='replace', index=False)
-        df_orcamentos.to_sql('orcamentos_usuario', con=engine, if_exists='replace', index=False)
+        engine = obter_engine()
+        garantir_esquema_usuario(engine)
+        salvar_registros_usuario(engine, df_previsoes, df_orcamentos)
+        invalidar_dados_usuario()
         st.success("✅ **Alterações salvas com sucesso no banco de dados!**")
+        return True
     except Exception as e:
         st.error(f"❌ Erro ao salvar dados no banco de dados: {e}")
-    finally:
-        engine.dispose()
-        
+        return False
+
+def orcamentos_alterados():
+    # Obras editadas no Cadastro desde o último salvamento
+    alteradas = st.session_state.get('orcamentos_alterados', set())
+    df_orc = st.session_state['orcamentos']
+    return df_orc[df_orc['Obra'].isin(alteradas)]
+
+def previsoes_alteradas():
+    # Linhas editadas na aba Tabelas desde o último salvamento (guardadas pelo callback do editor);
+    # colunas não editadas ficam vazias e o salvamento não as sobrescreve
+    edicoes = st.session_state.get('previsoes_editadas', {})
+    return pd.DataFrame(
+        [{'Obra': obra, 'Semana': semana, **valores} for (obra, semana), valores in edicoes.items()],
+        columns=["Obra", "Semana"] + COLS_PREVISOES
+    )
+
+def limpar_alteracoes_salvas():
+    st.session_state['orcamentos_alterados'] = set()
+    st.session_state['previsoes_editadas'] = {}
+    st.session_state['versao_edicoes'] = st.session_state.get('versao_edicoes', 0) + 1
+
 # ========================================================
 #                INTERFACE STREAMLIT
 # ========================================================
 st.set_page_config(page_title="Reunião de Prazos", layout="wide")
 st.title("📊 Reunião de Prazos")
+if ROLLUP_IGNORADO:
+    st.warning("O modo_carga \"rollup\" não atende várias plantas (o job mantém um banco só); usando a carga completa.")
+
+# Registro deste rerun (etapas, leituras, caches, payloads); vai para o painel e para o log
+preparar_log_diagnostico()
+registro_rerun = novo_registro()
+definir_registro(registro_rerun)
+diagnostico_ativo = DIAGNOSTICO or st.query_params.get("diagnostico") == "1"
+
+def medir_payload(widget, objeto):
+    # Serializar custa: só mede com o diagnóstico ligado
+    if diagnostico_ativo:
+        registrar_payload(metricas_processo(), widget, objeto)
+
+def exportar_metricas(avisar=None):
+    if ARQUIVO_METRICAS:
+        try:
+            metricas_processo().gravar(ARQUIVO_METRICAS)
+        except OSError as e:
+            (avisar or st.sidebar.warning)(f"Não foi possível gravar as métricas: {e}")
+
+def medir_fragmento(nome):
+    """Para as seções (@st.fragment): o rerun só do fragmento ganha registro próprio, logado no fim.
+
+    No rerun completo a seção entra no registro do script, que vai para o painel;
+    o último rerun de fragmento fica na sessão e aparece no painel no rerun seguinte.
+    """
+    def decorar(secao):
+        @functools.wraps(secao)
+        def medida(*args, **kwargs):
+            contexto = get_script_run_ctx()
+            if contexto is None or not contexto.fragment_ids_this_run:
+                return secao(*args, **kwargs)
+
+            def ao_terminar(registro):
+                registro['segundos'] = pd.Timestamp.now().timestamp() - registro['inicio']
+                st.session_state['ultimo_registro_fragmento'] = registro
+                registrar_log(registro)
+                exportar_metricas(st.warning)  # dentro do fragmento não dá para escrever na barra lateral
+
+            with registro_proprio(ao_terminar) as registro:
+                registro['fragmento'] = nome
+                with medir_etapa(metricas_processo(), f"seção {nome} (fragmento)"):
+                    return secao(*args, **kwargs)
+        return medida
+    return decorar
 
 # --- 1. CARREGAMENTO INICIAL ---
+# Consultas independentes em paralelo; as threads herdam o contexto do script
+# para que os caches do Streamlit funcionem nelas
+contexto_script = get_script_run_ctx()
+
+def preparar_thread_carga():
+    add_script_run_ctx(threading.current_thread(), contexto_script)
+    definir_registro(registro_rerun)
+
 try:
-    df_base = carregar_dados()
-    df_orcamentos_salvos, df_previsoes_salvas = carregar_dados_usuario()
+    # No modo "janela" só o catálogo (obras e primeira/última semana) vem agora;
+    # o semanal chega depois dos filtros, já recortado no banco
+    carga_base = carregar_catalogo_obras if MODO_CARGA == "janela" else carregar_dados
+    with medir_etapa(metricas_processo(), "carga inicial"):
+        carga = carregar_em_paralelo(
+            {'base': carga_base, 'usuario': carregar_dados_usuario}, inicializador=preparar_thread_carga,
+        )
+    df_orcamentos_salvos = carga['usuario'][0]
 except Exception as e:
     st.error(f"Erro fatal ao carregar dados do MySQL: {e}")
     st.stop()
 
-df_base['Semana'] = pd.to_datetime(df_base['Semana'])
-todas_obras_lista = df_base["Obra"].unique().tolist()
+if MODO_CARGA == "janela":
+    limites_obras = carga['base']
+    todas_obras_lista = limites_obras["Obra"].tolist()
+    semana_min, semana_max = limites_obras['Primeira'].min(), limites_obras['Ultima'].max()
+else:
+    limites_obras = None
+    df_base = carga['base']
+    todas_obras_lista = df_base["Obra"].unique().tolist()
+    semana_min, semana_max = df_base['Semana'].min(), df_base['Semana'].max()
 
 # --- 2.5 INICIALIZAÇÃO DO SESSION STATE ---
 if 'orcamentos' not in st.session_state:
-    df_orcamentos_base = pd.DataFrame({"Obra": todas_obras_lista})
-    df_orcamentos_para_editor = df_orcamentos_base.merge(df_orcamentos_salvos, on="Obra", how="left")
-    st.session_state['orcamentos'] = df_orcamentos_para_editor
-
-# --- LIMPEZA DE COLUNAS ANTIGAS ---
-cols_remover = ["Prazo Projeto", "Prazo Fabricacao", "Prazo Montagem", "Data Inicio"]
-st.session_state['orcamentos'] = st.session_state['orcamentos'].drop(
-    columns=[c for c in cols_remover if c in st.session_state['orcamentos'].columns], 
-    errors='ignore'
-)
+    st.session_state['orcamentos'] = preparar_orcamentos(todas_obras_lista, df_orcamentos_salvos)
 
-# Blindagem de Colunas Novas (Cria se não existir)
-cols_datas_necessarias = ["Ini Projeto", "Fim Projeto", "Ini Fabricacao", "Fim Fabricacao", "Ini Montagem", "Fim Montagem"]
-for col in cols_datas_necessarias:
-    if col not in st.session_state['orcamentos'].columns:
-        st.session_state['orcamentos'][col] = None
-
-defaults_num = {'Orcamento': 100.0, 'Orcamento Lajes': 0.0}
-for col, val in defaults_num.items():
-    if col not in st.session_state['orcamentos'].columns:
-        st.session_state['orcamentos'][col] = val
-    else:
-        st.session_state['orcamentos'][col] = st.session_state['orcamentos'][col].fillna(val)
+# --- LIMPEZA DE COLUNAS ANTIGAS + BLINDAGEM DE COLUNAS NOVAS ---
+st.session_state['orcamentos'] = normalizar_orcamentos(st.session_state['orcamentos'])
+cols_datas_necessarias = list(COLS_DATAS_ORCAMENTO)
 
 # --- 3. FILTRO GLOBAL ---
 st.subheader("⚙️ Filtros Globais")
@@ -259,73 +450,109 @@ col1, col2, col3 = st.columns([2, 1, 1])
 with col1:
     obras_selecionadas = st.multiselect("Selecione as Obras:", options=todas_obras_lista, default=todas_obras_lista)
 with col2:
-    data_inicio = st.date_input("Data de Início:", value=df_base['Semana'].min() - pd.Timedelta(weeks=10))
+    data_inicio = st.date_input("Data de Início:", value=semana_min - pd.Timedelta(weeks=10))
 with col3:
-    data_fim = st.date_input("Data Final:", value=df_base['Semana'].max())
+    data_fim = st.date_input("Data Final:", value=semana_max)
 
 data_inicio = pd.to_datetime(data_inicio)
 data_fim = pd.to_datetime(data_fim)
     
-# --- 4. PREPARAÇÃO DOS DADOS ---
-df_para_cumsum = df_base[(df_base["Obra"].isin(obras_selecionadas))].copy()
-
-# Preenchimento de Lacunas (Lógica Otimizada)
-zero_rows = []
-weeks_to_add = 10 
-for obra in obras_selecionadas:
-    obra_df = df_para_cumsum[df_para_cumsum['Obra'] == obra]
-    if not obra_df.empty:
-        curr = obra_df['Semana'].min()
-        for _ in range(weeks_to_add):
-            curr -= pd.Timedelta(days=7)
-            zero_rows.append({'Obra': obra, 'Semana': curr, 'Volume_Projetado': 0, 'Volume_Fabricado': 0, 'Volume_Montado': 0})
-        curr_fut = obra_df['Semana'].max()
-        for _ in range(weeks_to_add):
-            curr_fut += pd.Timedelta(days=7)
-            zero_rows.append({'Obra': obra, 'Semana': curr_fut, 'Volume_Projetado': 0, 'Volume_Fabricado': 0, 'Volume_Montado': 0})
-
-if zero_rows:
-    df_para_cumsum = pd.concat([pd.DataFrame(zero_rows), df_para_cumsum], ignore_index=True)
-
-dfs_preenchidos = []
-if not df_para_cumsum.empty:
-    for obra, dados in df_para_cumsum.groupby("Obra"):
-        dados = dados.groupby("Semana").sum(numeric_only=True).reset_index().set_index("Semana").sort_index()
-        idx_completo = pd.date_range(start=dados.index.min(), end=dados.index.max(), freq='7D')
-        dados = dados.reindex(idx_completo).fillna(0)
-        dados['Obra'] = obra
-        dfs_preenchidos.append(dados)
-    df_para_cumsum = pd.concat(dfs_preenchidos).reset_index().rename(columns={'index': 'Semana'})
-
-df_para_cumsum = df_para_cumsum.sort_values(["Obra", "Semana"]) 
-for col in ["Volume_Projetado", "Volume_Fabricado", "Volume_Montado"]:
-    df_para_cumsum[col] = df_para_cumsum.groupby("Obra")[col].cumsum()
-
-df = df_para_cumsum[(df_para_cumsum["Semana"] >= data_inicio) & (df_para_cumsum["Semana"] <= data_fim)].copy()
-
-if df.empty and not obras_selecionadas:
+if not obras_selecionadas:
     st.warning("Nenhuma obra encontrada.")
     st.stop()
 
-df['Semana_Display'] = df['Semana'].apply(formatar_semana)
-    
-# --- 5. ABAS ---
-tab_cadastro, tab_tabelas, tab_graficos, tab_geral, tab_planejador = st.tabs([
-    "📁 Cadastro", "📊 Tabelas", "📈 Gráficos", "🌍 Tabela Geral", "📅 Planejador"
-])
+if MODO_CARGA == "janela":
+    try:
+        with medir_etapa(metricas_processo(), "carga da janela"):
+            df_base = chamar_com_cache(
+                metricas_processo(), 'janela', carregar_dados_janela,
+                tuple(sorted(obras_selecionadas)), data_inicio, data_fim,
+            )
+    except Exception as e:
+        st.error(f"Erro fatal ao carregar dados do MySQL: {e}")
+        st.stop()
+
+# --- 3.5 IDADE DOS DADOS (ATUALIZADOS EM SEGUNDO PLANO) ---
+def mostrar_idade_dados(df_base):
+    conjunto = conjuntos_dados()[CONJUNTO_SEMANAL]
+    versao = df_base.attrs.get('versao') or conjunto['versao']
+    if versao is None:
+        return
+    versao = pd.Timestamp(versao)
+    minutos = int((pd.Timestamp.now() - versao).total_seconds() // 60)
+    texto = f"🕒 Dados do plannix de {versao:%d/%m %H:%M} (há {minutos} min)"
+    if conjunto['erro'] is not None:
+        st.warning(f"{texto}. A última atualização falhou ({conjunto['erro']}); exibindo a última versão boa.")
+    else:
+        st.caption(texto + (" · atualizando..." if conjunto['revalidando'] else ""))
+    # Plantas que não responderam na última carga entram com a última leitura boa (ou ficam de fora)
+    for planta in situacao_plantas(estados_plantas(), [CONJUNTO_SEMANAL]).itertuples():
+        if planta.Origem == 'reserva':
+            st.warning(f"🏭 {planta.Planta}: exibindo a leitura de {pd.Timestamp(planta.Versão):%d/%m %H:%M} ({planta.Erro}).")
+        elif planta.Origem == 'indisponível':
+            st.warning(f"🏭 {planta.Planta} indisponível e sem leitura anterior; as obras dela estão fora ({planta.Erro}).")
+
+mostrar_idade_dados(df_base)
+
+# --- 4. PREPARAÇÃO DOS DADOS (SÓ NAS SEÇÕES QUE USAM, COM CACHE POR SESSÃO) ---
+def montar_df_para_edicao(df_base, obras, data_inicio, data_fim, df_orcamentos, df_previsoes_salvas):
+    # Preenchimento de Lacunas + acumulado (grade Obra x semana de uma vez)
+    metricas = metricas_processo()
+    with medir_etapa(metricas, "lacunas + acumulado"):
+        df_para_cumsum = preencher_lacunas_cumsum(df_base, obras, limites=limites_obras)
+    with medir_etapa(metricas, "recorte da janela"):
+        df = filtrar_janela(df_para_cumsum, data_inicio, data_fim)
+    with medir_etapa(metricas, "orçamentos e previsões (merge)"):
+        return aplicar_orcamentos(df, df_orcamentos, df_previsoes_salvas)
+
+def versao_snapshot(df_base):
+    # Carregadores marcam a versão em attrs; sem ela, cai no hash do conteúdo
+    return df_base.attrs.get('versao') or int(pd.util.hash_pandas_object(df_base, index=False).sum())
+
+def frames_derivados(df_base, obras, data_inicio, data_fim, df_previsoes_salvas):
+    """Frames da janela filtrada (para edição, com edições e após a Lógica de Corte), memorizados por sessão.
+
+    A chave cobre tudo que muda o resultado: obras, janela de datas, versão dos
+    dados, versão dos orçamentos da sessão, versão das previsões salvas (muda a
+    cada releitura, inclusive a do agendador) e versão das edições ainda não salvas.
+    """
+    cache = st.session_state.setdefault('cache_derivados', CacheLRU(max_itens=12))
+    chave = (
+        tuple(sorted(obras)), data_inicio, data_fim, versao_snapshot(df_base),
+        st.session_state.get('versao_orcamentos', 0), versao_snapshot(df_previsoes_salvas),
+    )
+    df_para_edicao = cache.obter(impressao_digital('para_edicao', *chave), lambda: montar_df_para_edicao(
+        df_base, obras, data_inicio, data_fim, st.session_state['orcamentos'], df_previsoes_salvas
+    ))
+    # Edições de previsão ainda não salvas sobrevivem à troca de seção
+    chave += (st.session_state.get('versao_edicoes', 0),)
+    def editar():
+        with medir_etapa(metricas_processo(), "edições de previsão"):
+            return aplicar_previsoes_editadas(df_para_edicao, st.session_state.get('previsoes_editadas', {}))
+    df_editado = cache.obter(impressao_digital('editado', *chave), editar)
+
+    def calcular():
+        with medir_etapa(metricas_processo(), "lógica de corte"):
+            return logica_corte(df_editado)
+    df_calculado = cache.obter(impressao_digital('calculado', *chave), calcular)
+    return df_editado, df_calculado
+
+# --- 5. SEÇÕES ---
+# Só a seção escolhida é executada; cada uma é um fragmento, então interagir
+# com um widget dela reexecuta apenas ela. Trocar de seção (ou mudar os filtros
+# globais) reexecuta o script e recalcula a seção com os dados atualizados.
+ABAS = ["📁 Cadastro", "📊 Tabelas", "📈 Gráficos", "🌍 Tabela Geral", "📅 Planejador"]
+aba_ativa = st.radio("Seção", ABAS, horizontal=True, key="aba_ativa", label_visibility="collapsed")
 
 # --- ABA 1: CADASTRO (COM CORREÇÃO DE WIDTH E CALLBACK) ---
-with tab_cadastro:
+@st.fragment
+@medir_fragmento("Cadastro")
+def secao_cadastro(obras):
     st.subheader("💰 1. Orçamento e Datas das Etapas")
     st.info("Cadastre o orçamento e as datas de **Início e Fim** de cada etapa.")
     
-    # 1. Copia e filtra os dados da memória
-    orcamentos_filtrado = st.session_state['orcamentos'][st.session_state['orcamentos']['Obra'].isin(obras_selecionadas)].copy()
-    
-    # 2. Conversão de tipos (Blindagem)
-    for col in cols_datas_necessarias:
-        if col not in orcamentos_filtrado.columns: orcamentos_filtrado[col] = None
-        orcamentos_filtrado[col] = pd.to_datetime(orcamentos_filtrado[col], errors='coerce')
+    # 1. Copia e filtra os dados da memória + conversão de tipos (Blindagem)
+    orcamentos_filtrado = orcamentos_para_editor(st.session_state['orcamentos'], obras)
 
     # --- CALLBACK DE SALVAMENTO AUTOMÁTICO ---
     def atualizar_session_state():
@@ -337,8 +564,13 @@ with tab_cadastro:
                 # Aplica mudanças
                 for col_name, new_value in changes.items():
                     st.session_state['orcamentos'].at[real_index, col_name] = new_value
+                st.session_state['versao_orcamentos'] = st.session_state.get('versao_orcamentos', 0) + 1
+                st.session_state.setdefault('orcamentos_alterados', set()).add(
+                    st.session_state['orcamentos'].at[real_index, 'Obra']
+                )
 
     # 3. O Editor de Dados
+    medir_payload("editor_cadastro", orcamentos_filtrado)
     st.data_editor(
         orcamentos_filtrado, 
         key="editor_cadastro", # Chave para o callback
@@ -368,36 +600,43 @@ with tab_cadastro:
     
     # Botão de Salvar apenas para o Banco de Dados
     if st.button("💾 Salvar Cadastro no Banco de Dados", key="btn_salvar_cadastro"):
-        salvar_dados_usuario(df_previsoes_salvas, st.session_state['orcamentos'])
-
-# --- 6. MERGE FINAL ---
-df_orcamentos_atual = st.session_state['orcamentos']
-df = df.merge(df_orcamentos_atual, on="Obra", how="left")
-for col in ["Projetado", "Fabricado", "Montado"]:
-    df[f"{col} %"] = (df[f"Volume_{col}"] / df["Orcamento"]) * 100
-
-if not df_previsoes_salvas.empty:
-    df = df.merge(df_previsoes_salvas, on=["Obra", "Semana"], how="left")
-for col in ["Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"]:
-    df[col] = df[col].fillna(0.0)
-df_para_edicao = df.copy() 
+        if salvar_dados_usuario(previsoes_alteradas().iloc[0:0], orcamentos_alterados()):
+            st.session_state['orcamentos_alterados'] = set()
 
 # --- ABA 2: TABELAS ---
-with tab_tabelas:
+@st.fragment
+@medir_fragmento("Tabelas")
+def secao_tabelas(df_base, obras, data_inicio, data_fim):
+    # Lidas aqui (não como argumento): reruns do fragmento depois de salvar veem o que foi gravado
+    df_previsoes_salvas = carregar_dados_usuario()[1]
+    df_para_edicao, df_calculado = frames_derivados(df_base, obras, data_inicio, data_fim, df_previsoes_salvas)
+
     st.subheader("Controles de Visualização")
     c1, c2 = st.columns(2)
     with c1: show_editor = st.checkbox("Mostrar Edição de Previsões", value=True)
     with c2: show_result_table = st.checkbox("Mostrar Tabela Completa", value=True)
-    
-    df_editado = df_para_edicao 
+
+    # --- CALLBACK: GUARDA AS PREVISÕES EDITADAS POR (Obra, Semana), SÓ AS COLUNAS EDITADAS ---
+    def registrar_previsoes_editadas():
+        edicoes = st.session_state.setdefault('previsoes_editadas', {})
+        for index, changes in st.session_state["dados_editor"]["edited_rows"].items():
+            linha = df_para_edicao.iloc[index]
+            valores = edicoes.setdefault((linha['Obra'], linha['Semana']), {})
+            valores.update({col: val for col, val in changes.items() if col in COLS_PREVISOES})
+        st.session_state['versao_edicoes'] = st.session_state.get('versao_edicoes', 0) + 1
+
     if show_editor:
         st.markdown("---")
         st.subheader("✏️ 2. Edite as Previsões Semanais")
         # Esconde colunas que não são de previsão
         cols_ocultar = ["Obra", "Semana", "Semana_Display", "Volume_Projetado", "Projetado %", "Volume_Fabricado", "Fabricado %", "Volume_Montado", "Montado %", "Orcamento", "Orcamento Lajes"] + cols_datas_necessarias
         
-        df_editado = st.data_editor(
+        # As edições chegam por registrar_previsoes_editadas antes do rerun,
+        # então df_calculado (memorizado) já as inclui
+        medir_payload("editor_previsoes", df_para_edicao)
+        st.data_editor(
             df_para_edicao, key="dados_editor", use_container_width=True, hide_index=True, disabled=cols_ocultar,
+            on_change=registrar_previsoes_editadas,
             column_config={
                 "Semana_Display": "Semana", 
                 "Projeto Previsto %": st.column_config.NumberColumn(format="%.0f%%"),
@@ -407,85 +646,47 @@ with tab_tabelas:
         )
         st.markdown("---")
 
-    # Lógica de Corte
-    df_calculado = df_editado.copy().sort_values(['Obra', 'Semana'])
-    for col in ["Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"]:
-        df_calculado[col] = df_calculado[col].replace(0.0, np.nan)
-        df_calculado[col] = df_calculado.groupby('Obra')[col].ffill().fillna(0.0)
-        mask_concluido = df_calculado.groupby('Obra')[col].shift(1) >= 100.0
-        df_calculado.loc[mask_concluido, col] = np.nan
-
     if st.button("💾 Salvar Previsões no Banco de Dados", type="primary"):
-        salvar_dados_usuario(df_editado, st.session_state['orcamentos'])
+        if salvar_dados_usuario(previsoes_alteradas(), orcamentos_alterados()):
+            limpar_alteracoes_salvas()
 
     if show_result_table:
         cols_res = ["Obra", "Semana_Display", "Projetado %", "Projeto Previsto %", "Fabricado %", "Fabricação Prevista %", "Montado %", "Montagem Prevista %"]
-        st.dataframe(df_calculado[[c for c in cols_res if c in df_calculado.columns]], use_container_width=True, hide_index=True)
+        df_resultado = df_calculado[[c for c in cols_res if c in df_calculado.columns]]
+        medir_payload("tabela_completa", df_resultado)
+        st.dataframe(df_resultado, use_container_width=True, hide_index=True)
 
 # --- ABA 3: GRÁFICOS ---
-with tab_graficos:
+@st.fragment
+@medir_fragmento("Gráficos")
+def secao_graficos(df_base, obras, data_inicio, data_fim):
     st.subheader("📈 Tendências")
+    df_previsoes_salvas = carregar_dados_usuario()[1]
+    _, df_calculado = frames_derivados(df_base, obras, data_inicio, data_fim, df_previsoes_salvas)
     if not df_calculado.empty:
-        df_melt = df_calculado.melt(id_vars=["Obra", "Semana_Display", "Semana"], 
-                                    value_vars=[c for c in ["Projetado %", "Projeto Previsto %", "Fabricado %", "Fabricação Prevista %", "Montado %", "Montagem Prevista %"] if c in df_calculado.columns],
-                                    var_name="Métrica", value_name="Porcentagem")
-        chart = alt.Chart(df_melt).mark_line(point=True).encode(
-            x=alt.X('Semana_Display:N', sort=alt.SortField(field="Semana", order='ascending'), title='Semana'),
-            y='Porcentagem:Q', color='Métrica:N', strokeDash='Obra:N', tooltip=['Obra', 'Semana_Display', 'Métrica', alt.Tooltip('Porcentagem', format='.1f')]
+        # Pontos limitados no servidor (decimação por série) e eixo temporal em vez de rótulos texto
+        with medir_etapa(metricas_processo(), "dados do gráfico"):
+            df_grafico = dados_grafico(df_calculado)
+        chart = alt.Chart(df_grafico).mark_line(point=len(df_grafico) <= 1500).encode(
+            x=alt.X('Semana:T', title='Semana', axis=alt.Axis(format='%d/%m/%Y')),
+            y='Porcentagem:Q', color='Métrica:N', strokeDash='Obra:N',
+            tooltip=['Obra', alt.Tooltip('Semana:T', title='Semana', format='%d/%m/%Y'), 'Métrica', alt.Tooltip('Porcentagem', format='.1f')]
         ).interactive()
+        medir_payload("grafico_tendencias", chart)
         st.altair_chart(chart, use_container_width=True)
 
 # --- ABA 4: TABELA GERAL (VISÃO DETALHADA + SALDO DIAS) ---
-with tab_geral:
+@st.fragment
+@medir_fragmento("Tabela Geral")
+def secao_geral():
     st.subheader("🏗️ Resumo Geral Detalhado")
     try:
-        df_geral = carregar_dados_gerais()
-        df_orc_clean = st.session_state['orcamentos'].drop_duplicates(subset=['Obra'], keep='first')
-        df_geral = df_geral.merge(df_orc_clean, on="Obra", how="left")
-
-        # Cálculos Numéricos
-        cols_num = ["Orcamento", "Orcamento Lajes", "Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]
-        for col in cols_num: 
-            if col in df_geral.columns: df_geral[col] = df_geral[col].fillna(0.0)
-
-        for etapa in ["Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]:
-            df_geral[f"{etapa} %"] = df_geral.apply(lambda r: (r[etapa]/r["Orcamento"]*100) if r["Orcamento"]>0 else 0, axis=1)
-
-        # Cálculo Saldo de Dias
-        hoje = pd.to_datetime(datetime.date.today())
-        cols_fim = ["Fim Projeto", "Fim Fabricacao", "Fim Montagem"]
-        
-        for col in cols_fim:
-            if col not in df_geral.columns: df_geral[col] = None
-            df_geral[col] = pd.to_datetime(df_geral[col], errors='coerce')
-
-        def calc_saldo(row, col_prazo):
-            if pd.isna(row[col_prazo]): return None
-            return (row[col_prazo] - hoje).days
-
-        df_geral['Saldo Proj'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Projeto'), axis=1)
-        df_geral['Saldo Fab'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Fabricacao'), axis=1)
-        df_geral['Saldo Mont'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Montagem'), axis=1)
-
-        # --- ORDEM FINAL (Conforme solicitado) ---
-        colunas_ordenadas = [
-            "Obra", "Orcamento", "Orcamento Lajes",
-            
-            "Projetado", "Projetado %", "Saldo Proj",
-            "Taxa de Aço",
-            
-            "Fabricado", "Fabricado %", "Saldo Fab",
-            
-            "Acabado", "Acabado %",
-            "Expedido", "Expedido %",
-            
-            "Montado", "Montado %", "Saldo Mont"
-        ]
-        
-        cols_final = [c for c in colunas_ordenadas if c in df_geral.columns]
+        with medir_etapa(metricas_processo(), "tabela geral"):
+            df_geral = calcular_tabela_geral(carregar_dados_gerais(), st.session_state['orcamentos'])
+        medir_payload("tabela_geral", df_geral)
 
         st.dataframe(
-            df_geral[cols_final], use_container_width=True, hide_index=True,
+            df_geral, use_container_width=True, hide_index=True,
             column_config={
                 "Orcamento": st.column_config.NumberColumn("Orçamento", format="%.2f"),
                 "Orcamento Lajes": st.column_config.NumberColumn("Orç. Lajes", format="%.2f"),
@@ -514,13 +715,52 @@ with tab_geral:
     except Exception as e:
         st.error(f"Erro ao gerar tabela: {e}")
 
+def mostrar_simulacao(simulacao, n_cenarios):
+    st.subheader("Simulação Monte Carlo")
+    st.caption(
+        f"{n_cenarios} cenários sorteados entre {simulacao['obras_historicas']} obras históricas. "
+        "Pxx = data até a qual xx% dos cenários terminaram; nas faixas, volume acumulado atingido em xx% dos cenários."
+    )
+    medir_payload("simulacao_datas", simulacao['datas'])
+    st.dataframe(simulacao['datas'], use_container_width=True, hide_index=True, column_config={
+        f'P{p}': st.column_config.DateColumn(f'Término P{p}', format="DD/MM/YYYY") for p in PERCENTIS_SIMULACAO
+    })
+
+    df_faixas = simulacao['faixas']
+    df_long = pd.concat([
+        pd.DataFrame({
+            'Semana': df_faixas['Semana'], 'Etapa': etapa,
+            **{f'P{p}': df_faixas[f'{etapa} P{p}'] for p in PERCENTIS_SIMULACAO},
+        })
+        for etapa, _, _, _ in ETAPAS_PLANEJADOR
+    ], ignore_index=True)
+    base = alt.Chart(df_long).encode(
+        x=alt.X('Semana:T', title='Semana', axis=alt.Axis(format='%d/%m/%Y')),
+        color=alt.Color('Etapa:N', sort=[etapa for etapa, _, _, _ in ETAPAS_PLANEJADOR]),
+    )
+    faixa = base.mark_area(opacity=0.2).encode(y=alt.Y('P95:Q', title='Volume Acumulado (m³)'), y2='P50:Q')
+    mediana = base.mark_line().encode(
+        y='P50:Q',
+        tooltip=['Etapa', alt.Tooltip('Semana:T', format='%d/%m/%Y')]
+                + [alt.Tooltip(f'P{p}:Q', format='.1f') for p in PERCENTIS_SIMULACAO],
+    )
+    grafico = faixa + mediana
+    medir_payload("grafico_simulacao", grafico)
+    st.altair_chart(grafico, use_container_width=True)
+    with st.expander("Faixas por semana"):
+        df_faixas_tela = df_faixas.drop(columns='Semana')
+        medir_payload("simulacao_faixas", df_faixas_tela)
+        st.dataframe(df_faixas_tela, use_container_width=True, hide_index=True)
+
 # --- ABA 5: PLANEJADOR (RESTAURADA) ---
-with tab_planejador:
+@st.fragment
+@medir_fragmento("Planejador")
+def secao_planejador(todas_obras):
     st.subheader("📅 Planejador de Obra")
     st.info("Simule uma nova obra usando a estrutura de datas de uma obra existente OU a média geral.")
 
     col_plan1, col_plan2, col_plan3 = st.columns([1, 1, 1])
-    opcoes_referencia = ["Média Geral (Todas as Obras)"] + sorted(todas_obras_lista)
+    opcoes_referencia = ["Média Geral (Todas as Obras)"] + sorted(todas_obras)
     with col_plan1: obra_referencia = st.selectbox("Base de Referência:", options=opcoes_referencia)
     with col_plan2: data_inicio_simulacao = st.date_input("Início da Simulação:", value=datetime.date.today())
     with col_plan3:
@@ -532,6 +772,7 @@ with tab_planejador:
 
     st.markdown("---")
     st.write("**Defina os totais da nova obra:**")
+    medir_payload("editor_familias", df_input_familias)
     df_familias_input = st.data_editor(
         df_input_familias, hide_index=True, use_container_width=True,
         column_config={
@@ -543,79 +784,136 @@ with tab_planejador:
     
     total_qtd_input = df_familias_input['Quantidade'].sum()
     total_vol_input = df_familias_input['Volume'].sum()
-    st.metric("Volume Total Planejado", f"{total_vol_input:.2f} m³")
+    c_vol, c_qtd = st.columns(2)
+    c_vol.metric("Volume Total Planejado", f"{total_vol_input:.2f} m³")
+    c_qtd.metric("Peças Planejadas", f"{int(total_qtd_input)}")
+
+    # Curva da referência: a obra escolhida (ou a média de todas) define o ritmo semanal de cada etapa
+    distribuicao = st.radio(
+        "Distribuição semanal:", ["Linear", "Curva da referência"], horizontal=True,
+        help="Linear divide igualmente entre as semanas da etapa; a curva usa o ritmo realizado da base de referência."
+    )
+
+    # Monte Carlo: as datas vêm do sorteio entre todas as obras históricas, não da base de referência
+    col_mc1, col_mc2 = st.columns([1, 1])
+    with col_mc1:
+        monte_carlo = st.toggle("Simulação Monte Carlo", help="Sorteia durações e defasagens das obras históricas e mostra P50/P80/P95.")
+    with col_mc2:
+        n_cenarios = st.number_input("Cenários:", min_value=1_000, max_value=50_000, value=CENARIOS_PADRAO, step=1_000, disabled=not monte_carlo)
 
     st.markdown("---")
     
-    if st.button("Gerar Projeção de Cronograma", type="primary"):
+    if monte_carlo and st.button("Simular Cronograma", type="primary"):
+        try:
+            perfis = None
+            if distribuicao == "Curva da referência":
+                df_semanal = carregar_semanal_completo()
+                if obra_referencia == "Média Geral (Todas as Obras)":
+                    perfis = perfil_medio(df_semanal)
+                else:
+                    perfis = perfis_da_obra(df_semanal, obra_referencia)
+            # Semente fixa: refazer a simulação na reunião não muda os números
+            simulacao = simular_cronograma(
+                carregar_duracoes_historicas(), data_inicio_simulacao, total_vol_input,
+                n_cenarios=int(n_cenarios), perfis=perfis, semente=0
+            )
+            if simulacao is None:
+                st.warning("Nenhuma obra histórica com as três etapas completas para simular.")
+            else:
+                mostrar_simulacao(simulacao, int(n_cenarios))
+        except Exception as e:
+            st.error(f"Erro: {e}")
+
+    if not monte_carlo and st.button("Gerar Projeção de Cronograma", type="primary"):
         try:
-            datas = None
             if obra_referencia == "Média Geral (Todas as Obras)":
-                df_medias = calcular_medias_cronograma()
-                if not df_medias.empty:
-                    media = df_medias.iloc[0]
-                    ini_p = pd.to_datetime(data_inicio_simulacao)
-                    # Exemplo simples de projeção linear baseado nas médias
-                    fim_p = ini_p + pd.Timedelta(days=media['dias_duracao_proj'])
-                    ini_f = ini_p + pd.Timedelta(days=media['dias_lag_fab'])
-                    fim_f = ini_f + pd.Timedelta(days=media['dias_duracao_fab'])
-                    ini_m = ini_p + pd.Timedelta(days=media['dias_lag_mont'])
-                    fim_m = ini_m + pd.Timedelta(days=media['dias_duracao_mont'])
-                    datas = {'ini_proj': ini_p, 'fim_proj': fim_p, 'ini_fab': ini_f, 'fim_fab': fim_f, 'ini_mont': ini_m, 'fim_mont': fim_m}
-                else: st.error("Dados insuficientes.")
+                datas = datas_por_medias(calcular_medias_cronograma(), data_inicio_simulacao)
+                if datas is None: st.error("Dados insuficientes.")
             else:
-                df_datas = carregar_datas_limite_etapas(obra_referencia)
-                if not df_datas.empty and not df_datas.iloc[0].isnull().all():
-                    raw = df_datas.iloc[0]
-                    # Calcula durações da obra referência e aplica na nova data de início
-                    dur_p = (raw['fim_proj'] - raw['ini_proj']).days
-                    lag_f = (raw['ini_fab'] - raw['ini_proj']).days
-                    dur_f = (raw['fim_fab'] - raw['ini_fab']).days
-                    lag_m = (raw['ini_mont'] - raw['ini_proj']).days
-                    dur_m = (raw['fim_mont'] - raw['ini_mont']).days
-                    
-                    ini_p = pd.to_datetime(data_inicio_simulacao)
-                    datas = {
-                        'ini_proj': ini_p, 'fim_proj': ini_p + pd.Timedelta(days=dur_p),
-                        'ini_fab': ini_p + pd.Timedelta(days=lag_f), 'fim_fab': (ini_p + pd.Timedelta(days=lag_f)) + pd.Timedelta(days=dur_f),
-                        'ini_mont': ini_p + pd.Timedelta(days=lag_m), 'fim_mont': (ini_p + pd.Timedelta(days=lag_m)) + pd.Timedelta(days=dur_m)
-                    }
+                datas = datas_por_referencia(carregar_datas_limite_etapas(obra_referencia), data_inicio_simulacao)
             
             if datas:
-                def gerar_semanas(inicio, fim):
-                    if pd.isna(inicio) or pd.isna(fim): return []
-                    start = pd.to_datetime(inicio) - pd.Timedelta(days=pd.to_datetime(inicio).weekday())
-                    end = pd.to_datetime(fim)
-                    weeks = []
-                    while start <= end:
-                        weeks.append(start)
-                        start += pd.Timedelta(days=7)
-                    return weeks
-
-                semanas_proj = gerar_semanas(datas['ini_proj'], datas['fim_proj'])
-                semanas_fab = gerar_semanas(datas['ini_fab'], datas['fim_fab'])
-                semanas_mont = gerar_semanas(datas['ini_mont'], datas['fim_mont'])
-                
-                todas_semanas = sorted(list(set(semanas_proj + semanas_fab + semanas_mont)))
-                df_plan = pd.DataFrame({'Semana': todas_semanas})
-                df_plan['Semana Display'] = df_plan['Semana'].apply(formatar_semana)
-                
-                # Distribuição Linear Simples (Volume Total / Numero de Semanas)
-                vp = total_vol_input / len(semanas_proj) if semanas_proj else 0
-                vf = total_vol_input / len(semanas_fab) if semanas_fab else 0
-                vm = total_vol_input / len(semanas_mont) if semanas_mont else 0
-                
-                qp = total_qtd_input / len(semanas_proj) if semanas_proj else 0
-                qf = total_qtd_input / len(semanas_fab) if semanas_fab else 0
-                qm = total_qtd_input / len(semanas_mont) if semanas_mont else 0
-                
-                df_plan['Projeto (Vol)'] = df_plan['Semana'].apply(lambda x: vp if x in semanas_proj else 0).cumsum()
-                df_plan['Fabricação (Vol)'] = df_plan['Semana'].apply(lambda x: vf if x in semanas_fab else 0).cumsum()
-                df_plan['Montagem (Vol)'] = df_plan['Semana'].apply(lambda x: vm if x in semanas_mont else 0).cumsum()
+                perfis = None
+                if distribuicao == "Curva da referência":
+                    df_semanal = carregar_semanal_completo()
+                    if obra_referencia == "Média Geral (Todas as Obras)":
+                        perfis = perfil_medio(df_semanal)
+                    else:
+                        perfis = perfis_da_obra(df_semanal, obra_referencia)
+                projecao = projetar_por_familia(datas, df_familias_input, perfis)
                 
                 st.subheader("Simulação de Avanço Acumulado")
-                st.dataframe(df_plan, use_container_width=True, hide_index=True)
+                medir_payload("projecao_resumo", projecao['resumo'])
+                st.dataframe(projecao['resumo'], use_container_width=True, hide_index=True)
+                with st.expander("Detalhe por família"):
+                    df_det = projecao['familias']
+                    familias_planejadas = df_familias_input.loc[
+                        (df_familias_input['Volume'] > 0) | (df_familias_input['Quantidade'] > 0), 'Familia'
+                    ]
+                    df_det = df_det[df_det['Familia'].isin(familias_planejadas)].drop(columns='Semana')
+                    medir_payload("projecao_familias", df_det)
+                    st.dataframe(df_det, use_container_width=True, hide_index=True)
             else:
                 st.warning("Não foi possível gerar cronograma.")
         except Exception as e:
             st.error(f"Erro: {e}")
+
+# --- EXECUÇÃO DA SEÇÃO ATIVA ---
+with medir_etapa(metricas_processo(), f"seção {aba_ativa}"):
+    if aba_ativa == "📁 Cadastro":
+        secao_cadastro(obras_selecionadas)
+    elif aba_ativa == "📊 Tabelas":
+        secao_tabelas(df_base, obras_selecionadas, data_inicio, data_fim)
+    elif aba_ativa == "📈 Gráficos":
+        secao_graficos(df_base, obras_selecionadas, data_inicio, data_fim)
+    elif aba_ativa == "🌍 Tabela Geral":
+        secao_geral()
+    elif aba_ativa == "📅 Planejador":
+        secao_planejador(todas_obras_lista)
+
+# --- 6. MEMÓRIA (DIAGNÓSTICO POR SESSÃO) ---
+if st.sidebar.toggle("Mostrar uso de memória", key="mostrar_memoria"):
+    # Só mede quando ligado: memory_usage(deep=True) percorre as colunas de texto
+    st.sidebar.caption(f"Modo de memória: {MODO_MEMORIA}")
+    st.sidebar.markdown("**Esta sessão**")
+    st.sidebar.dataframe(relatorio_memoria(dict(st.session_state)), hide_index=True)
+    st.sidebar.markdown("**Compartilhado pelo processo**")
+    st.sidebar.dataframe(relatorio_memoria({
+        **{nome: conjunto['frames'] for nome, conjunto in conjuntos_dados().items() if conjunto['frames'] is not None},
+        **{f"reservas {planta['nome']}": dict(planta['reservas']) for planta in estados_plantas()},
+    }), hide_index=True)
+
+# --- 7. DIAGNÓSTICO (OCULTO: secrets diagnostico = true OU ?diagnostico=1) ---
+def mostrar_diagnostico(registro):
+    metricas = metricas_processo()
+    with st.sidebar.expander("🔧 Diagnóstico", expanded=True):
+        st.caption(f"Rerun até aqui: {pd.Timestamp.now().timestamp() - registro['inicio']:.3f} s")
+        st.markdown("**Etapas**")
+        st.dataframe(pd.DataFrame(registro['etapas'], columns=['Etapa', 'Segundos']).round(4), hide_index=True)
+        fragmento = st.session_state.get('ultimo_registro_fragmento')
+        if fragmento is not None:
+            st.markdown(f"**Último rerun só da seção {fragmento['fragmento']}** ({fragmento['segundos']:.3f} s)")
+            st.dataframe(pd.DataFrame(fragmento['etapas'], columns=['Etapa', 'Segundos']).round(4), hide_index=True)
+        st.markdown("**Leituras do banco neste rerun**")
+        st.dataframe(pd.DataFrame(registro['leituras']).drop(columns='Quando', errors='ignore').round(4), hide_index=True)
+        st.markdown("**Caches**")
+        caches = pd.DataFrame(registro['caches'], columns=['Cache', 'Resultado'])
+        st.dataframe(caches.value_counts().rename('Chamadas').reset_index(), hide_index=True)
+        derivados = st.session_state.get('cache_derivados')
+        if derivados is not None:
+            st.caption(f"Frames derivados da sessão: {derivados.acertos} acertos, {derivados.falhas} falhas")
+        st.markdown("**Payload dos widgets**")
+        st.dataframe(pd.DataFrame(registro['payloads'], columns=['Widget', 'KB']).round(1), hide_index=True)
+        st.markdown("**Últimas leituras do processo (todas as sessões)**")
+        ultimas = pd.DataFrame(list(metricas.ultimas_leituras)[-20:][::-1])
+        st.dataframe(ultimas.round({c: 4 for c in ultimas.select_dtypes('number').columns}), hide_index=True)
+        st.download_button(
+            "Baixar métricas (Prometheus)", metricas.texto_prometheus(),
+            file_name="prazos.prom", mime="text/plain",
+        )
+
+if diagnostico_ativo:
+    mostrar_diagnostico(registro_rerun)
+
+registrar_log(registro_rerun)
+exportar_metricas()
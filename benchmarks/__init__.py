@@ -0,0 +1 @@
+"""Benchmarks da Reunião de Prazos (rodar da raiz do repositório com python -m)."""
@@ -0,0 +1,139 @@
+"""Banco local (SQLite) no lugar do MySQL, com o mesmo esquema e o mesmo SQL dos carregadores.
+
+O plannix fica num arquivo anexado como `plannix-db` e as tabelas do app (usuário
+e rollup) no arquivo principal. Um hook antes de cada execução traduz o pouco de
+dialeto MySQL que as consultas usam: DATE_SUB(.., INTERVAL n DAY), CAST(.. AS
+DATE), GREATEST, o DELETE com JOIN do rollup incremental e os parâmetros
+%(nome)s; WEEKDAY vira uma função registrada e o ON DUPLICATE KEY UPDATE do
+salvamento vira ON CONFLICT ... DO UPDATE.
+"""
+import datetime
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.mysql.dml import OnDuplicateClause
+from sqlalchemy.ext.compiler import compiles
+
+from prazos.banco import metadata_usuario, tabela_orcamentos, tabela_previsoes
+
+# ========================================================
+#          TRADUÇÃO DO DIALETO MYSQL -> SQLITE
+# ========================================================
+def fechar_parenteses(sql, abre):
+    # Posição do ")" que fecha o "(" em sql[abre]
+    nivel = 0
+    for i in range(abre, len(sql)):
+        if sql[i] == '(':
+            nivel += 1
+        elif sql[i] == ')':
+            nivel -= 1
+            if nivel == 0:
+                return i
+    raise ValueError(f"Parênteses desbalanceados: {sql[abre:abre + 80]}")
+
+def reescrever_chamadas(sql, nome, reescrever):
+    """Troca cada NOME(args) por reescrever(args), de dentro para fora."""
+    # Do último para o primeiro: reescrever uma chamada não mexe no início das anteriores
+    for achado in reversed(list(re.finditer(rf"\b{nome}\s*\(", sql, re.IGNORECASE))):
+        abre = achado.end() - 1
+        fecha = fechar_parenteses(sql, abre)
+        sql = sql[:achado.start()] + reescrever(sql[abre + 1:fecha]) + sql[fecha + 1:]
+    return sql
+
+def cast_date(args):
+    expr, _, tipo = args.rpartition(" AS ")
+    return f"date({expr})" if tipo.strip().upper() == "DATE" else f"CAST({args})"
+
+def date_sub(args):
+    data, intervalo = args.split(",", 1)
+    dias = re.fullmatch(r"\s*INTERVAL\s+(.+)\s+DAY\s*", intervalo, re.IGNORECASE | re.DOTALL).group(1)
+    return f"datetime({data}, '-' || ({dias}) || ' days')"
+
+def delete_join(achado):
+    # DELETE r FROM tabela r JOIN cte t ON r.a = t.a AND r.b = t.b -> DELETE ... WHERE (a, b) IN (...)
+    tabela, cte = achado.group('tabela'), achado.group('cte')
+    colunas = ", ".join(re.findall(r"\w+\.(\w+)\s*=\s*\w+\.\1", achado.group('on')))
+    return f"DELETE FROM {tabela} WHERE ({colunas}) IN (SELECT {colunas} FROM {cte})"
+
+def traduzir_sql(sql):
+    if "%(" in sql:
+        sql = re.sub(r"%\((\w+)\)s", r":\1", sql)
+    sql = re.sub(
+        r"DELETE\s+(?P<a>\w+)\s+FROM\s+(?P<tabela>\w+)\s+(?P=a)\s+JOIN\s+(?P<cte>\w+)\s+\w+\s+ON\s+(?P<on>[^;]+?)\s*$",
+        delete_join, sql, flags=re.IGNORECASE,
+    )
+    sql = reescrever_chamadas(sql, "DATE_SUB", date_sub)
+    sql = reescrever_chamadas(sql, "CAST", cast_date)
+    return reescrever_chamadas(sql, "GREATEST", lambda args: f"max({args})")
+
+def parametro_sqlite(valor):
+    # Datas como texto ISO (mesmo formato gravado), sem depender dos adaptadores do sqlite3
+    if isinstance(valor, (pd.Timestamp, datetime.datetime)):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, datetime.date):
+        return valor.isoformat()
+    return valor
+
+@compiles(OnDuplicateClause, "sqlite")
+def on_conflict_sqlite(clausula, compilador, **kw):
+    # Upsert do salvamento (mysql_insert + on_duplicate_key_update) no SQLite
+    tabela = clausula.inserted_alias.element
+    chaves = ", ".join(compilador.preparer.quote(c.name) for c in tabela.primary_key.columns)
+    colunas = ", ".join(f"{compilador.preparer.quote(nome)} = excluded.{compilador.preparer.quote(nome)}" for nome in clausula.update)
+    return f"ON CONFLICT ({chaves}) DO UPDATE SET {colunas}"
+
+def weekday(texto):
+    return None if texto is None else datetime.datetime.fromisoformat(str(texto)).weekday()
+
+# ========================================================
+#          ENGINE E CARGA DOS DADOS
+# ========================================================
+def criar_engine_local(pasta):
+    """Engine SQLAlchemy sobre <pasta>/app.db com <pasta>/plannix.db anexado como `plannix-db`."""
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(f"sqlite:///{pasta / 'app.db'}", connect_args={'check_same_thread': False})
+
+    @event.listens_for(engine, "connect")
+    def preparar(dbapi_con, registro):
+        dbapi_con.execute(f"ATTACH DATABASE '{pasta / 'plannix.db'}' AS `plannix-db`")
+        dbapi_con.create_function("WEEKDAY", 1, weekday, deterministic=True)
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def traduzir(conn, cursor, statement, parameters, context, executemany):
+        if isinstance(parameters, dict):
+            parameters = {k: parametro_sqlite(v) for k, v in parameters.items()}
+        elif isinstance(parameters, tuple):  # text() no SQLite: binds posicionais
+            parameters = tuple(parametro_sqlite(v) for v in parameters)
+        return traduzir_sql(statement), parameters
+
+    return engine
+
+def gravar_plannix(pasta, df_plannix):
+    # Datas como texto "YYYY-MM-DD HH:MM:SS", como o MySQL devolve para DATETIME
+    df = df_plannix.copy()
+    for col in df.select_dtypes('datetime').columns:
+        df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+    Path(pasta).mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(Path(pasta) / 'plannix.db')) as con:
+        df.to_sql('plannix', con, if_exists='replace', index=False)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_plannix_obra ON plannix (nomeObra)")
+        con.commit()
+
+def gravar_usuario(engine, df_orcamentos, df_previsoes):
+    """Recria orcamentos_usuario/previsoes_usuario com o esquema do app e grava as fixtures."""
+    metadata_usuario.drop_all(engine, checkfirst=True)
+    metadata_usuario.create_all(engine)
+    with engine.begin() as conn:
+        for tabela, df in [(tabela_orcamentos, df_orcamentos), (tabela_previsoes, df_previsoes)]:
+            registros = df.astype(object).where(df.notna(), None).to_dict('records')
+            for col in tabela.columns:
+                if col.type.python_type is datetime.date:
+                    for r in registros:
+                        r[col.name] = r[col.name].date() if r[col.name] is not None else None
+            if registros:
+                conn.execute(tabela.insert(), registros)
@@ -0,0 +1,274 @@
+"""Suíte de benchmarks: carregadores (banco local), grade/acumulado, Lógica de Corte, Tabela Geral e Planejador.
+
+Gera um plannix sintético na escala pedida, grava num SQLite que roda o mesmo
+SQL dos carregadores (benchmarks/banco_local.py), cronometra cada cenário e
+guarda o resultado em benchmarks/resultados/<data>-<commit>.json. Com
+--comparar, compara com um resultado anterior e sai com código 1 se algum
+cenário ficou mais lento que a tolerância (para rodar antes de publicar).
+
+Uso (da raiz do repositório):
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --obras 120 --pecas 5000 --semanas 200
+    python -m benchmarks.bench_suite --cenarios lacunas_acumulado logica_corte
+    python -m benchmarks.bench_suite --comparar ultimo
+    python -m benchmarks.bench_suite --comparar benchmarks/resultados/20250602-101500-abc1234.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from prazos import (
+    preparar_orcamentos, normalizar_orcamentos, preencher_lacunas_cumsum, filtrar_janela,
+    aplicar_orcamentos, aplicar_previsoes_editadas, logica_corte, calcular_tabela_geral,
+    duracoes_marcos, datas_por_medias, calcular_medias_marcos, projetar_por_familia, simular_cronograma,
+)
+from prazos.banco import (
+    ler_snapshot, ler_semanal, ler_catalogo_obras, ler_semanal_janela, ler_marcos, ler_dados_usuario,
+    novo_estado_semanal, atualizar_semanal,
+)
+from prazos.rollup import atualizar_rollup, ler_semanal_rollup, ler_gerais_rollup
+from prazos.disco import gravar_grupo, ler_grupo
+
+from .sintetico import HOJE, gerar_plannix, gerar_orcamentos, gerar_previsoes
+from .banco_local import criar_engine_local, gravar_plannix, gravar_usuario
+
+PASTA_RESULTADOS = Path(__file__).parent / "resultados"
+TOLERANCIA_PADRAO = 0.20  # 20% mais lento conta como regressão...
+PISO_MS = 2.0             # ...se a diferença passar disso (abaixo é ruído)
+
+# ========================================================
+#          PREPARO (DADOS SINTÉTICOS + BANCO LOCAL)
+# ========================================================
+def gravar_banco(pasta, escala, seed):
+    """Gera plannix, orçamentos e previsões sintéticos e grava no banco local; devolve (engine, linhas do plannix)."""
+    df_plannix = gerar_plannix(escala['obras'], escala['pecas'], escala['familias'], escala['semanas'], seed=seed)
+    df_orcamentos = gerar_orcamentos(df_plannix, seed=seed)
+    df_previsoes = gerar_previsoes(df_orcamentos, seed=seed)
+    gravar_plannix(pasta, df_plannix)
+    engine = criar_engine_local(pasta)
+    gravar_usuario(engine, df_orcamentos, df_previsoes)
+    return engine, len(df_plannix)
+
+def preparar(pasta, escala, seed):
+    """Gera os dados, grava o banco local e monta os frames de entrada dos cenários em memória."""
+    inicio = time.perf_counter()
+    engine, linhas_plannix = gravar_banco(pasta, escala, seed)
+
+    snapshot = ler_snapshot(engine)
+    gravar_grupo(Path(pasta) / "snapshot", "plannix", snapshot, versao="bench")
+    df_orc_salvos, df_prev_salvas = ler_dados_usuario(engine)
+    obras = sorted(snapshot['semanal']['Obra'].unique())
+    orcamentos = normalizar_orcamentos(preparar_orcamentos(obras, df_orc_salvos))
+
+    # Janela padrão do app: 10 semanas antes da primeira até a última semana com volume
+    data_inicio = snapshot['semanal']['Semana'].min() - pd.Timedelta(weeks=10)
+    data_fim = snapshot['semanal']['Semana'].max()
+    df_grade = filtrar_janela(preencher_lacunas_cumsum(snapshot['semanal'], obras), data_inicio, data_fim)
+    df_para_edicao = aplicar_orcamentos(df_grade, orcamentos, df_prev_salvas)
+    # Edições não salvas em ~2% das linhas
+    amostra = df_para_edicao.sample(frac=0.02, random_state=seed)
+    edicoes = {(o, s): {'Projeto Previsto %': 50.0} for o, s in zip(amostra['Obra'], amostra['Semana'])}
+
+    familias = pd.DataFrame({
+        'Familia': sorted(snapshot['familias']['Familia'].unique()),
+    })
+    familias['Quantidade'] = 100
+    familias['Volume'] = 250.0
+
+    return {
+        'engine': engine, 'pasta': Path(pasta), 'snapshot': snapshot, 'obras': obras,
+        'orcamentos': orcamentos, 'previsoes': df_prev_salvas, 'edicoes': edicoes,
+        'data_inicio': data_inicio, 'data_fim': data_fim,
+        'df_grade': df_grade, 'df_para_edicao': df_para_edicao,
+        'familias': familias, 'linhas_plannix': linhas_plannix,
+        'preparo_s': time.perf_counter() - inicio,
+    }
+
+# ========================================================
+#          CENÁRIOS (CADA UM DEVOLVE A FUNÇÃO CRONOMETRADA)
+# ========================================================
+def com_conexao(ctx, ler):
+    def rodar():
+        with ctx['engine'].connect() as conn:
+            return ler(conn)
+    return rodar
+
+def cenario_incremental(ctx):
+    # Estado já com a carga completa: mede só a atualização incremental (caminho dos reruns)
+    agora = HOJE + pd.Timedelta(hours=10)
+    estado = novo_estado_semanal()
+    with ctx['engine'].connect() as conn:
+        atualizar_semanal(estado, conn, agora, 'dataAlteracao')
+    return com_conexao(ctx, lambda conn: atualizar_semanal(
+        estado, conn, agora + pd.Timedelta(minutes=5), 'dataAlteracao', pd.Timedelta(days=1)
+    ))
+
+def cenario_janela(ctx):
+    # Um quarto das obras, meio ano de janela
+    obras = ctx['obras'][::4]
+    fim = ctx['data_fim']
+    return com_conexao(ctx, lambda conn: ler_semanal_janela(conn, obras, fim - pd.Timedelta(weeks=26), fim))
+
+def cenario_rollup_incremental(ctx):
+    # Depois da completa: mede a passada incremental do job (as peças do segundo do watermark)
+    atualizar_rollup(ctx['engine'], 'dataAlteracao', completa=True, agora=HOJE)
+    return lambda: atualizar_rollup(ctx['engine'], 'dataAlteracao', agora=HOJE + pd.Timedelta(hours=1))
+
+def cenario_leitura_rollup(ctx):
+    atualizar_rollup(ctx['engine'], completa=True, agora=HOJE)
+    return com_conexao(ctx, lambda conn: (ler_semanal_rollup(conn), ler_gerais_rollup(conn)))
+
+def cenario_planejador(ctx):
+    datas = datas_por_medias(calcular_medias_marcos(ctx['snapshot']['marcos']), HOJE)
+    return lambda: projetar_por_familia(datas, ctx['familias'])
+
+def cenario_monte_carlo(ctx):
+    duracoes = duracoes_marcos(ctx['snapshot']['marcos'])
+    return lambda: simular_cronograma(duracoes, HOJE, 1000.0, n_cenarios=10_000, semente=0)
+
+CENARIOS = {
+    # Carregadores (SQL + transferência + pandas, no banco local)
+    'carga_snapshot': lambda ctx: lambda: ler_snapshot(ctx['engine']),
+    'carga_semanal_banco': lambda ctx: com_conexao(ctx, ler_semanal),
+    'carga_incremental': cenario_incremental,
+    'carga_catalogo': lambda ctx: com_conexao(ctx, ler_catalogo_obras),
+    'carga_janela': cenario_janela,
+    'carga_marcos': lambda ctx: com_conexao(ctx, ler_marcos),
+    'carga_usuario': lambda ctx: lambda: ler_dados_usuario(ctx['engine']),
+    'rollup_completo': lambda ctx: lambda: atualizar_rollup(ctx['engine'], completa=True, agora=HOJE),
+    'rollup_incremental': cenario_rollup_incremental,
+    'carga_rollup': cenario_leitura_rollup,
+    'snapshot_disco': lambda ctx: lambda: ler_grupo(ctx['pasta'] / "snapshot", "plannix"),
+    # Cálculos da tela
+    'lacunas_acumulado': lambda ctx: lambda: filtrar_janela(
+        preencher_lacunas_cumsum(ctx['snapshot']['semanal'], ctx['obras']), ctx['data_inicio'], ctx['data_fim']
+    ),
+    'orcamentos_merge': lambda ctx: lambda: aplicar_orcamentos(ctx['df_grade'], ctx['orcamentos'], ctx['previsoes']),
+    'previsoes_editadas': lambda ctx: lambda: aplicar_previsoes_editadas(ctx['df_para_edicao'], ctx['edicoes']),
+    'logica_corte': lambda ctx: lambda: logica_corte(ctx['df_para_edicao']),
+    'tabela_geral': lambda ctx: lambda: calcular_tabela_geral(ctx['snapshot']['gerais'], ctx['orcamentos'], HOJE),
+    'planejador': cenario_planejador,
+    'monte_carlo': cenario_monte_carlo,
+}
+
+def cronometrar(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return {'min_ms': min(tempos) * 1000, 'mediana_ms': statistics.median(tempos) * 1000}
+
+# ========================================================
+#          RESULTADOS (GRAVAR E COMPARAR)
+# ========================================================
+def commit_atual():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+    return f"{commit}-alterado" if sujo else commit
+
+def gravar_resultado(resultado, pasta=PASTA_RESULTADOS):
+    pasta.mkdir(parents=True, exist_ok=True)
+    arquivo = pasta / f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{resultado['commit']}.json"
+    arquivo.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+    return arquivo
+
+def ultimo_resultado(escala, ignorar, pasta=PASTA_RESULTADOS):
+    # O mais recente na mesma escala (nome começa pela data, então a ordem alfabética serve)
+    for arquivo in sorted(pasta.glob("*.json"), reverse=True):
+        if arquivo == ignorar:
+            continue
+        resultado = json.loads(arquivo.read_text())
+        if resultado.get('escala') == escala:
+            return arquivo, resultado
+    return None, None
+
+def comparar(base, atual, tolerancia):
+    """Tabela base x atual por cenário (tempo mínimo) e a lista de cenários que regrediram."""
+    linhas, regressoes = [], []
+    for nome, medida in atual['cenarios'].items():
+        anterior = base['cenarios'].get(nome)
+        if anterior is None:
+            continue
+        razao = medida['min_ms'] / anterior['min_ms'] if anterior['min_ms'] > 0 else float('inf')
+        regrediu = razao > 1 + tolerancia and medida['min_ms'] - anterior['min_ms'] > PISO_MS
+        if regrediu:
+            regressoes.append(nome)
+        linhas.append((nome, anterior['min_ms'], medida['min_ms'], razao, regrediu))
+    return linhas, regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--obras', type=int, default=40)
+    parser.add_argument('--pecas', type=int, default=2000, help="peças por obra")
+    parser.add_argument('--familias', type=int, default=12)
+    parser.add_argument('--semanas', type=int, default=150, help="duração típica de uma obra")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--cenarios', nargs='+', choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument('--pasta', help="pasta do banco local (padrão: temporária)")
+    parser.add_argument('--comparar', help="arquivo de resultado anterior, ou 'ultimo' (mesma escala)")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO)
+    parser.add_argument('--nao-gravar', action='store_true', help="não grava o resultado em benchmarks/resultados")
+    args = parser.parse_args()
+
+    escala = {'obras': args.obras, 'pecas': args.pecas, 'familias': args.familias, 'semanas': args.semanas, 'seed': args.seed}
+    with tempfile.TemporaryDirectory(prefix="bench-prazos-") as temporaria:
+        ctx = preparar(args.pasta or temporaria, escala, args.seed)
+        print(f"{ctx['linhas_plannix']} peças, {len(ctx['obras'])} obras, "
+              f"{len(ctx['df_grade'])} linhas na grade (preparo em {ctx['preparo_s']:.1f} s)")
+        print(f"{'cenário':<22} {'mín (ms)':>10} {'mediana (ms)':>13}")
+        medidas = {}
+        for nome in args.cenarios:
+            medidas[nome] = cronometrar(CENARIOS[nome](ctx), args.repeticoes)
+            print(f"{nome:<22} {medidas[nome]['min_ms']:>10.1f} {medidas[nome]['mediana_ms']:>13.1f}")
+        ctx['engine'].dispose()
+
+    resultado = {
+        'commit': commit_atual(),
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+        'maquina': platform.platform(),
+        'escala': escala, 'repeticoes': args.repeticoes, 'linhas_plannix': ctx['linhas_plannix'],
+        'cenarios': medidas,
+    }
+    arquivo = None if args.nao_gravar else gravar_resultado(resultado)
+    if arquivo:
+        print(f"Resultado gravado em {arquivo}")
+
+    if args.comparar:
+        if args.comparar == 'ultimo':
+            arquivo_base, base = ultimo_resultado(escala, ignorar=arquivo)
+            if base is None:
+                print("Nenhum resultado anterior na mesma escala para comparar.")
+                return 0
+        else:
+            arquivo_base = Path(args.comparar)
+            base = json.loads(arquivo_base.read_text())
+            if base.get('escala') != escala:
+                print(f"Aviso: escala diferente da base ({base.get('escala')}).")
+        linhas, regressoes = comparar(base, resultado, args.tolerancia)
+        print(f"\nComparação com {arquivo_base.name} (commit {base['commit']}):")
+        print(f"{'cenário':<22} {'base (ms)':>10} {'atual (ms)':>11} {'razão':>7}")
+        for nome, antes, agora, razao, regrediu in linhas:
+            print(f"{nome:<22} {antes:>10.1f} {agora:>11.1f} {razao:>6.2f}x{'  <- REGRESSÃO' if regrediu else ''}")
+        if regressoes:
+            print(f"\n{len(regressoes)} cenário(s) mais lentos que {args.tolerancia:.0%}: {', '.join(regressoes)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
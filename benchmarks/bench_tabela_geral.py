@@ -0,0 +1,84 @@
+"""Micro-benchmark da Tabela Geral: versão vetorizada x versão antiga com apply por linha.
+
+Uso (da raiz do repositório):
+    python -m benchmarks.bench_tabela_geral
+    python -m benchmarks.bench_tabela_geral --obras 1000 10000 --repeticoes 5
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from prazos import calcular_tabela_geral, COLUNAS_TABELA_GERAL
+
+HOJE = pd.Timestamp('2025-06-02')
+
+def gerar_entradas(n_obras, seed=0):
+    rng = np.random.default_rng(seed)
+    obras = [f"OBRA {i:05d}" for i in range(n_obras)]
+    df_geral = pd.DataFrame({
+        'Obra': obras,
+        **{etapa: rng.random(n_obras) * 1000 for etapa in ["Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]},
+        'Taxa de Aço': rng.random(n_obras) * 120,
+    })
+    orcamento = rng.random(n_obras) * 2000
+    orcamento[rng.random(n_obras) < 0.1] = 0.0
+    orcamento[rng.random(n_obras) < 0.05] = np.nan
+    df_orcamentos = pd.DataFrame({'Obra': obras, 'Orcamento': orcamento, 'Orcamento Lajes': 0.0})
+    for col in ["Fim Projeto", "Fim Fabricacao", "Fim Montagem"]:
+        datas = HOJE + pd.to_timedelta(rng.integers(-400, 400, n_obras), unit='D')
+        df_orcamentos[col] = pd.Series(datas).where(rng.random(n_obras) > 0.3)
+    return df_geral, df_orcamentos
+
+def tabela_geral_linha_a_linha(df_geral, df_orcamentos, hoje):
+    # Implementação anterior (apply com axis=1), mantida só como referência
+    df_orc_clean = df_orcamentos.drop_duplicates(subset=['Obra'], keep='first')
+    df_geral = df_geral.merge(df_orc_clean, on="Obra", how="left")
+    cols_num = ["Orcamento", "Orcamento Lajes", "Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]
+    for col in cols_num:
+        if col in df_geral.columns: df_geral[col] = df_geral[col].fillna(0.0)
+    for etapa in ["Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]:
+        df_geral[f"{etapa} %"] = df_geral.apply(lambda r: (r[etapa]/r["Orcamento"]*100) if r["Orcamento"]>0 else 0, axis=1)
+    for col in ["Fim Projeto", "Fim Fabricacao", "Fim Montagem"]:
+        if col not in df_geral.columns: df_geral[col] = None
+        df_geral[col] = pd.to_datetime(df_geral[col], errors='coerce')
+
+    def calc_saldo(row, col_prazo):
+        if pd.isna(row[col_prazo]): return None
+        return (row[col_prazo] - hoje).days
+
+    df_geral['Saldo Proj'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Projeto'), axis=1)
+    df_geral['Saldo Fab'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Fabricacao'), axis=1)
+    df_geral['Saldo Mont'] = df_geral.apply(lambda r: calc_saldo(r, 'Fim Montagem'), axis=1)
+    return df_geral[[c for c in COLUNAS_TABELA_GERAL if c in df_geral.columns]]
+
+def cronometrar(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--obras', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'obras':>8} {'apply (ms)':>12} {'vetorizado (ms)':>16} {'ganho':>8}")
+    for n_obras in args.obras:
+        df_geral, df_orcamentos = gerar_entradas(n_obras)
+        t_antigo, antigo = cronometrar(lambda: tabela_geral_linha_a_linha(df_geral, df_orcamentos, HOJE), args.repeticoes)
+        t_novo, novo = cronometrar(lambda: calcular_tabela_geral(df_geral, df_orcamentos, HOJE), args.repeticoes)
+
+        # Mesmas colunas, mesma ordem e mesmos valores (saldo None/NaN comparados como ausentes)
+        assert list(antigo.columns) == list(novo.columns)
+        pd.testing.assert_frame_equal(antigo.astype({c: float for c in ['Saldo Proj', 'Saldo Fab', 'Saldo Mont']}),
+                                      novo.astype({c: float for c in ['Saldo Proj', 'Saldo Fab', 'Saldo Mont']}),
+                                      check_dtype=False)
+        print(f"{n_obras:>8} {t_antigo * 1000:>12.1f} {t_novo * 1000:>16.1f} {t_antigo / t_novo:>7.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""Teste de carga: N sessões simultâneas do app, sem navegador, contra o banco local.
+
+Cada sessão é um AppTest do script do app rodando no mesmo processo, como as
+sessões de um servidor Streamlit: caches (cache_data/cache_resource), conjuntos
+compartilhados, agendador e engine são os mesmos para todas. Cada sessão segue
+um roteiro de usuário (filtros, Cadastro, previsões, troca de seção, Planejador
+e salvamentos) e o teste mede, por interação, a latência do rerun e as consultas
+SQL que ele disparou (thread do script e threads da carga paralela), além do
+pico de memória do processo.
+
+Limitação: o AppTest reexecuta o script inteiro a cada interação, inclusive
+nos widgets de dentro dos fragmentos, então as latências são as de um rerun
+completo (o pior caso no navegador).
+
+Uso (da raiz do repositório):
+    python -m benchmarks.carga_sessoes
+    python -m benchmarks.carga_sessoes --sessoes 16 --rodadas 2 --pausa 0.5
+    python -m benchmarks.carga_sessoes --modo janela --obras 120 --pecas 5000
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit import config
+from sqlalchemy import event
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.logger import set_log_level
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner
+from streamlit.testing.v1.util import patch_config_options
+
+import prazos.banco
+from prazos import COLS_PREVISOES
+from prazos.rollup import atualizar_rollup
+
+from .sintetico import HOJE
+from .bench_suite import PASTA_RESULTADOS, gravar_banco, commit_atual, gravar_resultado
+
+SCRIPT_APP = Path(__file__).resolve().parent.parent / "apresentacao copy.py"
+MODOS = ("completa", "incremental", "janela", "rollup")
+CHAVE_SESSAO = "_sessao_carga"
+
+# ========================================================
+#          PROCESSO COMPARTILHADO (UM "SERVIDOR")
+# ========================================================
+class _RuntimePorRun:
+    # O AppTest troca Runtime._instance a cada run e zera no fim; com sessões em
+    # paralelo isso derrubaria as outras. A troca vai para cá e o Runtime real
+    # fica fixo durante o teste.
+    _instance = None
+
+def runtime_compartilhado():
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    return runtime
+
+@contextmanager
+def processo_compartilhado(engine, secrets):
+    """Runtime, cache do script, secrets e engine únicos para todas as sessões enquanto o bloco roda."""
+    salvos = prazos.banco.criar_engine, app_test.Runtime, local_script_runner.ScriptCache, st.secrets
+    # Toda engine que o app pedir é a do banco local (obter_engine instrumenta por cima)
+    prazos.banco.criar_engine = lambda url, **opcoes: engine
+    app_test.Runtime = _RuntimePorRun
+    # Como no servidor, o script é compilado uma vez só (o AppTest compila a cada
+    # run, e ast.parse em várias threads ao mesmo tempo falha no Python 3.11)
+    cache_script = ScriptCache()
+    cache_script.get_bytecode(str(SCRIPT_APP))
+    local_script_runner.ScriptCache = lambda: cache_script
+    Runtime._instance = runtime_compartilhado()
+    st.secrets = Secrets()
+    st.secrets._secrets = secrets
+    try:
+        # Fixo por fora: os patches de cada run se aninham sobre este e nunca voltam ao original no meio
+        with patch_config_options({"global.appTest": True}):
+            yield
+    finally:
+        prazos.banco.criar_engine, app_test.Runtime, local_script_runner.ScriptCache, st.secrets = salvos
+        Runtime._instance = None
+
+# ========================================================
+#          CONSULTAS POR SESSÃO E MEMÓRIA
+# ========================================================
+class ContadorConsultas:
+    """Consultas SQL por sessão, pelo contexto do script da thread (a carga paralela herda o da sessão)."""
+
+    def __init__(self, engine):
+        self.lock = threading.Lock()
+        self.por_sessao = defaultdict(int)  # None = segundo plano (agendador, revalidação)
+        event.listen(engine, "after_cursor_execute", self.contar)
+
+    def contar(self, conn, cursor, statement, parameters, context, executemany):
+        ctx = get_script_run_ctx(suppress_warning=True)
+        sessao = None
+        if ctx is not None and CHAVE_SESSAO in ctx.session_state:
+            sessao = ctx.session_state[CHAVE_SESSAO]
+        with self.lock:
+            self.por_sessao[sessao] += 1
+
+    def total(self, sessao):
+        with self.lock:
+            return self.por_sessao[sessao]
+
+def rss_atual():
+    # RSS corrente (Linux); fora dele fica só o pico do getrusage
+    try:
+        paginas = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas * os.sysconf("SC_PAGE_SIZE")
+
+def pico_rss():
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024
+
+class AmostradorMemoria:
+    """Maior RSS visto durante a carga (amostras a cada `intervalo` segundos)."""
+
+    def __init__(self, intervalo=0.05):
+        self.intervalo = intervalo
+        self.inicial = rss_atual()
+        self.pico = self.inicial or 0
+        self.parar = threading.Event()
+        self.thread = threading.Thread(target=self.amostrar, daemon=True)
+
+    def amostrar(self):
+        while not self.parar.wait(self.intervalo):
+            self.pico = max(self.pico, rss_atual() or 0)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *erro):
+        self.parar.set()
+        self.thread.join()
+
+# ========================================================
+#          SESSÃO SIMULADA E ROTEIRO DO USUÁRIO
+# ========================================================
+class Sessao:
+    """Um usuário: AppTest próprio, edições pendentes nos editores e as medidas de cada interação."""
+
+    def __init__(self, indice, contador, seed, pausa, timeout):
+        self.indice = indice
+        self.contador = contador
+        self.rng = np.random.default_rng(seed + indice)
+        self.pausa = pausa
+        self.at = AppTest.from_file(str(SCRIPT_APP), default_timeout=timeout)
+        self.at.session_state[CHAVE_SESSAO] = indice
+        # O navegador reenvia o estado dos data_editor (linhas editadas) em todo rerun,
+        # por id do widget: quando os dados do editor mudam o id muda e as edições somem
+        self.editores = {}
+        self.medidas = []
+
+    def estados_widgets(self):
+        estados = self.at._tree.get_widget_states()
+        for editor in self.at.dataframe:
+            if editor.proto.id in self.editores:
+                estado = WidgetState(id=editor.proto.id, string_value=json.dumps(self.editores[editor.proto.id]))
+                estados.widgets.append(estado)
+        return estados
+
+    def interagir(self, nome, acao=None):
+        if acao is not None:
+            try:
+                acao(self)
+            except Exception as e:  # widget esperado não está na tela: conta como erro e segue o roteiro
+                self.medidas.append({'sessao': self.indice, 'interacao': nome, 'segundos': 0.0, 'consultas': 0,
+                                     'erros': [f"ação falhou: {e!r}"]})
+                return
+        antes = self.contador.total(self.indice)
+        inicio = time.perf_counter()
+        if self.medidas:
+            # Igual ao at.run(), mas com o estado dos editores junto (o AppTest não edita data_editor)
+            self.at._run(self.estados_widgets())
+        else:
+            self.at.run()
+        segundos = time.perf_counter() - inicio
+        erros = [e.value for e in self.at.error] + [str(e.value) for e in self.at.exception]
+        self.medidas.append({
+            'sessao': self.indice, 'interacao': nome, 'segundos': segundos,
+            'consultas': self.contador.total(self.indice) - antes, 'erros': erros,
+        })
+        if self.pausa:
+            time.sleep(self.rng.uniform(0, self.pausa))
+
+    def editor(self, chave):
+        return next((editor for editor in self.at.dataframe if editor.key == chave), None)
+
+    def editar(self, chave, linha, valores):
+        vazio = {'edited_rows': {}, 'added_rows': [], 'deleted_rows': []}
+        edicoes = self.editores.setdefault(self.editor(chave).proto.id, vazio)
+        edicoes['edited_rows'].setdefault(str(linha), {}).update(valores)
+
+    def linhas_do_editor(self, chave):
+        editor = self.editor(chave)
+        return len(editor.value) if editor is not None else 0
+
+def ir_para(aba):
+    return lambda s: s.at.radio(key="aba_ativa").set_value(next(o for o in s.at.radio(key="aba_ativa").options if aba in o))
+
+def filtrar_obras(s):
+    campo = s.at.multiselect[0]
+    obras = list(campo.options)
+    escolhidas = s.rng.choice(obras, size=max(1, len(obras) // 3), replace=False)
+    campo.set_value([o for o in obras if o in set(escolhidas)])
+
+def encurtar_janela(s):
+    campo = s.at.date_input[0]
+    campo.set_value(campo.value + datetime.timedelta(weeks=int(s.rng.integers(2, 12))))
+
+def editar_cadastro(s):
+    linhas = s.linhas_do_editor("editor_cadastro")
+    if linhas:
+        s.editar("editor_cadastro", int(s.rng.integers(linhas)), {'Orcamento': round(float(s.rng.uniform(500, 5000)), 2)})
+
+def editar_previsoes(s):
+    linhas = s.linhas_do_editor("dados_editor")
+    for linha in s.rng.choice(linhas, size=min(3, linhas), replace=False) if linhas else []:
+        s.editar("dados_editor", int(linha), {COLS_PREVISOES[0]: round(float(s.rng.uniform(0, 100)), 1)})
+
+def clicar(rotulo):
+    def clique(s):
+        botoes = [b for b in s.at.button if rotulo in b.label]
+        if not botoes:
+            raise LookupError(f"botão '{rotulo}' não está na tela")
+        botoes[0].click()
+    return clique
+
+# (interação, ação antes do rerun); a primeira abre o app
+ROTEIRO = [
+    ('abrir', None),
+    ('filtrar obras', filtrar_obras),
+    ('mudar datas', encurtar_janela),
+    ('editar cadastro', editar_cadastro),
+    ('salvar cadastro', clicar("Salvar Cadastro")),
+    ('aba tabelas', ir_para("Tabelas")),
+    ('editar previsões', editar_previsoes),
+    ('salvar previsões', clicar("Salvar Previsões")),
+    ('aba gráficos', ir_para("Gráficos")),
+    ('aba tabela geral', ir_para("Tabela Geral")),
+    ('aba planejador', ir_para("Planejador")),
+    ('rodar planejador', clicar("Gerar Projeção")),
+    ('aba cadastro', ir_para("Cadastro")),
+]
+
+def percorrer(sessao, rodadas, largada):
+    largada.wait()  # todas abrem juntas: partida a frio com as sessões disputando os caches
+    for rodada in range(rodadas):
+        for nome, acao in ROTEIRO[1:] if rodada else ROTEIRO:
+            sessao.interagir(nome, acao)
+    return sessao.medidas
+
+# ========================================================
+#          RELATÓRIO
+# ========================================================
+def resumir(medidas):
+    """Por interação: execuções, p50/p95/máx do rerun (ms), consultas SQL médias e erros."""
+    df = pd.DataFrame(medidas)
+    df['ms'] = df['segundos'] * 1000
+    df['com_erro'] = df['erros'].map(bool)
+    ordem = list(dict.fromkeys(nome for nome, _ in ROTEIRO))
+    resumo = df.groupby('interacao').agg(
+        n=('ms', 'size'), p50_ms=('ms', 'median'), p95_ms=('ms', lambda ms: np.percentile(ms, 95)),
+        max_ms=('ms', 'max'), consultas=('consultas', 'mean'), erros=('com_erro', 'sum'),
+    ).reindex(ordem).dropna(how='all')
+    geral = {
+        'interacoes': len(df), 'p50_ms': float(df['ms'].median()), 'p95_ms': float(np.percentile(df['ms'], 95)),
+        'consultas_por_interacao': float(df['consultas'].mean()), 'erros': int(df['com_erro'].sum()),
+    }
+    return resumo, geral
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessoes', type=int, default=8)
+    parser.add_argument('--rodadas', type=int, default=1, help="vezes que cada sessão percorre o roteiro")
+    parser.add_argument('--pausa', type=float, default=0.0, help="pausa máxima (s) entre interações, sorteada")
+    parser.add_argument('--modo', choices=MODOS, default="completa", help="modo_carga do app")
+    parser.add_argument('--obras', type=int, default=40)
+    parser.add_argument('--pecas', type=int, default=2000, help="peças por obra")
+    parser.add_argument('--familias', type=int, default=12)
+    parser.add_argument('--semanas', type=int, default=150, help="duração típica de uma obra")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300, help="limite (s) de cada rerun")
+    parser.add_argument('--pasta', help="pasta do banco local (padrão: temporária)")
+    parser.add_argument('--nao-gravar', action='store_true', help="não grava o resultado em benchmarks/resultados/carga")
+    args = parser.parse_args()
+    # Sem os avisos de depreciação repetidos a cada rerun de cada sessão; a config
+    # é lida antes, porque a leitura dela redefine o nível do log
+    config.get_option("logger.level")
+    set_log_level("error")
+
+    escala = {'obras': args.obras, 'pecas': args.pecas, 'familias': args.familias, 'semanas': args.semanas, 'seed': args.seed}
+    secrets = {
+        'db_host': 'local', 'db_user': 'local', 'db_password': 'local', 'db_name': 'local',
+        'modo_carga': args.modo, 'plannix_coluna_alteracao': 'dataAlteracao',
+        'pasta_snapshot': "",  # partida a frio sempre pelo banco
+    }
+    with tempfile.TemporaryDirectory(prefix="carga-prazos-") as temporaria:
+        engine, linhas_plannix = gravar_banco(args.pasta or temporaria, escala, args.seed)
+        if args.modo == "rollup":
+            atualizar_rollup(engine, completa=True, agora=HOJE)
+        contador = ContadorConsultas(engine)
+        print(f"{linhas_plannix} peças, {args.obras} obras; {args.sessoes} sessões x {args.rodadas} rodada(s), modo {args.modo}")
+
+        sessoes = [Sessao(i, contador, args.seed, args.pausa, args.timeout) for i in range(args.sessoes)]
+        largada = threading.Barrier(len(sessoes))
+        inicio = time.perf_counter()
+        with processo_compartilhado(engine, secrets), AmostradorMemoria() as memoria, \
+                ThreadPoolExecutor(max_workers=len(sessoes)) as pool:
+            futuros = [pool.submit(percorrer, sessao, args.rodadas, largada) for sessao in sessoes]
+            medidas = [medida for futuro in futuros for medida in futuro.result()]
+        duracao = time.perf_counter() - inicio
+        engine.dispose()
+
+    resumo, geral = resumir(medidas)
+    print(resumo.to_string(float_format=lambda v: f"{v:.1f}"))
+    print(f"\nTotal: {geral['interacoes']} interações em {duracao:.1f} s; rerun p50 {geral['p50_ms']:.0f} ms, "
+          f"p95 {geral['p95_ms']:.0f} ms; {geral['consultas_por_interacao']:.2f} consultas/interação; "
+          f"{contador.total(None)} consultas em segundo plano")
+    if memoria.inicial:
+        print(f"Memória (RSS): {memoria.inicial / 2**20:.0f} MB antes das sessões, pico {memoria.pico / 2**20:.0f} MB")
+    print(f"Pico de RSS do processo (getrusage): {pico_rss() / 2**20:.0f} MB")
+    for medida in medidas:
+        for erro in medida['erros']:
+            print(f"  sessão {medida['sessao']}, {medida['interacao']}: {erro}")
+
+    resultado = {
+        'commit': commit_atual(),
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'pandas': pd.__version__, 'streamlit': st.__version__,
+        'maquina': platform.platform(),
+        'escala': escala, 'sessoes': args.sessoes, 'rodadas': args.rodadas, 'pausa': args.pausa, 'modo': args.modo,
+        'duracao_s': duracao, 'geral': geral, 'consultas_segundo_plano': contador.total(None),
+        'rss_inicial_mb': memoria.inicial / 2**20 if memoria.inicial else None,
+        'rss_pico_mb': memoria.pico / 2**20 if memoria.inicial else None,
+        'rss_pico_processo_mb': pico_rss() / 2**20,
+        'interacoes': resumo.reset_index().to_dict('records'),
+    }
+    if not args.nao_gravar:
+        print(f"Resultado gravado em {gravar_resultado(resultado, PASTA_RESULTADOS / 'carga')}")
+    return 1 if geral['erros'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Confere o rollup incremental contra a reconstrução completa, no banco local.
+
+Grava um plannix sintético, roda o rollup completo, altera peças (volumes
+mudados, peças novas, inclusive gravadas no mesmo segundo do watermark) e roda
+o incremental; depois reconstrói tudo e compara semanal, totais e famílias. Sai com
+código 1 se houver diferença.
+
+Uso (da raiz do repositório):
+    python -m benchmarks.conferir_rollup
+    python -m benchmarks.conferir_rollup --obras 60 --pecas 1000
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from prazos.banco import ler_watermark
+from prazos.rollup import atualizar_rollup, ler_semanal_rollup, ler_gerais_rollup, ler_familias_rollup
+
+from .sintetico import HOJE
+from .bench_suite import gravar_banco
+
+COLUNA_ALTERACAO = 'dataAlteracao'
+
+def ler_rollup(engine):
+    with engine.connect() as conn:
+        semanal = ler_semanal_rollup(conn).sort_values(['Obra', 'Semana'], ignore_index=True)
+        gerais = ler_gerais_rollup(conn).sort_values('Obra', ignore_index=True)
+        familias = ler_familias_rollup(conn).sort_values(['Obra', 'Familia'], ignore_index=True)
+    return semanal, gerais, familias
+
+def alterar_pecas(pasta, watermark, rng, n=200):
+    """Muda o volume de n peças e duplica outras n como peças novas (metade no segundo do watermark)."""
+    depois = (pd.Timestamp(watermark) + pd.Timedelta(minutes=30)).strftime('%Y-%m-%d %H:%M:%S')
+    mesmo_segundo = pd.Timestamp(watermark).strftime('%Y-%m-%d %H:%M:%S')
+    with closing(sqlite3.connect(Path(pasta) / 'plannix.db')) as con:
+        total = con.execute("SELECT COUNT(*) FROM plannix").fetchone()[0]
+        alteradas = [int(i) + 1 for i in rng.choice(total, size=n, replace=False)]
+        con.executemany(
+            "UPDATE plannix SET volumeProjetado = volumeProjetado * 1.5, volumeFabricado = volumeFabricado * 1.5,"
+            " volumeMontado = volumeMontado * 1.5, dataAlteracao = ? WHERE rowid = ?",
+            [(depois, i) for i in alteradas],
+        )
+        colunas = [linha[1] for linha in con.execute("PRAGMA table_info(plannix)")]
+        copiar = ", ".join(f"'N' || {c}" if c == 'nomePeca' else ('?' if c == COLUNA_ALTERACAO else c) for c in colunas)
+        novas = [int(i) + 1 for i in rng.choice(total, size=n, replace=False)]
+        con.executemany(
+            f"INSERT INTO plannix ({', '.join(colunas)}) SELECT {copiar} FROM plannix WHERE rowid = ?",
+            [(mesmo_segundo if k % 2 else depois, i) for k, i in enumerate(novas)],
+        )
+        con.commit()
+
+def comparar(nome, incremental, completo):
+    if incremental.shape != completo.shape or not incremental['Obra'].equals(completo['Obra']):
+        print(f"{nome}: linhas diferentes ({len(incremental)} no incremental, {len(completo)} na completa)")
+        return False
+    numericas = incremental.select_dtypes('number').columns
+    diferenca = (incremental[numericas] - completo[numericas]).abs().to_numpy()
+    if np.nanmax(diferenca, initial=0.0) > 1e-6:
+        print(f"{nome}: {int((diferenca > 1e-6).any(axis=1).sum())} linhas com valores diferentes")
+        return False
+    print(f"{nome}: {len(incremental)} linhas iguais")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--obras', type=int, default=30)
+    parser.add_argument('--pecas', type=int, default=500, help="peças por obra")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    escala = {'obras': args.obras, 'pecas': args.pecas, 'familias': 8, 'semanas': 100}
+    with tempfile.TemporaryDirectory(prefix="rollup-prazos-") as pasta:
+        engine, _ = gravar_banco(pasta, escala, args.seed)
+        atualizar_rollup(engine, COLUNA_ALTERACAO, completa=True, agora=HOJE)
+        with engine.connect() as conn:
+            watermark = ler_watermark(conn, COLUNA_ALTERACAO)
+        alterar_pecas(pasta, watermark, np.random.default_rng(args.seed))
+
+        resumo = atualizar_rollup(engine, COLUNA_ALTERACAO, agora=HOJE + pd.Timedelta(hours=1))
+        print(f"Rollup {resumo['modo']}: {resumo['semanas']} semanas e {resumo['obras']} obras regravadas")
+        semanal_inc, gerais_inc, familias_inc = ler_rollup(engine)
+        atualizar_rollup(engine, COLUNA_ALTERACAO, completa=True, agora=HOJE + pd.Timedelta(hours=1))
+        semanal, gerais, familias = ler_rollup(engine)
+        engine.dispose()
+
+    iguais = resumo['modo'] == 'incremental'
+    iguais &= comparar("semanal", semanal_inc, semanal)
+    iguais &= comparar("totais", gerais_inc, gerais)
+    iguais &= comparar("famílias", familias_inc, familias)
+    return 0 if iguais else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Gerador de dados sintéticos no formato da tabela plannix e das tabelas do usuário."""
+import numpy as np
+import pandas as pd
+
+from prazos import OBRAS_UNIFICADAS, COLS_PREVISOES, COLS_DATAS_ORCAMENTO, unificar_obras
+
+HOJE = pd.Timestamp('2025-06-02')
+FAMILIAS_BASE = ["PILAR", "VIGA", "LAJE ALVEOLAR", "PAINEL", "ESCADA", "TERÇA", "CONSOLO", "BLOCO", "TELHA", "ESTACA"]
+
+# ========================================================
+#          PLANNIX (UMA LINHA POR PEÇA)
+# ========================================================
+def nomes_obras(n_obras):
+    # As duas primeiras são um par unificado, para a unificação também entrar na medição
+    nomes = [f"OBRA {i:04d}" for i in range(n_obras)]
+    pares = [nome for par in OBRAS_UNIFICADAS.items() for nome in par]
+    return pares[:n_obras] + nomes[len(pares):]
+
+def nomes_familias(n_familias):
+    return (FAMILIAS_BASE + [f"FAMILIA {i:03d}" for i in range(len(FAMILIAS_BASE), n_familias)])[:n_familias]
+
+def aplicar_pausa(datas, inicio, fim):
+    # Datas dentro da pausa [inicio, fim) são empurradas para depois dela (semanas sem atividade)
+    dentro = (datas >= inicio) & (datas < fim)
+    return datas.where(~dentro, datas + (fim - inicio))
+
+def aplicar_recesso(datas):
+    # Recesso de fim de ano: nada entre 20/12 e 10/01
+    ano = datas.dt.year - (datas.dt.month == 1)
+    inicio = pd.to_datetime(ano.astype('Int64').astype(str) + '-12-20', errors='coerce')
+    return aplicar_pausa(datas, inicio, inicio + pd.Timedelta(days=21))
+
+def gerar_plannix(n_obras=40, pecas_por_obra=2000, n_familias=12, semanas=150, hoje=HOJE, seed=0):
+    """Peças sintéticas com as colunas da tabela plannix (nomeObra, datas das etapas, volumes...).
+
+    Cada obra dura em torno de `semanas` semanas e começa num ponto diferente do
+    passado, então há obras concluídas e em andamento (datas futuras viram NULL).
+    As datas seguem curva S por etapa, com defasagens entre etapas, recesso de fim
+    de ano e uma pausa aleatória em metade das obras, o que deixa lacunas reais na
+    série semanal. Também gera dataAlteracao, para o watermark das cargas incrementais.
+    """
+    rng = np.random.default_rng(seed)
+    obras = np.array(nomes_obras(n_obras), dtype=object)
+    familias = np.array(nomes_familias(n_familias), dtype=object)
+    n = n_obras * pecas_por_obra
+
+    # Calendário de cada obra
+    duracao = semanas * 7 * rng.uniform(0.5, 1.2, n_obras)
+    inicio = hoje - pd.to_timedelta(duracao * rng.uniform(0.2, 2.5, n_obras), unit='D')
+    pausa_ini = inicio + pd.to_timedelta(duracao * rng.uniform(0.1, 0.8, n_obras), unit='D')
+    pausa_dias = np.where(rng.random(n_obras) < 0.5, rng.integers(21, 70, n_obras), 0)
+    pausa_fim = pausa_ini + pd.to_timedelta(pausa_dias, unit='D')
+
+    obra = np.repeat(np.arange(n_obras), pecas_por_obra)
+    hora = pd.to_timedelta(rng.integers(6 * 60, 18 * 60, n), unit='min')
+    d_proj = pd.Series(inicio[obra] + pd.to_timedelta(rng.beta(2, 2, n) * duracao[obra] * 0.45, unit='D') + hora)
+    d_acab = d_proj + pd.to_timedelta(14 + rng.gamma(2.0, 20.0, n), unit='D')
+    d_mont = d_acab + pd.to_timedelta(14 + rng.gamma(2.0, 25.0, n), unit='D')
+
+    p_ini, p_fim = pd.Series(pausa_ini[obra]), pd.Series(pausa_fim[obra])
+    datas = {}
+    for col, serie in [('data_Projeto', d_proj), ('data_Acabamento', d_acab), ('dataMontada', d_mont)]:
+        serie = aplicar_recesso(aplicar_pausa(serie, p_ini, p_fim))
+        datas[col] = serie.where(serie <= hoje).dt.floor('s')
+
+    # Volumes por família (lognormal) só nas etapas já realizadas
+    familia = rng.integers(0, n_familias, n)
+    media_familia = rng.uniform(0.5, 6.0, n_familias)
+    volume_real = rng.lognormal(np.log(media_familia[familia]), 0.35)
+    projetado = datas['data_Projeto'].notna().to_numpy()
+    fabricado = datas['data_Acabamento'].notna().to_numpy()
+    montado = datas['dataMontada'].notna().to_numpy()
+    expedido = montado | (fabricado & (rng.random(n) < 0.3))
+
+    alteracao = pd.concat([datas[c] for c in datas], axis=1).max(axis=1)
+    alteracao = alteracao.fillna(pd.Series(inicio[obra])) + pd.to_timedelta(rng.integers(0, 72, n), unit='h')
+
+    df = pd.DataFrame({
+        'nomeObra': obras[obra],
+        'familia': np.where(rng.random(n) < 0.02, None, familias[familia]),
+        'nomePeca': [f"P{i:07d}" for i in range(n)],
+        **datas,
+        'volumeProjetado': np.where(projetado, volume_real, 0.0),
+        'volumeFabricado': np.where(fabricado, volume_real, 0.0),
+        'volumeAcabado': np.where(fabricado, volume_real, 0.0),
+        'volumeExpedido': np.where(expedido, volume_real, 0.0),
+        'volumeMontado': np.where(montado, volume_real, 0.0),
+        'volumeReal': volume_real,
+        'peso_frouxo_por_volume': rng.uniform(60.0, 140.0, n),
+        'dataAlteracao': alteracao.where(alteracao <= hoje, hoje).dt.floor('s'),
+    })
+    return df
+
+# ========================================================
+#          TABELAS DO USUÁRIO (ORÇAMENTOS E PREVISÕES)
+# ========================================================
+def gerar_orcamentos(df_plannix, seed=0):
+    """Um orçamento por obra unificada, com datas de início/fim das etapas perto das reais."""
+    rng = np.random.default_rng(seed)
+    pecas = unificar_obras(df_plannix.rename(columns={'nomeObra': 'Obra'}))
+    grupos = pecas.groupby('Obra')
+    df = pd.DataFrame({'Orcamento': grupos['volumeReal'].sum() * rng.uniform(1.0, 1.15, grupos.ngroups)})
+    df['Orcamento Lajes'] = np.where(rng.random(len(df)) < 0.3, df['Orcamento'] * 0.2, 0.0)
+    for col_ini, col_fim, col_data in zip(COLS_DATAS_ORCAMENTO[::2], COLS_DATAS_ORCAMENTO[1::2],
+                                          ['data_Projeto', 'data_Acabamento', 'dataMontada']):
+        folga = pd.to_timedelta(rng.integers(-30, 60, len(df)), unit='D')
+        df[col_ini] = (grupos[col_data].min() - folga).dt.normalize()
+        df[col_fim] = (grupos[col_data].max() + folga).dt.normalize()
+    # Parte das obras ainda sem datas cadastradas
+    sem_datas = rng.random(len(df)) < 0.15
+    df.loc[sem_datas, COLS_DATAS_ORCAMENTO] = pd.NaT
+    return df.reset_index()
+
+def gerar_previsoes(df_orcamentos, semanas_previstas=26, hoje=HOJE, seed=0):
+    """Previsões semanais (% acumulado por etapa) nas semanas em torno de hoje, crescentes até 100."""
+    rng = np.random.default_rng(seed)
+    segunda = hoje - pd.Timedelta(days=hoje.weekday())
+    semanas = segunda + pd.to_timedelta(np.arange(-semanas_previstas // 2, semanas_previstas - semanas_previstas // 2), unit='W')
+    obras = df_orcamentos['Obra'].to_numpy()
+    df = pd.DataFrame({
+        'Obra': np.repeat(obras, len(semanas)),
+        'Semana': np.tile(semanas, len(obras)),
+    })
+    for col in COLS_PREVISOES:
+        passos = rng.uniform(0.0, 8.0, (len(obras), len(semanas)))
+        inicio = rng.uniform(0.0, 70.0, (len(obras), 1))
+        df[col] = np.minimum(inicio + np.cumsum(passos, axis=1), 100.0).round(1).reshape(-1)
+    # Nem toda obra tem previsão
+    return df[df['Obra'].isin(obras[rng.random(len(obras)) < 0.7])].reset_index(drop=True)
@@ -0,0 +1,32 @@
+-- ========================================================
+--   ÍNDICES RECOMENDADOS PARA A TABELA PLANNIX
+-- ========================================================
+-- Atendem a carga filtrada (modo_carga = "janela"): cada ramo do semanal filtra
+-- por nomeObra IN (...) e pela sua coluna de data, e lê só o volume da etapa.
+-- Com (nomeObra, data, volume) o MySQL resolve cada ramo por range scan no
+-- índice, sem tocar nas linhas da tabela. Também servem ao catálogo de obras
+-- (MIN/MAX da semana por obra).
+--
+-- Rodar uma vez, fora do horário de uso:
+--   mysql -h <host> -u <usuario> -p plannix-db < migracoes/001_indices_plannix.sql
+--
+-- ALGORITHM=INPLACE, LOCK=NONE mantém a tabela disponível para leitura e escrita
+-- durante a criação. Se nomeObra for TEXT (e não VARCHAR), use um prefixo,
+-- ex.: nomeObra(191).
+
+ALTER TABLE `plannix-db`.`plannix`
+    ADD INDEX idx_plannix_obra_projeto   (nomeObra, data_Projeto, volumeProjetado),
+    ADD INDEX idx_plannix_obra_acabamento (nomeObra, data_Acabamento, volumeFabricado),
+    ADD INDEX idx_plannix_obra_montagem  (nomeObra, dataMontada, volumeMontado),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Conferência: os três ramos devem aparecer com type=range e "Using index".
+-- EXPLAIN SELECT nomeObra, data_Projeto, volumeProjetado FROM `plannix-db`.`plannix`
+--     WHERE nomeObra IN ('OBRA X') AND data_Projeto IS NOT NULL AND volumeProjetado > 0
+--       AND data_Projeto < '2025-01-06';
+
+-- Reversão:
+-- ALTER TABLE `plannix-db`.`plannix`
+--     DROP INDEX idx_plannix_obra_projeto,
+--     DROP INDEX idx_plannix_obra_acabamento,
+--     DROP INDEX idx_plannix_obra_montagem;
@@ -0,0 +1,116 @@
+"""Núcleo de cálculo da Reunião de Prazos, importável sem Streamlit nem banco."""
+from .dados import (
+    OBRAS_UNIFICADAS,
+    ETAPAS_SEMANAIS,
+    unificar_obras,
+    nomes_originais,
+    inicio_semana,
+    montar_semanal,
+    montar_gerais,
+    unificar_gerais,
+    montar_familias,
+    montar_marcos,
+    calcular_medias_marcos,
+    duracoes_marcos,
+    datas_limite_obra,
+    montar_snapshot,
+)
+from .calendario import (
+    EPOCA_SEMANAS,
+    ids_semana,
+    semanas_entre,
+    calendario_entre,
+    rotulos_semana,
+)
+from .calculos import (
+    COLS_VOLUME,
+    COLS_PREVISOES,
+    COLS_DATAS_ORCAMENTO,
+    COLUNAS_TABELA_GERAL,
+    preparar_orcamentos,
+    normalizar_orcamentos,
+    orcamentos_para_editor,
+    preencher_lacunas_cumsum,
+    filtrar_janela,
+    aplicar_orcamentos,
+    aplicar_previsoes_editadas,
+    logica_corte,
+    calcular_tabela_geral,
+    calcular_visao,
+)
+from .planejador import (
+    datas_por_medias,
+    datas_por_referencia,
+    gerar_semanas,
+    projetar_por_familia,
+    perfis_da_obra,
+    perfil_medio,
+    pesos_etapa,
+    ETAPAS_PLANEJADOR,
+    PERCENTIS_SIMULACAO,
+    CENARIOS_PADRAO,
+    simular_cronograma,
+)
+from .memo import (
+    CacheLRU,
+    impressao_digital,
+)
+from .graficos import (
+    METRICAS_GRAFICO,
+    MAX_PONTOS_GRAFICO,
+    decimar_series,
+    dados_grafico,
+)
+
+__all__ = [
+    'OBRAS_UNIFICADAS',
+    'ETAPAS_SEMANAIS',
+    'unificar_obras',
+    'nomes_originais',
+    'inicio_semana',
+    'montar_semanal',
+    'montar_gerais',
+    'unificar_gerais',
+    'montar_familias',
+    'montar_marcos',
+    'calcular_medias_marcos',
+    'duracoes_marcos',
+    'datas_limite_obra',
+    'montar_snapshot',
+    'EPOCA_SEMANAS',
+    'ids_semana',
+    'semanas_entre',
+    'calendario_entre',
+    'rotulos_semana',
+    'COLS_VOLUME',
+    'COLS_PREVISOES',
+    'COLS_DATAS_ORCAMENTO',
+    'COLUNAS_TABELA_GERAL',
+    'preparar_orcamentos',
+    'normalizar_orcamentos',
+    'orcamentos_para_editor',
+    'preencher_lacunas_cumsum',
+    'filtrar_janela',
+    'aplicar_orcamentos',
+    'aplicar_previsoes_editadas',
+    'logica_corte',
+    'calcular_tabela_geral',
+    'calcular_visao',
+    'datas_por_medias',
+    'datas_por_referencia',
+    'gerar_semanas',
+    'projetar_por_familia',
+    'perfis_da_obra',
+    'perfil_medio',
+    'pesos_etapa',
+    'ETAPAS_PLANEJADOR',
+    'PERCENTIS_SIMULACAO',
+    'CENARIOS_PADRAO',
+    'simular_cronograma',
+    'CacheLRU',
+    'impressao_digital',
+    'METRICAS_GRAFICO',
+    'MAX_PONTOS_GRAFICO',
+    'decimar_series',
+    'dados_grafico',
+]
@@ -0,0 +1,359 @@
+"""Acesso ao MySQL: engine com pool, consultas do plannix e tabelas do usuário."""
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text, MetaData, Table, Column, String, Float, Double, Date
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from .calculos import COLS_PREVISOES, COLS_DATAS_ORCAMENTO
+from .dados import (
+    ETAPAS_SEMANAIS, OBRAS_UNIFICADAS, unificar_obras, unificar_gerais, nomes_originais, inicio_semana, montar_snapshot,
+)
+
+# ========================================================
+#          ENGINE COMPARTILHADA (POOL + HEALTH CHECK)
+# ========================================================
+def url_banco(segredos):
+    # Mesmas chaves do .streamlit/secrets.toml
+    return (f"mysql+mysqlconnector://{segredos['db_user']}:{segredos['db_password']}"
+            f"@{segredos['db_host']}:3306/{segredos['db_name']}")
+
+def criar_engine(url, pool_size=5, max_overflow=5, pool_recycle=1800, **opcoes):
+    # pool_pre_ping testa a conexão antes de usar (MySQL derruba conexões ociosas);
+    # pool_recycle renova antes do wait_timeout do servidor
+    return create_engine(
+        url, pool_size=pool_size, max_overflow=max_overflow,
+        pool_pre_ping=True, pool_recycle=pool_recycle, **opcoes
+    )
+
+def carregar_em_paralelo(tarefas, max_workers=4, inicializador=None):
+    """Executa {nome: função sem argumentos} num pool limitado e devolve {nome: resultado}.
+
+    A primeira exceção de qualquer tarefa é relançada depois que todas terminam.
+    """
+    with ThreadPoolExecutor(max_workers=min(max_workers, max(1, len(tarefas))), initializer=inicializador) as pool:
+        futuros = {nome: pool.submit(func) for nome, func in tarefas.items()}
+    return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+# Tabela de peças de uma planta; com várias plantas (prazos.plantas) cada uma
+# passa a sua em `tabela`
+TABELA_PLANNIX = "`plannix-db`.`plannix`"
+
+# ========================================================
+#     SNAPSHOT ÚNICO DA TABELA PLANNIX (UMA SÓ LEITURA)
+# ========================================================
+QUERY_SNAPSHOT = """
+    SELECT
+        nomeObra AS Obra, familia, nomePeca,
+        data_Projeto, data_Acabamento, dataMontada,
+        volumeProjetado, volumeFabricado, volumeAcabado, volumeExpedido, volumeMontado,
+        volumeReal, peso_frouxo_por_volume
+    FROM {tabela};
+"""
+
+def ler_snapshot(engine, tabela=TABELA_PLANNIX):
+    with engine.connect() as conn:
+        df_raw = pd.read_sql_query(text(QUERY_SNAPSHOT.format(tabela=tabela)), conn)
+    return montar_snapshot(df_raw)
+
+# ========================================================
+#     ÍNDICE DE MARCOS (INÍCIO/FIM DAS ETAPAS POR OBRA)
+# ========================================================
+# Uma consulta fixa para todas as obras (sem nome de obra no texto do SQL); os
+# índices (nomeObra, data, ...) de migracoes/001 atendem o MIN/MAX por obra.
+QUERY_MARCOS = """
+    SELECT
+        nomeObra AS Obra,
+        MIN(data_Projeto) AS ini_proj, MAX(data_Projeto) AS fim_proj,
+        MIN(data_Acabamento) AS ini_fab, MAX(data_Acabamento) AS fim_fab,
+        MIN(dataMontada) AS ini_mont, MAX(dataMontada) AS fim_mont
+    FROM {tabela}
+    WHERE nomeObra IS NOT NULL
+    GROUP BY nomeObra
+    ORDER BY nomeObra;
+"""
+
+def ler_marcos(conn, tabela=TABELA_PLANNIX):
+    """Mesmo frame de montar_marcos (por nome original da obra), agregado no banco."""
+    df = pd.read_sql_query(text(QUERY_MARCOS.format(tabela=tabela)), conn)
+    for col in df.columns.drop('Obra'):
+        df[col] = pd.to_datetime(df[col])
+    return df
+
+# ========================================================
+#     TOTAIS E FAMÍLIAS POR OBRA (AGREGADOS NO BANCO)
+# ========================================================
+# Mesmos frames de montar_gerais/montar_familias, para os modos que não leem o
+# snapshot: chega uma linha por obra (ou obra x família), não uma por peça.
+QUERY_GERAIS = """
+    SELECT
+        nomeObra AS Obra,
+        SUM(volumeProjetado) AS Projetado, SUM(volumeFabricado) AS Fabricado, SUM(volumeAcabado) AS Acabado,
+        SUM(volumeExpedido) AS Expedido, SUM(volumeMontado) AS Montado,
+        AVG(peso_frouxo_por_volume) AS `Taxa de Aço`
+    FROM {tabela}
+    WHERE nomeObra IS NOT NULL
+    GROUP BY nomeObra;
+"""
+
+QUERY_FAMILIAS = """
+    SELECT nomeObra AS Obra, familia AS Familia, COUNT(*) AS unidade, SUM(volumeReal) AS Volume
+    FROM {tabela}
+    WHERE nomeObra IS NOT NULL AND familia IS NOT NULL AND nomePeca IS NOT NULL AND volumeReal IS NOT NULL
+    GROUP BY nomeObra, familia;
+"""
+
+def ler_gerais(conn, tabela=TABELA_PLANNIX):
+    df = pd.read_sql_query(text(QUERY_GERAIS.format(tabela=tabela)), conn)
+    df[df.columns.drop('Obra')] = df[df.columns.drop('Obra')].apply(pd.to_numeric, errors='coerce')
+    return unificar_gerais(df)
+
+def ler_familias(conn, tabela=TABELA_PLANNIX):
+    df = pd.read_sql_query(text(QUERY_FAMILIAS.format(tabela=tabela)), conn)
+    df['Volume'] = pd.to_numeric(df['Volume'], errors='coerce')
+    df = unificar_obras(df)
+    return df.groupby(['Obra', 'Familia'], as_index=False)[['unidade', 'Volume']].sum()
+
+# ========================================================
+#     SEMANAL AGREGADO NO BANCO (CARGA INCREMENTAL)
+# ========================================================
+def montar_uniao_semanal(filtro="", tabela=TABELA_PLANNIX):
+    # filtro: condição extra aplicada em cada ramo; "{data}" vira a coluna de data do ramo
+    ramos = []
+    for col_data, col_vol, destino in ETAPAS_SEMANAIS:
+        volumes = ", ".join(
+            f"{col_vol if d == destino else 0} AS {d}" for _, _, d in ETAPAS_SEMANAIS
+        )
+        where = f"{col_data} IS NOT NULL AND {col_vol} > 0"
+        if filtro:
+            where += f" AND ({filtro.format(data=col_data)})"
+        ramos.append(f"""
+            SELECT
+                nomeObra AS Obra,
+                CAST(DATE_SUB({col_data}, INTERVAL WEEKDAY({col_data}) DAY) AS DATE) AS Semana_Inicio,
+                {volumes}
+            FROM {tabela} WHERE {where}""")
+    return "\n            UNION ALL".join(ramos)
+
+def montar_query_semanal(filtro="", coluna_semana="Semana_Inicio", tabela=TABELA_PLANNIX):
+    # coluna_semana permite reagrupar semanas (ex.: saldo anterior à janela numa só linha)
+    return f"""
+        WITH AllData AS ({montar_uniao_semanal(filtro, tabela)}
+        )
+        SELECT
+            Obra, {coluna_semana} AS Semana,
+            SUM(Volume_Projetado) AS Volume_Projetado,
+            SUM(Volume_Fabricado) AS Volume_Fabricado,
+            SUM(Volume_Montado) AS Volume_Montado
+        FROM AllData
+        GROUP BY Obra, {coluna_semana} ORDER BY Obra, Semana;
+    """
+
+def ler_semanal(conn, filtro="", params=None, coluna_semana="Semana_Inicio", tabela=TABELA_PLANNIX):
+    df = pd.read_sql_query(text(montar_query_semanal(filtro, coluna_semana, tabela)), conn, params=params)
+    cols_vol = ['Volume_Projetado', 'Volume_Fabricado', 'Volume_Montado']
+    for col in cols_vol:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['Semana'] = pd.to_datetime(df['Semana'])
+    df = unificar_obras(df)
+    return df.groupby(['Obra', 'Semana'], as_index=False)[cols_vol].sum()
+
+def montar_filtro_obras(obras, params):
+    # IN (...) com um bind por obra; os nomes entram em params
+    marcadores = ", ".join(f":obra_{i}" for i in range(len(obras)))
+    params.update({f"obra_{i}": nome for i, nome in enumerate(obras)})
+    return f"nomeObra IN ({marcadores})"
+
+# ========================================================
+#   CARGA FILTRADA NO BANCO (OBRAS + JANELA DE DATAS)
+# ========================================================
+def ler_catalogo_obras(conn, tabela=TABELA_PLANNIX):
+    """Primeira e última semana com volume de cada obra (opções do filtro e extensão da grade)."""
+    query = f"""
+        WITH AllData AS ({montar_uniao_semanal(tabela=tabela)}
+        )
+        SELECT Obra, MIN(Semana_Inicio) AS Primeira, MAX(Semana_Inicio) AS Ultima
+        FROM AllData GROUP BY Obra ORDER BY Obra;
+    """
+    df = pd.read_sql_query(text(query), conn)
+    for col in ['Primeira', 'Ultima']:
+        df[col] = pd.to_datetime(df[col])
+    df = unificar_obras(df)
+    return df.groupby('Obra', as_index=False).agg(Primeira=('Primeira', 'min'), Ultima=('Ultima', 'max'))
+
+def ler_semanal_janela(conn, obras, data_inicio, data_fim, tabela=TABELA_PLANNIX):
+    """Semanal só das obras escolhidas até o fim da janela.
+
+    Tudo que é anterior à janela chega somado numa única linha por obra (a semana
+    imediatamente antes de data_inicio), que carrega o acumulado de partida.
+    Semanas depois de data_fim não saem do banco. Com o catálogo como limites,
+    preencher_lacunas_cumsum + filtrar_janela dão o mesmo resultado da carga completa.
+    """
+    semana_base = inicio_semana(pd.Series([pd.to_datetime(data_inicio) - pd.Timedelta(days=1)])).iloc[0]
+    semana_cauda = inicio_semana(pd.Series([pd.to_datetime(data_fim)])).iloc[0] + pd.Timedelta(weeks=1)
+    params = {'semana_base': semana_base.date(), 'semana_cauda': semana_cauda.date()}
+    filtro = montar_filtro_obras(nomes_originais(obras), params) + " AND {data} < :semana_cauda"
+    return ler_semanal(conn, filtro, params, coluna_semana="GREATEST(Semana_Inicio, CAST(:semana_base AS DATE))", tabela=tabela)
+
+def ler_watermark(conn, coluna_alteracao, tabela=TABELA_PLANNIX):
+    # Sempre datetime (o driver pode devolver texto, conforme o tipo da coluna)
+    valor = conn.exec_driver_sql(f"SELECT MAX({coluna_alteracao}) FROM {tabela}").scalar()
+    return None if valor is None else pd.Timestamp(valor).to_pydatetime()
+
+def novo_estado_semanal():
+    return {'df': None, 'watermark': None, 'ultima_completa': None, 'ultima_atualizacao': None}
+
+def atualizar_semanal(estado, conn, agora, coluna_alteracao=None, intervalo_carga_completa=pd.Timedelta(hours=6),
+                      tabela=TABELA_PLANNIX):
+    """Atualiza estado['df'] in-place e devolve uma cópia do semanal.
+
+    Obras com peças alteradas desde o último watermark são reagregadas por inteiro;
+    as demais só têm substituídas as semanas a partir da semana da última atualização
+    (na virada de semana, a anterior ainda pode ter mudado depois da última leitura).
+    """
+    ultima = estado.get('ultima_atualizacao')
+    corte = inicio_semana(pd.Series([agora if ultima is None else min(ultima, agora)])).iloc[0]
+    precisa_completa = (
+        estado['df'] is None
+        or estado['ultima_completa'] is None
+        or agora - estado['ultima_completa'] >= intervalo_carga_completa
+    )
+
+    if precisa_completa:
+        novo_watermark = ler_watermark(conn, coluna_alteracao, tabela) if coluna_alteracao else None
+        estado['df'] = ler_semanal(conn, tabela=tabela)
+        estado['ultima_completa'] = agora
+    else:
+        obras_alteradas = []
+        novo_watermark = estado['watermark']
+        if coluna_alteracao and estado['watermark'] is not None:
+            novo_watermark = ler_watermark(conn, coluna_alteracao, tabela)
+            # >=: peças gravadas no mesmo segundo da última leitura também entram (reagregar de novo é inócuo)
+            alteradas = pd.read_sql_query(
+                text(f"SELECT DISTINCT nomeObra FROM {tabela} WHERE {coluna_alteracao} >= :wm"),
+                conn, params={'wm': estado['watermark']}
+            )['nomeObra'].dropna().tolist()
+            obras_alteradas = nomes_originais(set(alteradas) | {OBRAS_UNIFICADAS.get(o, o) for o in alteradas})
+
+        params = {'corte': corte.date()}
+        filtro = "{data} >= :corte"
+        if obras_alteradas:
+            filtro += " OR " + montar_filtro_obras(obras_alteradas, params)
+        df_delta = ler_semanal(conn, filtro, params, tabela=tabela)
+
+        df_atual = estado['df']
+        unificadas = {OBRAS_UNIFICADAS.get(o, o) for o in obras_alteradas}
+        manter = (df_atual['Semana'] < corte) & ~df_atual['Obra'].isin(unificadas)
+        # Linhas antigas de obras alteradas voltam pelo delta; semanas >= corte idem
+        df_delta = df_delta[(df_delta['Semana'] >= corte) | df_delta['Obra'].isin(unificadas)]
+        estado['df'] = pd.concat([df_atual[manter], df_delta], ignore_index=True)
+
+    estado['df'] = estado['df'].sort_values(['Obra', 'Semana'], ignore_index=True)
+    estado['df'].attrs['versao'] = agora.isoformat()
+    estado['watermark'] = novo_watermark
+    estado['ultima_atualizacao'] = agora
+    return estado['df'].copy()
+
+# ========================================================
+# ESQUEMA DAS TABELAS DO USUÁRIO (CHAVES PRIMÁRIAS FIXAS)
+# ========================================================
+metadata_usuario = MetaData()
+
+tabela_orcamentos = Table(
+    'orcamentos_usuario', metadata_usuario,
+    Column('Obra', String(255), primary_key=True),
+    Column('Orcamento', Double),
+    Column('Orcamento Lajes', Double),
+    *[Column(col, Date) for col in COLS_DATAS_ORCAMENTO],
+)
+
+tabela_previsoes = Table(
+    'previsoes_usuario', metadata_usuario,
+    Column('Obra', String(255), primary_key=True),
+    Column('Semana', Date, primary_key=True),
+    *[Column(col, Double) for col in COLS_PREVISOES],
+)
+
+TAMANHO_LOTE_UPSERT = 500
+
+def ler_dados_usuario(engine):
+    df_orcamentos_salvos = pd.DataFrame(columns=["Obra", "Orcamento", "Orcamento Lajes"])
+    df_previsoes_salvas = pd.DataFrame(columns=["Obra", "Semana"] + COLS_PREVISOES)
+
+    try:
+        df_orcamentos_salvos = pd.read_sql_query(text("SELECT * FROM orcamentos_usuario"), engine)
+    except:
+        # Tabela ainda não existe, será criada depois
+        pass
+
+    try:
+        df_previsoes_salvas = pd.read_sql_query(text("SELECT * FROM previsoes_usuario"), engine)
+        if not df_previsoes_salvas.empty:
+            df_previsoes_salvas['Semana'] = pd.to_datetime(df_previsoes_salvas['Semana'])
+    except:
+        pass
+
+    return df_orcamentos_salvos, df_previsoes_salvas
+
+def preparar_registros(df, tabela, parcial=False):
+    # Alinha o DataFrame ao esquema da tabela e converte NaN/NaT em NULL;
+    # parcial: cada registro leva só as colunas preenchidas (o upsert não mexe nas outras)
+    cols = [c.name for c in tabela.columns]
+    chaves = [c.name for c in tabela.primary_key.columns]
+    df = df.reindex(columns=cols)
+    for coluna in tabela.columns:
+        if isinstance(coluna.type, Date):
+            df[coluna.name] = pd.to_datetime(df[coluna.name], errors='coerce').dt.date
+        elif isinstance(coluna.type, Float):
+            df[coluna.name] = pd.to_numeric(df[coluna.name], errors='coerce')
+    df = df.dropna(subset=chaves).drop_duplicates(subset=chaves, keep='last')
+    df = df.astype(object).where(df.notna(), None)
+    registros = df.to_dict('records')
+    if parcial:
+        registros = [{c: v for c, v in r.items() if v is not None or c in chaves} for r in registros]
+        registros = [r for r in registros if len(r) > len(chaves)]
+    return registros
+
+def upsert_registros(conn, tabela, registros):
+    # Um comando por conjunto de colunas: cada registro só atualiza as colunas que traz
+    grupos = {}
+    for registro in registros:
+        grupos.setdefault(tuple(registro), []).append(registro)
+    for colunas, lote in grupos.items():
+        stmt = mysql_insert(tabela)
+        stmt = stmt.on_duplicate_key_update({
+            c: stmt.inserted[c] for c in colunas if not tabela.c[c].primary_key
+        })
+        for i in range(0, len(lote), TAMANHO_LOTE_UPSERT):
+            conn.execute(stmt, lote[i:i + TAMANHO_LOTE_UPSERT])
+
+def migrar_tabela_sem_chave(engine, tabela):
+    # Tabelas antigas vieram do to_sql(if_exists='replace'): sem PK e com tipos TEXT.
+    # Copia para uma tabela nova no esquema fixo e troca os nomes numa só operação.
+    nova = tabela.to_metadata(MetaData(), name=f"{tabela.name}_nova")
+    backup = f"{tabela.name}_antiga_{datetime.datetime.now():%Y%m%d%H%M%S}"
+    df_antigo = pd.read_sql_query(text(f"SELECT * FROM `{tabela.name}`"), engine)
+    with engine.begin() as conn:
+        nova.drop(conn, checkfirst=True)
+        nova.create(conn)
+        upsert_registros(conn, nova, preparar_registros(df_antigo, tabela))
+        conn.execute(text(f"RENAME TABLE `{tabela.name}` TO `{backup}`, `{nova.name}` TO `{tabela.name}`"))
+
+def garantir_esquema_usuario(engine):
+    # Cria as tabelas ou migra as antigas sem chave primária
+    insp = inspect(engine)
+    for tabela in (tabela_orcamentos, tabela_previsoes):
+        if not insp.has_table(tabela.name):
+            tabela.create(engine)
+        elif not insp.get_pk_constraint(tabela.name)['constrained_columns']:
+            migrar_tabela_sem_chave(engine, tabela)
+
+def salvar_registros_usuario(engine, df_previsoes, df_orcamentos):
+    """Grava (upsert) só as linhas recebidas numa transação; o resto das tabelas fica intacto.
+
+    Nas previsões, só as colunas preenchidas de cada linha (as editadas) são gravadas.
+    """
+    with engine.begin() as conn:
+        upsert_registros(conn, tabela_previsoes, preparar_registros(df_previsoes, tabela_previsoes, parcial=True))
+        upsert_registros(conn, tabela_orcamentos, preparar_registros(df_orcamentos, tabela_orcamentos))
@@ -0,0 +1,235 @@
+"""Cálculos das abas (lacunas, orçamentos, corte, tabela geral) como funções puras."""
+import datetime
+import numpy as np
+import pandas as pd
+
+from .calendario import ids_semana, segundas_de_ids, rotulos_semana
+
+COLS_VOLUME = ["Volume_Projetado", "Volume_Fabricado", "Volume_Montado"]
+COLS_PREVISOES = ["Projeto Previsto %", "Fabricação Prevista %", "Montagem Prevista %"]
+COLS_DATAS_ORCAMENTO = ["Ini Projeto", "Fim Projeto", "Ini Fabricacao", "Fim Fabricacao", "Ini Montagem", "Fim Montagem"]
+COLS_ORCAMENTO_ANTIGAS = ["Prazo Projeto", "Prazo Fabricacao", "Prazo Montagem", "Data Inicio"]
+DEFAULTS_ORCAMENTO = {'Orcamento': 100.0, 'Orcamento Lajes': 0.0}
+
+SEMANAS_MARGEM = 10
+
+# ========================================================
+# ORÇAMENTOS (ESTADO DO CADASTRO)
+# ========================================================
+def preparar_orcamentos(todas_obras, df_orcamentos_salvos):
+    df_orcamentos_base = pd.DataFrame({"Obra": todas_obras})
+    return df_orcamentos_base.merge(df_orcamentos_salvos, on="Obra", how="left")
+
+def normalizar_orcamentos(df_orcamentos):
+    # Limpeza de colunas antigas
+    df_orcamentos = df_orcamentos.drop(
+        columns=[c for c in COLS_ORCAMENTO_ANTIGAS if c in df_orcamentos.columns],
+        errors='ignore'
+    )
+
+    # Blindagem de Colunas Novas (Cria se não existir)
+    for col in COLS_DATAS_ORCAMENTO:
+        if col not in df_orcamentos.columns:
+            df_orcamentos[col] = None
+
+    for col, val in DEFAULTS_ORCAMENTO.items():
+        if col not in df_orcamentos.columns:
+            df_orcamentos[col] = val
+        else:
+            df_orcamentos[col] = df_orcamentos[col].fillna(val)
+    return df_orcamentos
+
+def orcamentos_para_editor(df_orcamentos, obras):
+    # Cópia explícita: as colunas são reescritas abaixo e, sem copy-on-write (pandas < 3), o filtro é uma fatia
+    orcamentos_filtrado = df_orcamentos[df_orcamentos['Obra'].isin(obras)].copy()
+    for col in COLS_DATAS_ORCAMENTO:
+        if col not in orcamentos_filtrado.columns: orcamentos_filtrado[col] = None
+        orcamentos_filtrado[col] = pd.to_datetime(orcamentos_filtrado[col], errors='coerce')
+    return orcamentos_filtrado
+
+# ========================================================
+# PREENCHIMENTO DE LACUNAS + ACUMULADO (VETORIZADO)
+# ========================================================
+def preencher_lacunas_cumsum(df_base, obras, semanas_extras=SEMANAS_MARGEM, limites=None):
+    """Grade completa (Obra x semana) com margem de zeros e volumes acumulados por obra.
+
+    limites (Obra, Primeira, Ultima) fixa a extensão da grade de cada obra quando
+    df_base traz só uma janela (carga filtrada no banco); sem ele a extensão sai
+    das próprias semanas de df_base.
+    """
+    dados = df_base[df_base["Obra"].isin(obras)]
+    if limites is not None:
+        limites = limites[limites["Obra"].isin(obras)].sort_values("Obra")
+    if (dados.empty if limites is None else limites.empty):
+        return dados[["Semana"] + COLS_VOLUME + ["Obra"]].copy()
+
+    # Semanas viram ids do calendário (inteiros) para montar a grade com aritmética de arrays
+    semana_int = ids_semana(dados["Semana"])
+    if limites is None:
+        codigos, nomes_obras = pd.factorize(dados["Obra"], sort=True)
+        ini = np.full(len(nomes_obras), np.iinfo(np.int64).max)
+        fim = np.full(len(nomes_obras), np.iinfo(np.int64).min)
+        np.minimum.at(ini, codigos, semana_int)
+        np.maximum.at(fim, codigos, semana_int)
+    else:
+        nomes_obras = pd.Index(limites["Obra"])
+        codigos = nomes_obras.get_indexer(dados["Obra"])
+        ini = ids_semana(limites["Primeira"])
+        fim = ids_semana(limites["Ultima"])
+    ini -= semanas_extras
+    fim += semanas_extras
+
+    if limites is not None:
+        # A linha de saldo anterior de uma obra já encerrada pode cair depois do fim da grade;
+        # nesse caso a grade inteira fica antes da janela e a linha não muda nada visível
+        dentro = (codigos >= 0) & (semana_int >= ini[codigos]) & (semana_int <= fim[codigos])
+        dados, codigos, semana_int = dados[dentro], codigos[dentro], semana_int[dentro]
+
+    tamanhos = fim - ini + 1
+    inicio_bloco = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+    total = int(tamanhos.sum())
+    obra_grade = np.repeat(np.arange(len(nomes_obras)), tamanhos)
+    semana_grade = np.repeat(ini, tamanhos) + (np.arange(total) - np.repeat(inicio_bloco, tamanhos))
+
+    # Soma semanas repetidas direto na posição da grade
+    volumes = np.zeros((total, len(COLS_VOLUME)))
+    posicoes = inicio_bloco[codigos] + (semana_int - ini[codigos])
+    np.add.at(volumes, posicoes, dados[COLS_VOLUME].to_numpy(dtype=float))
+
+    df_grade = pd.DataFrame(volumes, columns=COLS_VOLUME)
+    df_grade = df_grade.groupby(obra_grade).cumsum()
+    # Mantém a representação da entrada (float32 e Obra categórica no modo compacto)
+    df_grade = df_grade.astype({col: dados[col].dtype for col in COLS_VOLUME})
+    df_grade.insert(0, "Semana", segundas_de_ids(semana_grade))
+    df_grade["Semana"] = df_grade["Semana"].astype(dados["Semana"].dtype)
+    if isinstance(dados["Obra"].dtype, pd.CategoricalDtype):
+        df_grade["Obra"] = pd.Categorical.from_codes(obra_grade, categories=pd.Index(nomes_obras, dtype=object))
+    else:
+        df_grade["Obra"] = np.asarray(nomes_obras, dtype=object)[obra_grade]
+    return df_grade
+
+def filtrar_janela(df_para_cumsum, data_inicio, data_fim):
+    df = df_para_cumsum[(df_para_cumsum["Semana"] >= data_inicio) & (df_para_cumsum["Semana"] <= data_fim)]
+    compacto = isinstance(df["Obra"].dtype, pd.CategoricalDtype)
+    return df.assign(Semana_Display=rotulos_semana(df["Semana"], categorico=compacto))
+
+# ========================================================
+# MERGE COM ORÇAMENTOS E PREVISÕES
+# ========================================================
+def aplicar_orcamentos(df, df_orcamentos, df_previsoes_salvas):
+    # No modo compacto, as chaves da direita ganham as categorias de Obra para o merge não voltar a object
+    tipo_obra = df["Obra"].dtype
+    if isinstance(tipo_obra, pd.CategoricalDtype):
+        df_orcamentos = df_orcamentos.astype({"Obra": tipo_obra})
+        df_previsoes_salvas = df_previsoes_salvas.astype({"Obra": tipo_obra})
+    tipo_volume = df[COLS_VOLUME[0]].dtype
+
+    df = df.merge(df_orcamentos, on="Obra", how="left")
+    for col in ["Projetado", "Fabricado", "Montado"]:
+        df[f"{col} %"] = ((df[f"Volume_{col}"] / df["Orcamento"]) * 100).astype(tipo_volume)
+
+    if not df_previsoes_salvas.empty:
+        df = df.merge(df_previsoes_salvas, on=["Obra", "Semana"], how="left")
+    for col in COLS_PREVISOES:
+        df[col] = df[col].fillna(0.0) if col in df.columns else 0.0
+    return df
+
+def aplicar_previsoes_editadas(df, edicoes):
+    """Sobrepõe as previsões editadas ({(Obra, Semana): {coluna: valor}}) ao frame."""
+    if not edicoes:
+        return df
+    df_edicoes = pd.DataFrame(
+        [{'Obra': obra, 'Semana': semana, **valores} for (obra, semana), valores in edicoes.items()]
+    ).set_index(['Obra', 'Semana'])
+    chave = pd.MultiIndex.from_frame(df[['Obra', 'Semana']])
+    # Copy-on-write: cópia rasa, só as colunas de previsão reescritas ganham memória nova
+    df = df.copy(deep=False)
+    for col in COLS_PREVISOES:
+        if col not in df_edicoes.columns:
+            continue
+        valores = df_edicoes[col].reindex(chave).to_numpy()
+        df[col] = np.where(pd.notna(valores), valores, df[col].to_numpy()).astype(float)
+    return df
+
+# ========================================================
+# LÓGICA DE CORTE (PREVISÕES ACUMULADAS ATÉ 100%)
+# ========================================================
+def logica_corte(df_editado):
+    df_calculado = df_editado.sort_values(['Obra', 'Semana'])
+    for col in COLS_PREVISOES:
+        df_calculado[col] = df_calculado[col].replace(0.0, np.nan)
+        df_calculado[col] = df_calculado.groupby('Obra')[col].ffill().fillna(0.0)
+        mask_concluido = df_calculado.groupby('Obra')[col].shift(1) >= 100.0
+        df_calculado.loc[mask_concluido, col] = np.nan
+    return df_calculado
+
+# ========================================================
+# TABELA GERAL (PERCENTUAIS + SALDO DE DIAS)
+# ========================================================
+ETAPAS_GERAIS = ["Projetado", "Fabricado", "Acabado", "Expedido", "Montado"]
+SALDOS_GERAIS = {'Saldo Proj': 'Fim Projeto', 'Saldo Fab': 'Fim Fabricacao', 'Saldo Mont': 'Fim Montagem'}
+
+COLUNAS_TABELA_GERAL = [
+    "Obra", "Planta", "Orcamento", "Orcamento Lajes",
+
+    "Projetado", "Projetado %", "Saldo Proj",
+    "Taxa de Aço",
+
+    "Fabricado", "Fabricado %", "Saldo Fab",
+
+    "Acabado", "Acabado %",
+    "Expedido", "Expedido %",
+
+    "Montado", "Montado %", "Saldo Mont"
+]
+
+def calcular_tabela_geral(df_geral, df_orcamentos, hoje=None):
+    if hoje is None:
+        hoje = datetime.date.today()
+    hoje = pd.to_datetime(hoje)
+
+    df_orc_clean = df_orcamentos.drop_duplicates(subset=['Obra'], keep='first')
+    df_geral = df_geral.merge(df_orc_clean, on="Obra", how="left")
+
+    # Cálculos Numéricos
+    cols_num = ["Orcamento", "Orcamento Lajes"] + ETAPAS_GERAIS
+    for col in cols_num:
+        if col in df_geral.columns: df_geral[col] = df_geral[col].fillna(0.0)
+
+    # Percentuais em bloco: orçamento zero (ou ausente, já zerado acima) vira 0%
+    orcamento = df_geral["Orcamento"].to_numpy(dtype=float)
+    com_orcamento = orcamento > 0
+    divisor = np.where(com_orcamento, orcamento, 1.0)
+    for etapa in ETAPAS_GERAIS:
+        df_geral[f"{etapa} %"] = np.where(com_orcamento, df_geral[etapa].to_numpy(dtype=float) / divisor * 100, 0.0)
+
+    # Cálculo Saldo de Dias (prazo ausente fica NaN)
+    for saldo, col_prazo in SALDOS_GERAIS.items():
+        if col_prazo not in df_geral.columns: df_geral[col_prazo] = None
+        df_geral[col_prazo] = pd.to_datetime(df_geral[col_prazo], errors='coerce')
+        df_geral[saldo] = (df_geral[col_prazo] - hoje).dt.days
+
+    cols_final = [c for c in COLUNAS_TABELA_GERAL if c in df_geral.columns]
+    return df_geral[cols_final]
+
+# ========================================================
+# PIPELINE COMPLETO (SEM INTERFACE)
+# ========================================================
+def calcular_visao(df_base, df_orcamentos, df_previsoes_salvas, obras, data_inicio, data_fim, df_geral=None, hoje=None):
+    """Roda a mesma sequência do app sem Streamlit e devolve os frames de cada aba.
+
+    As previsões entram como estão salvas (sem edições do st.data_editor).
+    """
+    df_orcamentos = normalizar_orcamentos(df_orcamentos)
+    df_para_cumsum = preencher_lacunas_cumsum(df_base, obras)
+    df = filtrar_janela(df_para_cumsum, pd.to_datetime(data_inicio), pd.to_datetime(data_fim))
+    df_para_edicao = aplicar_orcamentos(df, df_orcamentos, df_previsoes_salvas)
+    frames = {
+        'orcamentos': orcamentos_para_editor(df_orcamentos, obras),
+        'para_cumsum': df_para_cumsum,
+        'para_edicao': df_para_edicao,
+        'calculado': logica_corte(df_para_edicao),
+    }
+    if df_geral is not None:
+        frames['geral'] = calcular_tabela_geral(df_geral, df_orcamentos, hoje)
+    return frames
@@ -0,0 +1,67 @@
+"""Dimensão calendário de semanas (segunda-feira) usada pela grade, pelos rótulos e pelo planejador."""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+EPOCA_SEMANAS = np.datetime64('1970-01-05', 'D')  # uma segunda-feira: semana 0
+SEMANAS_POR_BLOCO = 512  # ~10 anos por bloco do calendário
+
+# ========================================================
+#          IDS DE SEMANA (ARITMÉTICA DE ARRAYS)
+# ========================================================
+def ids_semana(datas):
+    """Id inteiro da semana de cada data (semanas desde EPOCA_SEMANAS, começando na segunda)."""
+    dias = np.asarray(pd.to_datetime(datas), dtype='datetime64[D]')
+    return (dias - EPOCA_SEMANAS).astype(np.int64) // 7
+
+def segundas_de_ids(ids):
+    return (EPOCA_SEMANAS + np.asarray(ids, dtype=np.int64) * 7).astype('datetime64[us]')
+
+# ========================================================
+#          TABELA CALENDÁRIO (EM BLOCOS, MEMORIZADA)
+# ========================================================
+@lru_cache(maxsize=None)
+def bloco_calendario(bloco):
+    ids = np.arange(bloco * SEMANAS_POR_BLOCO, (bloco + 1) * SEMANAS_POR_BLOCO, dtype=np.int64)
+    inicio = pd.Series(segundas_de_ids(ids))
+    fim = inicio + pd.Timedelta(days=6)
+    iso = inicio.dt.isocalendar()
+    return pd.DataFrame({
+        'Semana_Id': ids,
+        'Semana': inicio,
+        # Rótulo das telas: "dd/mm á dd/mm (yyyy)"
+        'Semana_Display': (inicio.dt.strftime('%d/%m') + ' á ' + fim.dt.strftime('%d/%m')
+                           + ' (' + inicio.dt.strftime('%Y') + ')').astype(object),
+        'Ano': inicio.dt.year.astype(np.int32),
+        'Ano_ISO': iso['year'].astype(np.int32).to_numpy(),
+        'Semana_ISO': iso['week'].astype(np.int32).to_numpy(),
+    })
+
+def calendario_entre(id_inicio, id_fim):
+    """Linhas do calendário com Semana_Id em [id_inicio, id_fim], índice posicional."""
+    if id_fim < id_inicio:
+        return bloco_calendario(0).iloc[0:0].reset_index(drop=True)
+    blocos = range(int(id_inicio) // SEMANAS_POR_BLOCO, int(id_fim) // SEMANAS_POR_BLOCO + 1)
+    tabela = pd.concat([bloco_calendario(b) for b in blocos], ignore_index=True)
+    deslocamento = int(id_inicio) - int(tabela['Semana_Id'].iat[0])
+    return tabela.iloc[deslocamento:deslocamento + int(id_fim - id_inicio) + 1].reset_index(drop=True)
+
+def semanas_entre(inicio, fim):
+    """Segundas-feiras da semana de inicio até a última segunda <= fim (vazio se faltar data)."""
+    if pd.isna(inicio) or pd.isna(fim):
+        return calendario_entre(0, -1)
+    id_inicio, id_fim = ids_semana([inicio, fim])
+    return calendario_entre(id_inicio, id_fim)
+
+def rotulos_semana(semanas, categorico=False):
+    """Rótulo "dd/mm á dd/mm (yyyy)" de cada semana, buscado no calendário (O(semanas distintas))."""
+    ids = ids_semana(semanas)
+    if len(ids) == 0:
+        return pd.Categorical([]) if categorico else np.array([], dtype=object)
+    unicos, codigos = np.unique(ids, return_inverse=True)
+    tabela = calendario_entre(unicos[0], unicos[-1])
+    rotulos = tabela['Semana_Display'].to_numpy()[unicos - unicos[0]]
+    if categorico:
+        return pd.Categorical.from_codes(codigos, categories=pd.Index(rotulos, dtype=object))
+    return rotulos[codigos]
@@ -0,0 +1,122 @@
+"""Montagem dos frames a partir das linhas brutas do plannix (sem banco, sem Streamlit)."""
+import pandas as pd
+
+# ========================================================
+#          UNIFICAÇÃO DE OBRAS E COLUNAS DO PLANNIX
+# ========================================================
+OBRAS_UNIFICADAS = {'MALL SILVIO SILVEIRA - LOJAS': 'MALL SILVIO SILVEIRA - POA'}
+
+ETAPAS_SEMANAIS = [
+    ("data_Projeto", "volumeProjetado", "Volume_Projetado"),
+    ("data_Acabamento", "volumeFabricado", "Volume_Fabricado"),
+    ("dataMontada", "volumeMontado", "Volume_Montado"),
+]
+
+COLUNAS_VOLUME_RAW = [
+    "volumeProjetado", "volumeFabricado", "volumeAcabado", "volumeExpedido", "volumeMontado",
+    "volumeReal", "peso_frouxo_por_volume",
+]
+
+def unificar_obras(df, coluna='Obra'):
+    df[coluna] = df[coluna].replace(OBRAS_UNIFICADAS)
+    return df
+
+def nomes_originais(obras_unificadas):
+    # Todos os nomes do plannix que caem em cada obra unificada (ex.: LOJAS + POA)
+    nomes = set(obras_unificadas)
+    nomes.update(orig for orig, destino in OBRAS_UNIFICADAS.items() if destino in nomes)
+    return sorted(nomes)
+
+def inicio_semana(datas):
+    # Segunda-feira da semana (equivalente ao DATE_SUB(..., INTERVAL WEEKDAY(...) DAY) do MySQL)
+    datas = pd.to_datetime(datas).dt.normalize()
+    return datas - pd.to_timedelta(datas.dt.weekday, unit='D')
+
+# ========================================================
+#          FRAMES DERIVADOS DO SNAPSHOT
+# ========================================================
+def montar_semanal(df_raw):
+    partes = []
+    cols_vol = [destino for _, _, destino in ETAPAS_SEMANAIS]
+    for col_data, col_vol, destino in ETAPAS_SEMANAIS:
+        mask = df_raw[col_data].notna() & (df_raw[col_vol] > 0)
+        parte = pd.DataFrame({
+            'Obra': df_raw.loc[mask, 'Obra'],
+            'Semana': inicio_semana(df_raw.loc[mask, col_data]),
+        })
+        for col in cols_vol:
+            parte[col] = df_raw.loc[mask, col_vol] if col == destino else 0.0
+        partes.append(parte)
+    df = pd.concat(partes, ignore_index=True)
+    df = unificar_obras(df)
+    return df.groupby(['Obra', 'Semana'], as_index=False)[cols_vol].sum().sort_values(['Obra', 'Semana'], ignore_index=True)
+
+def montar_gerais(df_raw):
+    # Soma por nome original primeiro (como o GROUP BY nomeObra) e só depois unifica
+    grupos = df_raw.groupby('Obra')
+    df_geral = grupos[['volumeProjetado', 'volumeFabricado', 'volumeAcabado', 'volumeExpedido', 'volumeMontado']].sum(min_count=1)
+    df_geral.columns = ['Projetado', 'Fabricado', 'Acabado', 'Expedido', 'Montado']
+    df_geral['Taxa de Aço'] = grupos['peso_frouxo_por_volume'].mean()
+    return unificar_gerais(df_geral.reset_index())
+
+def unificar_gerais(df_geral):
+    # Totais por nome original -> por obra unificada (volumes somam, taxa de aço é a média)
+    df_geral = unificar_obras(df_geral)
+    return df_geral.groupby('Obra', as_index=False).agg({
+        'Projetado': 'sum', 'Fabricado': 'sum', 'Acabado': 'sum',
+        'Expedido': 'sum', 'Montado': 'sum', 'Taxa de Aço': 'mean'
+    })
+
+def montar_familias(df_raw):
+    mask = df_raw['familia'].notna() & df_raw['nomePeca'].notna() & df_raw['volumeReal'].notna()
+    df_familias = df_raw.loc[mask].groupby(['Obra', 'familia'], as_index=False).agg(
+        unidade=('nomePeca', 'count'), Volume=('volumeReal', 'sum')
+    ).rename(columns={'familia': 'Familia'})
+    df_familias = unificar_obras(df_familias)
+    return df_familias.groupby(['Obra', 'Familia'], as_index=False).sum()
+
+def montar_marcos(df_raw):
+    # MIN/MAX das datas de cada etapa por nome original da obra (sem unificação, como nas consultas antigas)
+    datas = df_raw[['Obra', 'data_Projeto', 'data_Acabamento', 'dataMontada']].copy()
+    for col in ['data_Projeto', 'data_Acabamento', 'dataMontada']:
+        datas[col] = pd.to_datetime(datas[col])
+    grupos = datas.groupby('Obra')
+    marcos = pd.DataFrame({
+        'ini_proj': grupos['data_Projeto'].min(), 'fim_proj': grupos['data_Projeto'].max(),
+        'ini_fab': grupos['data_Acabamento'].min(), 'fim_fab': grupos['data_Acabamento'].max(),
+        'ini_mont': grupos['dataMontada'].min(), 'fim_mont': grupos['dataMontada'].max(),
+    })
+    return marcos.reset_index()
+
+def duracoes_marcos(df_marcos):
+    """Durações e defasagens (dias) de cada obra com as três etapas iniciadas, uma linha por obra."""
+    validos = df_marcos.dropna(subset=['ini_proj', 'ini_fab', 'ini_mont'])
+    d = {c: validos[c].dt.normalize() for c in ['ini_proj', 'fim_proj', 'ini_fab', 'fim_fab', 'ini_mont', 'fim_mont']}
+    dias = lambda fim, ini: (d[fim] - d[ini]).dt.days
+    return pd.DataFrame({
+        'Obra': validos['Obra'],
+        'dias_duracao_proj': dias('fim_proj', 'ini_proj'),
+        'dias_lag_fab': dias('ini_fab', 'ini_proj'),
+        'dias_duracao_fab': dias('fim_fab', 'ini_fab'),
+        'dias_lag_mont': dias('ini_mont', 'ini_proj'),
+        'dias_duracao_mont': dias('fim_mont', 'ini_mont'),
+    }).reset_index(drop=True)
+
+def calcular_medias_marcos(df_marcos):
+    return pd.DataFrame([duracoes_marcos(df_marcos).drop(columns='Obra').mean()])
+
+def datas_limite_obra(df_marcos, obra_nome):
+    return df_marcos[df_marcos['Obra'] == obra_nome].drop(columns='Obra').reset_index(drop=True)
+
+def montar_snapshot(df_raw):
+    """Recebe as linhas brutas do plannix e devolve todos os frames de uma vez."""
+    # DECIMAL chega como objeto; converte uma vez para float
+    for col in COLUNAS_VOLUME_RAW:
+        df_raw[col] = pd.to_numeric(df_raw[col], errors='coerce')
+
+    return {
+        'semanal': montar_semanal(df_raw),
+        'gerais': montar_gerais(df_raw),
+        'familias': montar_familias(df_raw),
+        'marcos': montar_marcos(df_raw),
+    }
@@ -0,0 +1,262 @@
+"""Instrumentação dos reruns: tempo por etapa, SQL por carregador, acertos de cache e tamanho dos widgets."""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import event
+
+log = logging.getLogger("prazos.diagnostico")
+
+# ========================================================
+#          MÉTRICAS DO PROCESSO (FORMATO PROMETHEUS)
+# ========================================================
+METRICAS = {
+    'prazos_etapa_segundos_total': ('counter', 'Tempo gasto em cada etapa nomeada do rerun.'),
+    'prazos_etapa_execucoes_total': ('counter', 'Execuções de cada etapa nomeada do rerun.'),
+    'prazos_carregador_segundos_total': ('counter', 'Tempo total dos carregadores (SQL + transferência + pandas).'),
+    'prazos_carregador_execucoes_total': ('counter', 'Leituras do banco feitas por cada carregador.'),
+    'prazos_carregador_linhas_total': ('counter', 'Linhas devolvidas pelos carregadores.'),
+    'prazos_sql_segundos_total': ('counter', 'Tempo de execução das consultas SQL (até o cursor voltar).'),
+    'prazos_sql_consultas_total': ('counter', 'Consultas SQL executadas.'),
+    'prazos_cache_total': ('counter', 'Chamadas a funções com cache, por resultado (acerto/falha).'),
+    'prazos_payload_bytes': ('gauge', 'Tamanho serializado do último envio de cada widget.'),
+}
+
+def escapar_rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Metricas:
+    """Contadores e medidores do processo inteiro (todas as sessões e threads)."""
+
+    def __init__(self, ultimas=200):
+        self.lock = threading.Lock()
+        self.valores = defaultdict(float)  # (nome, rótulos ordenados) -> valor
+        self.ultimas_leituras = deque(maxlen=ultimas)
+
+    def somar(self, nome, valor=1.0, **rotulos):
+        with self.lock:
+            self.valores[(nome, tuple(sorted(rotulos.items())))] += valor
+
+    def definir(self, nome, valor, **rotulos):
+        with self.lock:
+            self.valores[(nome, tuple(sorted(rotulos.items())))] = valor
+
+    def texto_prometheus(self):
+        with self.lock:
+            valores = sorted(self.valores.items())
+        linhas = []
+        for nome, (tipo, ajuda) in METRICAS.items():
+            series = [(rotulos, v) for (n, rotulos), v in valores if n == nome]
+            if not series:
+                continue
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+            for rotulos, valor in series:
+                texto = ",".join(f'{k}="{escapar_rotulo(v)}"' for k, v in rotulos)
+                linhas.append(f"{nome}{{{texto}}} {valor:.6g}" if texto else f"{nome} {valor:.6g}")
+        return "\n".join(linhas) + "\n"
+
+    def gravar(self, arquivo):
+        # Para o textfile collector do node_exporter: troca atômica, nunca um arquivo pela metade
+        arquivo = Path(arquivo)
+        temporario = arquivo.with_name(f".{arquivo.name}.{os.getpid()}.tmp")
+        temporario.write_text(self.texto_prometheus())
+        os.replace(temporario, arquivo)
+
+# ========================================================
+#          REGISTRO DO RERUN (POR THREAD)
+# ========================================================
+# O script de cada sessão e as threads da carga paralela apontam para o registro
+# do rerun; leituras em segundo plano (agendador) ficam sem registro e só entram
+# nas métricas do processo.
+_local = threading.local()
+
+def novo_registro():
+    return {'inicio': time.time(), 'etapas': [], 'leituras': [], 'caches': [], 'payloads': []}
+
+def definir_registro(registro):
+    _local.registro = registro
+
+def registro_atual():
+    return getattr(_local, 'registro', None)
+
+@contextmanager
+def registro_proprio(ao_terminar):
+    """Registro novo para o trecho (ex.: rerun só de um fragmento); ao_terminar(registro) roda no fim."""
+    anterior = registro_atual()
+    registro = novo_registro()
+    definir_registro(registro)
+    try:
+        yield registro
+    finally:
+        definir_registro(anterior)
+        ao_terminar(registro)
+
+@contextmanager
+def medir_etapa(metricas, nome):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        metricas.somar('prazos_etapa_segundos_total', segundos, etapa=nome)
+        metricas.somar('prazos_etapa_execucoes_total', etapa=nome)
+        registro = registro_atual()
+        if registro is not None:
+            registro['etapas'].append({'Etapa': nome, 'Segundos': segundos})
+
+# ========================================================
+#          SQL E CARREGADORES
+# ========================================================
+def instrumentar_engine(engine, metricas):
+    """Mede o execute de cada consulta e atribui ao carregador em andamento na thread."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('inicio_consultas', []).append((time.perf_counter(), context))
+
+    @event.listens_for(engine, "handle_error")
+    def falhou(contexto):
+        # Consulta que falhou não passa pelo after_cursor_execute: tira a entrada dela da pilha
+        conn = contexto.connection
+        pilha = conn.info.get('inicio_consultas') if conn is not None else None
+        if pilha and pilha[-1][1] is contexto.execution_context:
+            pilha.pop()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def depois(conn, cursor, statement, parameters, context, executemany):
+        segundos = time.perf_counter() - conn.info['inicio_consultas'].pop()[0]
+        carregador = getattr(_local, 'carregador', None)
+        if carregador is not None:
+            carregador['sql'] += segundos
+            carregador['consultas'] += 1
+        nome = carregador['nome'] if carregador is not None else 'outros'
+        metricas.somar('prazos_sql_segundos_total', segundos, carregador=nome)
+        metricas.somar('prazos_sql_consultas_total', carregador=nome)
+    return engine
+
+def contar_linhas(resultado):
+    if isinstance(resultado, pd.DataFrame):
+        return len(resultado)
+    if isinstance(resultado, dict):
+        return sum(contar_linhas(v) for v in resultado.values())
+    if isinstance(resultado, (list, tuple)):
+        return sum(contar_linhas(v) for v in resultado)
+    return 0
+
+def instrumentar_carregador(metricas, nome, ler_banco):
+    """Embrulha ler_banco: tempo total, tempo de SQL, linhas e a falha de cache do chamador."""
+    def medido():
+        marcar_falha_cache(nome)
+        anterior = getattr(_local, 'carregador', None)
+        _local.carregador = {'nome': nome, 'sql': 0.0, 'consultas': 0}
+        inicio = time.perf_counter()
+        try:
+            resultado = ler_banco()
+        finally:
+            carregador, _local.carregador = _local.carregador, anterior
+        total = time.perf_counter() - inicio
+        linhas = contar_linhas(resultado)
+        metricas.somar('prazos_carregador_segundos_total', total, carregador=nome)
+        metricas.somar('prazos_carregador_execucoes_total', carregador=nome)
+        metricas.somar('prazos_carregador_linhas_total', linhas, carregador=nome)
+
+        registro = registro_atual()
+        leitura = {
+            'Carregador': nome, 'Origem': 'sessão' if registro is not None else 'segundo plano',
+            'Consultas': carregador['consultas'], 'SQL (s)': carregador['sql'],
+            # O que sobra depois do execute: busca das linhas pela rede + montagem dos frames
+            'Transferência + pandas (s)': total - carregador['sql'], 'Total (s)': total, 'Linhas': linhas,
+            'Quando': pd.Timestamp.now(),
+        }
+        metricas.ultimas_leituras.append(leitura)
+        if registro is not None:
+            registro['leituras'].append(leitura)
+        return resultado
+    return medido
+
+# ========================================================
+#          CACHES E TAMANHO DOS WIDGETS
+# ========================================================
+def marcar_falha_cache(nome):
+    # Chamado no caminho de cálculo de uma função com cache: só roda quando o cache falha
+    falhas = getattr(_local, 'falhas_cache', None)
+    if falhas is not None:
+        falhas.add(nome)
+
+def chamar_com_cache(metricas, nome, funcao, *args, **kwargs):
+    """Chama funcao (st.cache_data, conjunto compartilhado...) e registra acerto ou falha."""
+    externas = getattr(_local, 'falhas_cache', None)
+    _local.falhas_cache = set()
+    try:
+        resultado = funcao(*args, **kwargs)
+        falhou = nome in _local.falhas_cache
+    finally:
+        internas, _local.falhas_cache = _local.falhas_cache, externas
+        if externas is not None:
+            externas.update(internas)
+    metricas.somar('prazos_cache_total', cache=nome, resultado='falha' if falhou else 'acerto')
+    registro = registro_atual()
+    if registro is not None:
+        registro['caches'].append({'Cache': nome, 'Resultado': 'falha' if falhou else 'acerto'})
+    return resultado
+
+def tamanho_payload(objeto):
+    """Bytes aproximados enviados ao navegador: Arrow IPC para frames, JSON da especificação para gráficos."""
+    if isinstance(objeto, pd.DataFrame):
+        try:
+            tabela = pa.Table.from_pandas(objeto, preserve_index=False)
+        except (pa.ArrowException, TypeError, ValueError):
+            return int(objeto.memory_usage(index=False, deep=True).sum())
+        destino = pa.BufferOutputStream()
+        with pa.ipc.new_stream(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        return destino.getvalue().size
+    return len(objeto.to_json().encode('utf-8'))
+
+def registrar_payload(metricas, widget, objeto):
+    try:
+        tamanho = tamanho_payload(objeto)
+    except Exception as e:  # medir nunca pode derrubar a tela
+        log.warning("Falha ao medir o payload de %s: %s", widget, e)
+        return
+    metricas.definir('prazos_payload_bytes', tamanho, widget=widget)
+    registro = registro_atual()
+    if registro is not None:
+        registro['payloads'].append({'Widget': widget, 'KB': tamanho / 1024})
+
+# ========================================================
+#          RESUMO DO RERUN (LOG ESTRUTURADO)
+# ========================================================
+def resumo_registro(registro):
+    return {
+        'inicio': pd.Timestamp.fromtimestamp(registro['inicio']).isoformat(),
+        'segundos': time.time() - registro['inicio'],
+        'fragmento': registro.get('fragmento'),  # None = rerun completo do script
+        'etapas': registro['etapas'],
+        'leituras': [{k: v for k, v in leitura.items() if k != 'Quando'} for leitura in registro['leituras']],
+        'caches': registro['caches'],
+        'payloads': registro['payloads'],
+    }
+
+def configurar_log(nivel="INFO", arquivo=""):
+    """Handler próprio do logger "prazos.diagnostico" (stderr, ou `arquivo`) e seu nível.
+
+    Sem isso o logger herda o WARNING da raiz, sem handler, e a linha por rerun não sai.
+    """
+    if not log.handlers:
+        handler = logging.FileHandler(arquivo, encoding="utf-8") if arquivo else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+        log.addHandler(handler)
+        log.propagate = False  # não duplica se a raiz também tiver handler
+    log.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+
+def registrar_log(registro):
+    # Uma linha JSON por rerun no logger "prazos.diagnostico" (nível INFO)
+    if log.isEnabledFor(logging.INFO):
+        log.info(json.dumps(resumo_registro(registro), ensure_ascii=False, default=str))
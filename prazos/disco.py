@@ -0,0 +1,181 @@
+"""Snapshot em disco (Parquet) e conjuntos de frames compartilhados, atualizados em segundo plano."""
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+# ========================================================
+#          GRUPOS DE FRAMES EM PARQUET (VERSIONADOS)
+# ========================================================
+# Cada grupo ("plannix", "usuario") vira uma pasta <grupo>-<id>/ com um .parquet por
+# frame, e <grupo>.json aponta para a pasta atual. Trocar o manifesto é atômico
+# (os.replace), então um leitor nunca vê um grupo pela metade.
+
+def gravar_grupo(pasta, grupo, frames, versao, compressao='zstd'):
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    destino = pasta / f"{grupo}-{uuid.uuid4().hex[:12]}"
+    destino.mkdir()
+    for nome, df in frames.items():
+        df.to_parquet(destino / f"{nome}.parquet", compression=compressao, index=False)
+
+    manifesto = pasta / f"{grupo}.json"
+    anterior = ler_manifesto(pasta, grupo)
+    temporario = pasta / f".{grupo}-{uuid.uuid4().hex[:12]}.json"
+    temporario.write_text(json.dumps({
+        'versao': versao,
+        'pasta': destino.name,
+        'frames': list(frames),
+        'gravado_em': datetime.datetime.now().isoformat(),
+    }))
+    os.replace(temporario, manifesto)
+
+    # Mantém a versão anterior (algum leitor pode estar no meio dela) e apaga o resto
+    manter = {destino.name, anterior['pasta'] if anterior else None}
+    for antiga in pasta.glob(f"{grupo}-*"):
+        if antiga.is_dir() and antiga.name not in manter:
+            shutil.rmtree(antiga, ignore_errors=True)
+
+def ler_manifesto(pasta, grupo):
+    try:
+        return json.loads((Path(pasta) / f"{grupo}.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+def ler_grupo(pasta, grupo, memory_map=True):
+    """Devolve (frames, versao) do disco ou None se não houver snapshot legível."""
+    manifesto = ler_manifesto(pasta, grupo)
+    if manifesto is None:
+        return None
+    origem = Path(pasta) / manifesto['pasta']
+    try:
+        frames = {
+            nome: pd.read_parquet(origem / f"{nome}.parquet", memory_map=memory_map)
+            for nome in manifesto['frames']
+        }
+    except (OSError, ValueError):
+        return None
+    for df in frames.values():
+        df.attrs['versao'] = manifesto['versao']
+    return frames, manifesto['versao']
+
+# ========================================================
+#   CONJUNTOS EM MEMÓRIA (MEMÓRIA -> DISCO -> BANCO)
+# ========================================================
+# Stale-while-revalidate: depois da primeira carga, quem lê nunca espera o banco.
+# Frames vencidos continuam sendo servidos enquanto uma thread relê o banco e
+# troca a versão de uma vez (sob o lock); se o banco falhar, fica a última boa.
+REVALIDACAO_PADRAO = pd.Timedelta(minutes=5)
+
+def novo_conjunto(nome):
+    return {
+        'nome': nome, 'frames': None, 'versao': None, 'origem': None, 'carregado_em': None,
+        'vencido': False, 'revalidando': False, 'tentativa_em': None, 'erro': None,
+        'ler_banco': None, 'pasta': None, 'ttl': None,
+        'lock': threading.Lock(),
+    }
+
+def ler_do_banco(conjunto, ler_banco, pasta):
+    # Lê do banco, carimba a versão em attrs e regrava o disco (falha de disco não derruba o app)
+    agora = pd.Timestamp.now()
+    frames = ler_banco()
+    versao = agora.isoformat()
+    for df in frames.values():
+        df.attrs['versao'] = versao
+    if pasta:
+        try:
+            gravar_grupo(pasta, conjunto['nome'], frames, versao)
+        except OSError:
+            pass
+    return frames, versao, agora
+
+def revalidar(conjunto):
+    """Relê o banco e troca a versão; em caso de erro guarda a exceção e mantém os frames."""
+    inicio = pd.Timestamp.now()
+    try:
+        frames, versao, agora = ler_do_banco(conjunto, conjunto['ler_banco'], conjunto['pasta'])
+        with conjunto['lock']:
+            # Se uma carga síncrona já trouxe algo mais novo, não volta atrás
+            if conjunto['origem'] == 'disco' or conjunto['carregado_em'] is None or conjunto['carregado_em'] <= inicio:
+                conjunto.update(frames=frames, versao=versao, origem='banco', carregado_em=agora, erro=None)
+    except Exception as e:
+        conjunto['erro'] = e
+    finally:
+        conjunto['revalidando'] = False
+
+def marcar_revalidacao(conjunto):
+    # Chamar com o lock do conjunto; devolve False se já há uma revalidação em andamento
+    if conjunto['revalidando']:
+        return False
+    conjunto['revalidando'] = True
+    conjunto['tentativa_em'] = pd.Timestamp.now()
+    return True
+
+def revalidar_em_segundo_plano(conjunto):
+    if marcar_revalidacao(conjunto):
+        threading.Thread(target=revalidar, args=(conjunto,), name=f"revalidar-{conjunto['nome']}", daemon=True).start()
+
+def obter_conjunto(conjunto, ler_banco, pasta=None, ttl=None, memory_map=True):
+    """Frames do conjunto: da memória; senão do disco (revalidando em segundo plano); senão do banco.
+
+    ler_banco() devolve {nome: DataFrame}. Só a primeira carga sem disco (ou uma
+    carga pedida via conjunto['vencido']) espera o banco; com ttl, frames mais
+    velhos que isso disparam a releitura em segundo plano e continuam servidos.
+    Os frames são compartilhados: quem usar não deve alterá-los in-place.
+    """
+    agora = pd.Timestamp.now()
+    with conjunto['lock']:
+        conjunto.update(ler_banco=ler_banco, pasta=pasta, ttl=ttl)
+        if conjunto['frames'] is None and pasta:
+            lido = ler_grupo(pasta, conjunto['nome'], memory_map)
+            if lido is not None:
+                frames, versao = lido
+                conjunto.update(frames=frames, versao=versao, origem='disco', carregado_em=agora)
+                revalidar_em_segundo_plano(conjunto)
+
+        if conjunto['frames'] is None:
+            frames, versao, carregado_em = ler_do_banco(conjunto, ler_banco, pasta)
+            conjunto.update(frames=frames, versao=versao, origem='banco', carregado_em=carregado_em)
+        elif conjunto['vencido']:
+            conjunto['vencido'] = False
+            try:
+                frames, versao, carregado_em = ler_do_banco(conjunto, ler_banco, pasta)
+                conjunto.update(frames=frames, versao=versao, origem='banco', carregado_em=carregado_em, erro=None)
+            except Exception as e:
+                conjunto['erro'] = e
+                revalidar_em_segundo_plano(conjunto)
+        else:
+            espera = ttl or REVALIDACAO_PADRAO
+            desatualizado = conjunto['origem'] == 'disco' or (ttl is not None and agora - conjunto['carregado_em'] >= ttl)
+            if desatualizado and (conjunto['tentativa_em'] is None or agora - conjunto['tentativa_em'] >= espera):
+                revalidar_em_segundo_plano(conjunto)
+        return conjunto['frames']
+
+# ========================================================
+#          AGENDADOR DE ATUALIZAÇÃO EM SEGUNDO PLANO
+# ========================================================
+def iniciar_agendador(conjuntos, intervalo):
+    """Thread que, a cada intervalo, relê em sequência os conjuntos já usados que têm ttl.
+
+    Assim os dados compartilhados ficam frescos mesmo sem ninguém acessar, e a
+    releitura por acesso (em obter_conjunto) vira só uma rede de segurança.
+    """
+    def laco():
+        while True:
+            time.sleep(intervalo.total_seconds())
+            for conjunto in conjuntos:
+                with conjunto['lock']:
+                    pronto = conjunto['ler_banco'] is not None and conjunto['ttl'] is not None
+                    pronto = pronto and marcar_revalidacao(conjunto)
+                if pronto:
+                    revalidar(conjunto)
+
+    agendador = threading.Thread(target=laco, name="agendador-dados", daemon=True)
+    agendador.start()
+    return agendador
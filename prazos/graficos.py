@@ -0,0 +1,76 @@
+"""Dados do gráfico de Tendências: formato longo, limitado em pontos (decimação M4 por série)."""
+import numpy as np
+import pandas as pd
+
+METRICAS_GRAFICO = ["Projetado %", "Projeto Previsto %", "Fabricado %", "Fabricação Prevista %", "Montado %", "Montagem Prevista %"]
+MAX_PONTOS_GRAFICO = 4000  # abaixo do limite padrão de 5000 linhas do Altair
+OUTRAS_OBRAS = "Outras obras"
+
+def decimar_series(df, chaves, col_x, col_y, max_por_serie):
+    """Reduz cada série a no máximo ~max_por_serie pontos preservando o formato.
+
+    Cada série é dividida em baldes consecutivos e de cada balde ficam o primeiro,
+    o último, o mínimo e o máximo (M4). Séries curtas passam inteiras.
+    """
+    if df.empty:
+        return df
+    df = df.sort_values(chaves + [col_x], ignore_index=True)
+    serie = df.groupby(chaves, sort=False).ngroup().to_numpy()
+    tamanho = np.bincount(serie)[serie]
+    posicao = df.groupby(serie).cumcount().to_numpy()
+
+    n_baldes = max(1, max_por_serie // 4)
+    balde = np.where(tamanho <= max_por_serie, posicao, posicao * n_baldes // np.maximum(tamanho, 1))
+
+    grupos = df[[col_y]].assign(_serie=serie, _balde=balde).groupby(['_serie', '_balde'])[col_y]
+    primeiro_ultimo = df.index.to_series().groupby([serie, balde]).agg(['first', 'last'])
+    manter = np.unique(np.concatenate([
+        primeiro_ultimo['first'].to_numpy(), primeiro_ultimo['last'].to_numpy(),
+        grupos.idxmin().to_numpy(), grupos.idxmax().to_numpy(),
+    ]))
+    return df.loc[manter].reset_index(drop=True)
+
+def agrupar_outras(df_melt, obras_manter):
+    # Obras fora da lista viram uma série por métrica: a média semanal entre elas
+    outras = ~df_melt["Obra"].isin(obras_manter)
+    if not outras.any():
+        return df_melt
+    media = df_melt[outras].groupby(["Métrica", "Semana"], as_index=False)["Porcentagem"].mean()
+    return pd.concat([df_melt[~outras], media.assign(Obra=OUTRAS_OBRAS)], ignore_index=True)
+
+def ordem_obras(df_calculado):
+    # Maior volume projetado acumulado (o último da janela) primeiro; o orçamento só desempata,
+    # porque sem cadastro todas as obras ficam com o padrão de 100
+    colunas = [c for c in ("Volume_Projetado", "Orcamento") if c in df_calculado.columns]
+    if not colunas:
+        return pd.Index(df_calculado["Obra"].unique())
+    maiores = df_calculado.groupby("Obra", observed=True)[colunas].max()
+    return maiores.sort_values(colunas, ascending=False, kind="stable").index
+
+def dados_grafico(df_calculado, max_pontos=MAX_PONTOS_GRAFICO):
+    """Formato longo (Obra, Semana, Métrica, Porcentagem) com no máximo ~max_pontos linhas.
+
+    Cada série precisa de até 4 pontos (início, fim e extremos). Se obras x métricas
+    passar de max_pontos / 4, ficam as obras de maior volume projetado e as demais viram
+    "Outras obras" (média semanal), então o limite vale para qualquer número de obras.
+    """
+    metricas = [c for c in METRICAS_GRAFICO if c in df_calculado.columns]
+    df_melt = df_calculado.melt(id_vars=["Obra", "Semana"], value_vars=metricas,
+                                var_name="Métrica", value_name="Porcentagem")
+    df_melt = df_melt.dropna(subset=["Porcentagem"])
+    if df_melt.empty:
+        return df_melt
+
+    n_metricas = df_melt["Métrica"].nunique()
+    max_series = max(n_metricas, max_pontos // 4)
+    if df_melt.groupby(["Obra", "Métrica"]).ngroups > max_series:
+        # Uma vaga por métrica fica para "Outras obras"
+        n_obras = max_series // n_metricas - 1
+        df_melt = agrupar_outras(df_melt, list(ordem_obras(df_calculado)[:n_obras]))
+
+    n_series = df_melt.groupby(["Obra", "Métrica"]).ngroups
+    max_por_serie = max(4, max_pontos // n_series)
+    df_melt = decimar_series(df_melt, ["Obra", "Métrica"], "Semana", "Porcentagem", max_por_serie)
+    # Uma casa decimal basta para o gráfico e encurta o JSON enviado ao navegador
+    df_melt["Porcentagem"] = df_melt["Porcentagem"].astype(float).round(1)
+    return df_melt
@@ -0,0 +1,33 @@
+"""Cache LRU pequeno para frames derivados, chaveado por uma impressão digital das entradas."""
+import hashlib
+from collections import OrderedDict
+
+def impressao_digital(*partes):
+    # repr de tuplas/strings/datas é estável; o hash só encurta a chave
+    return hashlib.blake2b(repr(partes).encode('utf-8'), digest_size=16).hexdigest()
+
+class CacheLRU:
+    def __init__(self, max_itens=8):
+        self.max_itens = max_itens
+        self.itens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, calcular):
+        """Devolve o valor da chave ou calcula, guarda e descarta o menos usado."""
+        if chave in self.itens:
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return self.itens[chave]
+        valor = calcular()
+        self.falhas += 1
+        self.itens[chave] = valor
+        while len(self.itens) > self.max_itens:
+            self.itens.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        self.itens.clear()
+
+    def __len__(self):
+        return len(self.itens)
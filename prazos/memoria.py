@@ -0,0 +1,64 @@
+"""Representação compacta dos frames e medição de memória por sessão."""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .memo import CacheLRU
+
+# ========================================================
+#          MODO COMPACTO (CATEGORIAS + FLOAT32)
+# ========================================================
+COLUNAS_CATEGORICAS = ('Obra', 'Familia')
+
+def compactar_frame(df):
+    """Obra/Família viram categorias, floats viram float32 e inteiros o menor tipo que cabe."""
+    df = df.copy(deep=False)
+    for col in df.columns:
+        serie = df[col]
+        if col in COLUNAS_CATEGORICAS and not isinstance(serie.dtype, pd.CategoricalDtype):
+            df[col] = serie.astype('category')
+        elif serie.dtype == np.float64:
+            df[col] = serie.astype(np.float32)
+        elif serie.dtype == np.int64:
+            df[col] = pd.to_numeric(serie, downcast='integer')
+    return df
+
+def compactar_frames(frames):
+    return {nome: compactar_frame(df) for nome, df in frames.items()}
+
+# ========================================================
+#          MEDIÇÃO DE MEMÓRIA
+# ========================================================
+def tamanho_bytes(objeto, vistos=None):
+    """Bytes ocupados por objeto, descendo em dicts, listas, tuplas e CacheLRU.
+
+    Frames contam com memory_usage(deep=True); um mesmo objeto só conta uma vez.
+    """
+    vistos = set() if vistos is None else vistos
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    if isinstance(objeto, pd.DataFrame):
+        return int(objeto.memory_usage(index=True, deep=True).sum())
+    if isinstance(objeto, (pd.Series, pd.Index)):
+        return int(objeto.memory_usage(deep=True))
+    if isinstance(objeto, np.ndarray):
+        return objeto.nbytes
+    if isinstance(objeto, CacheLRU):
+        return tamanho_bytes(objeto.itens, vistos)
+    if isinstance(objeto, dict):
+        return sys.getsizeof(objeto) + sum(
+            tamanho_bytes(k, vistos) + tamanho_bytes(v, vistos) for k, v in objeto.items()
+        )
+    if isinstance(objeto, (list, tuple, set, frozenset)):
+        return sys.getsizeof(objeto) + sum(tamanho_bytes(v, vistos) for v in objeto)
+    return sys.getsizeof(objeto)
+
+def relatorio_memoria(itens):
+    """{nome: objeto} -> DataFrame (Item, MB) do maior para o menor, com linha de total."""
+    vistos = set()
+    linhas = [{'Item': nome, 'MB': tamanho_bytes(obj, vistos) / 2**20} for nome, obj in itens.items()]
+    df = pd.DataFrame(linhas, columns=['Item', 'MB']).sort_values('MB', ascending=False, ignore_index=True)
+    total = pd.DataFrame([{'Item': 'Total', 'MB': df['MB'].sum()}])
+    return pd.concat([df, total], ignore_index=True).round({'MB': 2})
@@ -0,0 +1,266 @@
+"""Projeção de cronograma do Planejador (datas das etapas + distribuição semanal)."""
+import numpy as np
+import pandas as pd
+
+from .calendario import EPOCA_SEMANAS, semanas_entre, ids_semana, calendario_entre
+
+# ========================================================
+# DATAS DAS ETAPAS DA NOVA OBRA
+# ========================================================
+def datas_por_medias(df_medias, data_inicio):
+    if df_medias.empty:
+        return None
+    media = df_medias.iloc[0]
+    ini_p = pd.to_datetime(data_inicio)
+    # Exemplo simples de projeção linear baseado nas médias
+    fim_p = ini_p + pd.Timedelta(days=media['dias_duracao_proj'])
+    ini_f = ini_p + pd.Timedelta(days=media['dias_lag_fab'])
+    fim_f = ini_f + pd.Timedelta(days=media['dias_duracao_fab'])
+    ini_m = ini_p + pd.Timedelta(days=media['dias_lag_mont'])
+    fim_m = ini_m + pd.Timedelta(days=media['dias_duracao_mont'])
+    return {'ini_proj': ini_p, 'fim_proj': fim_p, 'ini_fab': ini_f, 'fim_fab': fim_f, 'ini_mont': ini_m, 'fim_mont': fim_m}
+
+def datas_por_referencia(df_datas, data_inicio):
+    if df_datas.empty or df_datas.iloc[0].isnull().all():
+        return None
+    raw = df_datas.iloc[0]
+    # Calcula durações da obra referência e aplica na nova data de início
+    dur_p = (raw['fim_proj'] - raw['ini_proj']).days
+    lag_f = (raw['ini_fab'] - raw['ini_proj']).days
+    dur_f = (raw['fim_fab'] - raw['ini_fab']).days
+    lag_m = (raw['ini_mont'] - raw['ini_proj']).days
+    dur_m = (raw['fim_mont'] - raw['ini_mont']).days
+
+    ini_p = pd.to_datetime(data_inicio)
+    return {
+        'ini_proj': ini_p, 'fim_proj': ini_p + pd.Timedelta(days=dur_p),
+        'ini_fab': ini_p + pd.Timedelta(days=lag_f), 'fim_fab': (ini_p + pd.Timedelta(days=lag_f)) + pd.Timedelta(days=dur_f),
+        'ini_mont': ini_p + pd.Timedelta(days=lag_m), 'fim_mont': (ini_p + pd.Timedelta(days=lag_m)) + pd.Timedelta(days=dur_m)
+    }
+
+# ========================================================
+# PERFIS DE DISTRIBUIÇÃO (CURVA REAL DAS OBRAS)
+# ========================================================
+ETAPAS_PLANEJADOR = [
+    ("Projeto", "ini_proj", "fim_proj", "Volume_Projetado"),
+    ("Fabricação", "ini_fab", "fim_fab", "Volume_Fabricado"),
+    ("Montagem", "ini_mont", "fim_mont", "Volume_Montado"),
+]
+PONTOS_PERFIL_MEDIO = 52
+
+def curva_semanal(semana_ids, volumes):
+    # Volume por semana do primeiro ao último id com volume (semanas vazias no meio viram zero)
+    com_volume = volumes > 0
+    if not com_volume.any():
+        return None
+    ids = semana_ids[com_volume]
+    return np.bincount(ids - ids.min(), weights=volumes[com_volume])
+
+def perfis_da_obra(df_semanal, obra):
+    """{etapa: volume semanal da obra na etapa} a partir do semanal realizado (None se não houver)."""
+    dados = df_semanal[df_semanal['Obra'] == obra]
+    ids = ids_semana(dados['Semana'])
+    return {
+        etapa: curva_semanal(ids, dados[col].to_numpy(dtype=float))
+        for etapa, _, _, col in ETAPAS_PLANEJADOR
+    }
+
+def perfil_medio(df_semanal, pontos=PONTOS_PERFIL_MEDIO):
+    """{etapa: curva média} das curvas acumuladas de todas as obras, normalizadas para a mesma duração.
+
+    Sem laço por obra: um groupby dá início, fim e total de cada obra em cada etapa,
+    as curvas viram uma matriz obra x semana e a reamostragem é uma interpolação em bloco.
+    """
+    ids = ids_semana(df_semanal['Semana'])
+    obras = pd.factorize(df_semanal['Obra'])[0]
+    colunas = [col for _, _, _, col in ETAPAS_PLANEJADOR]
+    volumes = df_semanal[colunas].to_numpy(dtype=float)
+    com_volume = volumes > 0
+    # Semanas sem volume não contam para início/fim (NaN some no min/max)
+    grupos = pd.DataFrame(
+        np.hstack([np.where(com_volume, ids[:, None], np.nan), np.where(com_volume, volumes, 0.0)])
+    ).groupby(obras)
+    n = len(colunas)
+    inicios, fins = grupos[list(range(n))].min().to_numpy(), grupos[list(range(n))].max().to_numpy()
+    totais = grupos[list(range(n, 2 * n))].sum().to_numpy()
+
+    x_comum = np.linspace(0, 1, pontos + 1)
+    perfis = {}
+    for e, (etapa, _, _, _) in enumerate(ETAPAS_PLANEJADOR):
+        tem = ~np.isnan(inicios[:, e])
+        if not tem.any():
+            perfis[etapa] = None
+            continue
+        # Linha de cada obra com volume na matriz (obras sem volume na etapa ficam de fora)
+        mapa = np.cumsum(tem) - 1
+        inicio, total = inicios[tem, e].astype(int), totais[tem, e]
+        duracao = fins[tem, e].astype(int) - inicio + 1
+        largura = duracao.max()
+
+        # Fração do total de cada obra por semana, do primeiro ao último volume (semanas vazias = 0)
+        linha = mapa[obras[com_volume[:, e]]]
+        deslocamento = ids[com_volume[:, e]] - inicio[linha]
+        fracoes = np.bincount(
+            linha * largura + deslocamento, weights=volumes[com_volume[:, e], e], minlength=len(inicio) * largura
+        ).reshape(len(inicio), largura) / total[:, None]
+        acumulado = np.concatenate([np.zeros((len(inicio), 1)), np.cumsum(fracoes, axis=1)], axis=1)
+
+        # Acumulado de cada obra nos mesmos pontos relativos (linear dentro da semana, como np.interp)
+        posicao = x_comum[None, :] * duracao[:, None]
+        semana = np.minimum(posicao.astype(int), duracao[:, None] - 1)
+        linhas = np.arange(len(inicio))[:, None]
+        curvas = acumulado[linhas, semana] + (posicao - semana) * fracoes[linhas, semana]
+        perfis[etapa] = np.diff(curvas.mean(axis=0))
+    return perfis
+
+def pesos_etapa(n_semanas, perfil=None):
+    """Fração do total da etapa em cada uma das n semanas (soma 1).
+
+    Sem perfil é linear; com perfil, a curva acumulada do perfil é reamostrada
+    para n semanas, mantendo a forma (ex.: curva S) com a nova duração.
+    """
+    if n_semanas == 0:
+        return np.zeros(0)
+    if perfil is None or np.sum(perfil) <= 0:
+        return np.full(n_semanas, 1.0 / n_semanas)
+    acumulado = np.concatenate(([0.0], np.cumsum(perfil) / np.sum(perfil)))
+    x_perfil = np.linspace(0, 1, len(perfil) + 1)
+    return np.diff(np.interp(np.linspace(0, 1, n_semanas + 1), x_perfil, acumulado))
+
+# ========================================================
+# DISTRIBUIÇÃO SEMANAL (VOLUME E PEÇAS POR FAMÍLIA)
+# ========================================================
+def gerar_semanas(inicio, fim):
+    # Segundas-feiras (meia-noite) do calendário entre inicio e fim
+    return list(semanas_entre(inicio, fim)['Semana'])
+
+def projetar_por_familia(datas, df_familias, perfis=None):
+    """Projeta volume e peças acumulados por semana, etapa e família com operações de array.
+
+    df_familias tem Familia, Quantidade e Volume; perfis é {etapa: curva} (ver
+    pesos_etapa). Devolve {'resumo': totais por semana (uma coluna por etapa),
+    'familias': formato longo Semana x Etapa x Família}.
+    """
+    perfis = perfis or {}
+    familias = df_familias['Familia'].astype(object).to_numpy()
+    volumes = pd.to_numeric(df_familias['Volume'], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    quantidades = pd.to_numeric(df_familias['Quantidade'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    # Semanas de cada etapa como faixas de ids do calendário; a projeção cobre a união
+    faixas = []
+    for etapa, col_ini, col_fim, _ in ETAPAS_PLANEJADOR:
+        semanas = semanas_entre(datas[col_ini], datas[col_fim])
+        faixas.append(semanas['Semana_Id'].to_numpy())
+    ids = np.unique(np.concatenate(faixas))
+    calendario = calendario_entre(ids[0], ids[-1]) if len(ids) else calendario_entre(0, -1)
+    calendario = calendario[calendario['Semana_Id'].isin(ids)]
+
+    # Pesos (etapas x semanas): cada etapa espalha 100% nas suas semanas
+    pesos = np.zeros((len(ETAPAS_PLANEJADOR), len(ids)))
+    for i, ((etapa, _, _, _), faixa) in enumerate(zip(ETAPAS_PLANEJADOR, faixas)):
+        pesos[i, np.searchsorted(ids, faixa)] = pesos_etapa(len(faixa), perfis.get(etapa))
+    fracao_acumulada = np.cumsum(pesos, axis=1)
+
+    # (etapas x semanas x famílias); peças acumuladas arredondadas fecham no total de cada família
+    vol_acumulado = fracao_acumulada[:, :, None] * volumes[None, None, :]
+    pecas_acumuladas = np.round(fracao_acumulada[:, :, None] * quantidades[None, None, :])
+
+    resumo = pd.DataFrame({
+        'Semana': calendario['Semana'].to_numpy(),
+        'Semana Display': calendario['Semana_Display'].to_numpy(),
+    })
+    for i, (etapa, _, _, _) in enumerate(ETAPAS_PLANEJADOR):
+        resumo[f'{etapa} (Vol)'] = vol_acumulado[i].sum(axis=1)
+    for i, (etapa, _, _, _) in enumerate(ETAPAS_PLANEJADOR):
+        resumo[f'{etapa} (Pçs)'] = pecas_acumuladas[i].sum(axis=1).astype(np.int64)
+
+    n_etapas, n_semanas, n_familias = vol_acumulado.shape
+    nomes_etapas = np.array([etapa for etapa, _, _, _ in ETAPAS_PLANEJADOR], dtype=object)
+    df_familias_plan = pd.DataFrame({
+        'Semana': np.tile(np.repeat(resumo['Semana'].to_numpy(), n_familias), n_etapas),
+        'Semana Display': np.tile(np.repeat(resumo['Semana Display'].to_numpy(), n_familias), n_etapas),
+        'Etapa': np.repeat(nomes_etapas, n_semanas * n_familias),
+        'Familia': np.tile(familias, n_etapas * n_semanas),
+        'Volume Acumulado': vol_acumulado.reshape(-1),
+        'Peças Acumuladas': pecas_acumuladas.reshape(-1).astype(np.int64),
+    })
+    return {'resumo': resumo, 'familias': df_familias_plan}
+
+# ========================================================
+# SIMULAÇÃO MONTE CARLO (DURAÇÕES HISTÓRICAS)
+# ========================================================
+# Cada cenário sorteia uma obra histórica inteira (bootstrap por obra), o que mantém
+# a correlação entre as etapas: obra que demora no projeto costuma demorar em tudo.
+COLUNAS_DURACAO = ['dias_duracao_proj', 'dias_lag_fab', 'dias_duracao_fab', 'dias_lag_mont', 'dias_duracao_mont']
+PERCENTIS_SIMULACAO = (50, 80, 95)
+CENARIOS_PADRAO = 10_000
+
+def sortear_cenarios(df_duracoes, n_cenarios=CENARIOS_PADRAO, semente=None):
+    """(n_cenarios x 5) durações/defasagens em dias, na ordem de COLUNAS_DURACAO (None sem histórico)."""
+    historico = df_duracoes[COLUNAS_DURACAO].dropna().to_numpy(dtype=np.int64)
+    if len(historico) == 0:
+        return None
+    rng = np.random.default_rng(semente)
+    return historico[rng.integers(len(historico), size=n_cenarios)]
+
+def dias_das_etapas(cenarios):
+    # (n_cenarios x 6) dias desde o início: ini/fim de projeto, fabricação e montagem
+    dur_p, lag_f, dur_f, lag_m, dur_m = cenarios.T
+    zeros = np.zeros_like(dur_p)
+    return np.column_stack([zeros, dur_p, lag_f, lag_f + dur_f, lag_m, lag_m + dur_m])
+
+def fracao_acumulada_cenarios(ids, ini_ids, fim_ids, perfil=None):
+    """(n_cenarios x semanas) fração acumulada da etapa em cada semana de ids.
+
+    Mesma regra de pesos_etapa: na k-ésima de n semanas a fração é k/n (linear)
+    ou a curva acumulada do perfil em k/n. Etapa sem semanas fica em zero.
+    """
+    n = fim_ids - ini_ids + 1
+    posicao = (ids[None, :] - ini_ids[:, None] + 1) / np.maximum(n, 1)[:, None]
+    x = np.clip(posicao, 0.0, 1.0)
+    if perfil is not None and np.sum(perfil) > 0:
+        acumulado = np.concatenate(([0.0], np.cumsum(perfil) / np.sum(perfil)))
+        x = np.interp(x, np.linspace(0, 1, len(perfil) + 1), acumulado)
+    return np.where(n[:, None] > 0, x, 0.0)
+
+def simular_cronograma(df_duracoes, data_inicio, total_vol, n_cenarios=CENARIOS_PADRAO, perfis=None, semente=None):
+    """Simula n_cenarios cronogramas e devolve percentis de datas e faixas de volume acumulado.
+
+    'datas': término de cada etapa (e da obra) em P50/P80/P95, ou seja, a data
+    até a qual 50/80/95% dos cenários terminaram. 'faixas': volume acumulado
+    por semana e etapa garantido em 50/80/95% dos cenários (percentis 50/20/5
+    do volume). Devolve None se não houver obra histórica completa.
+    """
+    cenarios = sortear_cenarios(df_duracoes, n_cenarios, semente)
+    if cenarios is None:
+        return None
+    perfis = perfis or {}
+    inicio = pd.to_datetime(data_inicio).normalize()
+    dia_inicio = (np.datetime64(inicio, 'D') - EPOCA_SEMANAS).astype(np.int64)
+    dias = dias_das_etapas(cenarios)
+    semanas = (dia_inicio + dias) // 7
+
+    # Datas de término: percentis direto dos dias sorteados (sempre uma data que ocorreu)
+    terminos = {etapa: dias[:, 2 * i + 1] for i, (etapa, _, _, _) in enumerate(ETAPAS_PLANEJADOR)}
+    terminos['Obra'] = dias[:, 1::2].max(axis=1)
+    df_datas = pd.DataFrame([
+        {'Etapa': etapa, **{
+            f'P{p}': inicio + pd.Timedelta(days=int(d))
+            for p, d in zip(PERCENTIS_SIMULACAO, np.percentile(dias_fim, PERCENTIS_SIMULACAO, method='inverted_cdf'))
+        }}
+        for etapa, dias_fim in terminos.items()
+    ])
+
+    # Faixas de volume: grade de semanas do primeiro início ao último término sorteado
+    calendario = calendario_entre(semanas.min(), semanas.max())
+    ids = calendario['Semana_Id'].to_numpy()
+    faixas = pd.DataFrame({
+        'Semana': calendario['Semana'].to_numpy(),
+        'Semana Display': calendario['Semana_Display'].to_numpy(),
+    })
+    quantis_volume = [1 - p / 100 for p in PERCENTIS_SIMULACAO]
+    for i, (etapa, _, _, _) in enumerate(ETAPAS_PLANEJADOR):
+        fracao = fracao_acumulada_cenarios(ids, semanas[:, 2 * i], semanas[:, 2 * i + 1], perfis.get(etapa))
+        for p, q in zip(PERCENTIS_SIMULACAO, np.quantile(fracao, quantis_volume, axis=0)):
+            faixas[f'{etapa} P{p}'] = q * total_vol
+    return {'datas': df_datas, 'faixas': faixas, 'obras_historicas': len(df_duracoes[COLUNAS_DURACAO].dropna())}
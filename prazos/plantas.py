@@ -0,0 +1,217 @@
+"""Várias plantas (um schema ou servidor plannix cada): leitura em paralelo, reserva por planta e consolidação.
+
+Com `[[plantas]]` no secrets, cada carregador roda a mesma consulta em todas as
+plantas ao mesmo tempo, qualifica as obras com a planta ("Planta · Obra") e junta
+tudo nos mesmos frames de uma fonte só. Uma planta que falhar ou passar do prazo
+entra com a última leitura boa dela (memória ou disco), então a carga consolidada
+leva o tempo da planta mais lenta (limitado pelo prazo), não a soma.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado
+from pathlib import Path
+
+import pandas as pd
+
+from .banco import url_banco
+from .disco import gravar_grupo, ler_grupo
+
+CHAVES_CONEXAO = ('db_host', 'db_user', 'db_password', 'db_name')
+MAX_RESERVAS = 16  # leituras boas guardadas por planta (as da janela variam com os filtros)
+LEITURAS_POR_PLANTA = 4  # leituras simultâneas numa planta; as travadas não ocupam mais que isso
+SEPARADOR_PLANTA = " · "
+
+# ========================================================
+#          CONFIGURAÇÃO (SECRETS)
+# ========================================================
+def ler_config_plantas(segredos):
+    """Plantas de `[[plantas]]` no secrets; lista vazia = uma fonte só (o plannix do banco do app).
+
+    Cada planta tem `nome` e, opcionalmente, `esquema`/`tabela` (padrão `plannix-db`.`plannix`)
+    e as chaves db_* do seu servidor; as que faltarem vêm do banco do app.
+    """
+    plantas = []
+    for config in segredos.get('plantas', []):
+        plantas.append({
+            'nome': config['nome'],
+            'url': url_banco({chave: config.get(chave, segredos[chave]) for chave in CHAVES_CONEXAO}),
+            'tabela': f"`{config.get('esquema', 'plannix-db')}`.`{config.get('tabela', 'plannix')}`",
+        })
+    nomes = [planta['nome'] for planta in plantas]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError(f"Nomes de planta repetidos em [[plantas]]: {nomes}")
+    return plantas
+
+def nova_planta(config, engine):
+    return {
+        **config, 'engine': engine,
+        'reservas': OrderedDict(),  # grupo -> (frames, versao) da última leitura boa
+        'situacao': {},             # grupo -> como entrou na última carga (origem, versão, erro, segundos)
+        'lock': threading.Lock(),
+        # Pool da planta, reaproveitado em todas as cargas
+        'pool': ThreadPoolExecutor(max_workers=LEITURAS_POR_PLANTA, thread_name_prefix=f"planta-{config['nome']}"),
+    }
+
+def pasta_planta(pasta, planta):
+    # Subpasta própria: a limpeza de versões antigas de gravar_grupo é por prefixo do grupo
+    return Path(pasta) / "plantas" / re.sub(r'\W+', '_', planta['nome']).strip('_').lower()
+
+# ========================================================
+#          LEITURA EM PARALELO COM RESERVA
+# ========================================================
+def guardar_reserva(planta, grupo, frames, versao, pasta=None):
+    with planta['lock']:
+        planta['reservas'][grupo] = (frames, versao)
+        planta['reservas'].move_to_end(grupo)
+        while len(planta['reservas']) > MAX_RESERVAS:
+            planta['reservas'].popitem(last=False)
+    if pasta:
+        try:
+            gravar_grupo(pasta_planta(pasta, planta), grupo, frames, versao)
+        except OSError:
+            pass
+
+def obter_reserva(planta, grupo, pasta=None):
+    """Última leitura boa da planta para o grupo: da memória, senão do disco; None se não houver."""
+    with planta['lock']:
+        reserva = planta['reservas'].get(grupo)
+    if reserva is None and pasta:
+        reserva = ler_grupo(pasta_planta(pasta, planta), grupo)
+        if reserva is not None:
+            with planta['lock']:
+                planta['reservas'].setdefault(grupo, reserva)
+    return reserva
+
+def ler_planta(planta, grupo, ler, pasta=None):
+    # Roda na thread do pool; termina e guarda a reserva mesmo depois do prazo da carga
+    inicio = time.perf_counter()
+    frames = ler(planta)
+    versao = pd.Timestamp.now().isoformat()
+    guardar_reserva(planta, grupo, frames, versao, pasta)
+    return frames, versao, time.perf_counter() - inicio
+
+def ler_todas(plantas, grupo, ler, prazo=None, pasta=None, limite=None):
+    """Roda ler(planta) -> {nome: DataFrame} em todas as plantas ao mesmo tempo.
+
+    Devolve [(planta, frames)] das plantas com dados. Uma planta que falhar, ou
+    que passar de `prazo` segundos tendo reserva, entra com a última leitura boa;
+    a leitura lenta continua em segundo plano (no pool da planta) e renova a
+    reserva para a próxima carga. Sem reserva, a planta lenta é esperada até
+    `limite` segundos e depois fica de fora, como a que falhou.
+    `pasta` guarda as reservas também em disco (só para grupos sem parâmetros).
+    A situação de cada planta fica em planta['situacao'][grupo].
+    """
+    futuros = [(planta, planta['pool'].submit(ler_planta, planta, grupo, ler, pasta)) for planta in plantas]
+    inicio = time.monotonic()
+    restante = lambda segundos: None if segundos is None else max(0.0, inicio + segundos - time.monotonic())
+
+    resultados, erros = [], []
+    for planta, futuro in futuros:
+        reserva = obter_reserva(planta, grupo, pasta)
+        esperar = limite if reserva is None else prazo
+        try:
+            frames, versao, segundos = futuro.result(timeout=restante(esperar))
+            situacao = {'origem': 'banco', 'versao': versao, 'erro': None, 'segundos': segundos}
+        except TempoEsgotado:
+            erro = f"sem resposta em {esperar:g} s"
+            if reserva is None:
+                erros.append(TempoEsgotado(f"{planta['nome']}: {erro}"))
+                frames, versao = None, None
+                situacao = {'origem': 'indisponível', 'versao': None, 'erro': erro, 'segundos': None}
+            else:
+                frames, versao = reserva
+                situacao = {'origem': 'reserva', 'versao': versao, 'erro': erro, 'segundos': esperar}
+        except Exception as e:
+            erros.append(e)
+            if reserva is None:
+                frames, versao = None, None
+                situacao = {'origem': 'indisponível', 'versao': None, 'erro': str(e), 'segundos': None}
+            else:
+                frames, versao = reserva
+                situacao = {'origem': 'reserva', 'versao': versao, 'erro': str(e), 'segundos': None}
+        with planta['lock']:
+            planta['situacao'][grupo] = situacao
+        if frames is not None:
+            resultados.append((planta, frames))
+
+    if not resultados:
+        raise erros[0]
+    return resultados
+
+def situacao_plantas(plantas, grupos):
+    """Uma linha por planta com a pior situação entre os grupos (para o aviso na tela)."""
+    linhas = []
+    for planta in plantas:
+        with planta['lock']:
+            situacoes = [planta['situacao'][g] for g in grupos if g in planta['situacao']]
+        if situacoes:
+            pior = max(situacoes, key=lambda s: s['origem'] != 'banco')
+            linhas.append({'Planta': planta['nome'], 'Origem': pior['origem'], 'Versão': pior['versao'], 'Erro': pior['erro']})
+    return pd.DataFrame(linhas, columns=['Planta', 'Origem', 'Versão', 'Erro'])
+
+# ========================================================
+#          CONSOLIDAÇÃO (MESMOS FRAMES DE UMA FONTE SÓ)
+# ========================================================
+# Obras de plantas diferentes nunca se somam, mesmo com o mesmo nome: cada
+# planta já chega unificada pelos carregadores e suas obras viram "Planta · Obra",
+# então o resto do app (filtros, orçamentos, planejador) segue chaveado só por Obra.
+def nome_na_planta(planta, obra):
+    return f"{planta['nome']}{SEPARADOR_PLANTA}{obra}"
+
+def obras_da_planta(planta, obras):
+    # Nomes qualificados -> nomes no plannix da planta (as obras das outras plantas ficam de fora)
+    prefixo = nome_na_planta(planta, "")
+    return [obra[len(prefixo):] for obra in obras if obra.startswith(prefixo)]
+
+def herdar_nomes_sem_planta(plantas, df_salvo, chaves):
+    """Orçamentos/previsões salvos pelo nome sem planta (antes de [[plantas]]) valem para "Planta · Obra".
+
+    A linha qualificada, quando existe, prevalece coluna a coluna; o que ela não
+    tiver (o salvamento de previsões grava só as colunas editadas) vem da antiga.
+    """
+    if df_salvo.empty:
+        return df_salvo
+    prefixos = tuple(nome_na_planta(planta, "") for planta in plantas)
+    sem_planta = df_salvo[~df_salvo['Obra'].astype(str).str.startswith(prefixos)]
+    if sem_planta.empty:
+        return df_salvo
+    herdadas = pd.concat(
+        [sem_planta.assign(Obra=prefixo + sem_planta['Obra'].astype(str)) for prefixo in prefixos], ignore_index=True,
+    )
+    combinado = df_salvo.set_index(chaves).combine_first(herdadas.set_index(chaves))
+    return combinado.reset_index()[df_salvo.columns]
+
+def empilhar(resultados, nome):
+    partes = []
+    for planta, frames in resultados:
+        df = frames[nome]
+        partes.append(df.assign(Obra=nome_na_planta(planta, "") + df['Obra'].astype(str), Planta=planta['nome']))
+    return pd.concat(partes, ignore_index=True)
+
+def juntar_semanal(resultados, nome='semanal'):
+    df = empilhar(resultados, nome).drop(columns='Planta')
+    return df.sort_values(['Obra', 'Semana'], ignore_index=True)
+
+def juntar_gerais(resultados):
+    # Planta fica como coluna: a Tabela Geral mostra de onde vem cada obra
+    return empilhar(resultados, 'gerais').sort_values('Obra', ignore_index=True)
+
+def juntar_familias(resultados):
+    return empilhar(resultados, 'familias').drop(columns='Planta').sort_values(['Obra', 'Familia'], ignore_index=True)
+
+def juntar_marcos(resultados):
+    # Pelo nome original de cada planta, como montar_marcos/ler_marcos
+    return empilhar(resultados, 'marcos').drop(columns='Planta').sort_values('Obra', ignore_index=True)
+
+def juntar_catalogo(resultados):
+    return empilhar(resultados, 'catalogo').drop(columns='Planta').sort_values('Obra', ignore_index=True)
+
+def juntar_snapshot(resultados):
+    return {
+        'semanal': juntar_semanal(resultados),
+        'gerais': juntar_gerais(resultados),
+        'familias': juntar_familias(resultados),
+        'marcos': juntar_marcos(resultados),
+    }
@@ -0,0 +1,234 @@
+"""Rollup semanal do plannix no banco (obra x semana, totais e famílias por obra) e o job que o mantém.
+
+Uso (cron, fora do Streamlit):
+    python -m prazos.rollup               # incremental (ou completa, se já passou do intervalo)
+    python -m prazos.rollup --completa    # reconstrói tudo
+"""
+import argparse
+import datetime
+import tomllib
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Integer, String, Double, Date, DateTime, select, text
+
+from .banco import url_banco, criar_engine, montar_uniao_semanal, ler_watermark, TABELA_PLANNIX
+from .dados import unificar_obras, unificar_gerais
+
+# ========================================================
+#          TABELAS DO ROLLUP (NO BANCO DO APP)
+# ========================================================
+metadata_rollup = MetaData()
+
+# Chaves pelo nome original do plannix: a unificação de obras é feita na leitura
+tabela_rollup_semanal = Table(
+    'plannix_semanal', metadata_rollup,
+    Column('Obra', String(255), primary_key=True),
+    Column('Semana', Date, primary_key=True),
+    Column('Volume_Projetado', Double),
+    Column('Volume_Fabricado', Double),
+    Column('Volume_Montado', Double),
+)
+
+tabela_rollup_totais = Table(
+    'plannix_totais', metadata_rollup,
+    Column('Obra', String(255), primary_key=True),
+    Column('Projetado', Double),
+    Column('Fabricado', Double),
+    Column('Acabado', Double),
+    Column('Expedido', Double),
+    Column('Montado', Double),
+    Column('Taxa_Aco', Double),
+)
+
+tabela_rollup_familias = Table(
+    'plannix_familias', metadata_rollup,
+    Column('Obra', String(255), primary_key=True),
+    Column('Familia', String(255), primary_key=True),
+    Column('unidade', Integer),
+    Column('Volume', Double),
+)
+
+tabela_rollup_controle = Table(
+    'plannix_rollup_controle', metadata_rollup,
+    Column('id', Integer, primary_key=True, autoincrement=False),
+    Column('watermark', DateTime),
+    Column('ultima_completa', DateTime),
+)
+
+def garantir_tabelas_rollup(engine):
+    metadata_rollup.create_all(engine, checkfirst=True)
+
+# ========================================================
+#          SQL DE MANUTENÇÃO (TUDO RODA NO SERVIDOR)
+# ========================================================
+COLUNAS_SEMANAL = "Obra, Semana, Volume_Projetado, Volume_Fabricado, Volume_Montado"
+SEMANA_DA_DATA = "CAST(DATE_SUB({data}, INTERVAL WEEKDAY({data}) DAY) AS DATE)"
+
+# Peças alteradas: >= o watermark, porque as gravadas no mesmo segundo da última
+# leitura ficariam de fora com >; reprocessá-las de novo não muda o resultado.
+def cte_semanas_tocadas(tabela=TABELA_PLANNIX):
+    # (obra, semana) de cada data das peças alteradas desde o último watermark
+    ramos = "\n                UNION ALL ".join(
+        f"SELECT nomeObra, {col_data} AS d FROM {tabela} WHERE {{alteracao}} >= %(watermark)s"
+        for col_data in ("data_Projeto", "data_Acabamento", "dataMontada")
+    )
+    return f"""Tocadas AS (
+            SELECT DISTINCT nomeObra AS Obra, {SEMANA_DA_DATA.format(data='d')} AS Semana
+            FROM ({ramos}) alteradas
+            WHERE d IS NOT NULL AND nomeObra IS NOT NULL
+        )"""
+
+def sql_inserir_semanal(incremental, tabela=TABELA_PLANNIX):
+    filtro = "nomeObra IS NOT NULL"
+    ctes = []
+    if incremental:
+        filtro += f" AND (nomeObra, {SEMANA_DA_DATA}) IN (SELECT Obra, Semana FROM Tocadas)"
+        ctes.append(cte_semanas_tocadas(tabela))
+    ctes.append(f"AllData AS ({montar_uniao_semanal(filtro, tabela)}\n        )")
+    return f"""
+        INSERT INTO {tabela_rollup_semanal.name} ({COLUNAS_SEMANAL})
+        WITH {", ".join(ctes)}
+        SELECT
+            Obra, Semana_Inicio,
+            SUM(Volume_Projetado), SUM(Volume_Fabricado), SUM(Volume_Montado)
+        FROM AllData
+        GROUP BY Obra, Semana_Inicio
+    """
+
+def sql_apagar_semanas_tocadas(tabela=TABELA_PLANNIX):
+    return f"""
+        WITH {cte_semanas_tocadas(tabela)}
+        DELETE r FROM {tabela_rollup_semanal.name} r
+        JOIN Tocadas t ON r.Obra = t.Obra AND r.Semana = t.Semana
+    """
+
+def sql_inserir_totais(incremental, tabela=TABELA_PLANNIX):
+    where = "nomeObra IS NOT NULL"
+    if incremental:
+        where += f" AND nomeObra IN (SELECT nomeObra FROM {tabela} WHERE {{alteracao}} >= %(watermark)s)"
+    return f"""
+        INSERT INTO {tabela_rollup_totais.name} (Obra, Projetado, Fabricado, Acabado, Expedido, Montado, Taxa_Aco)
+        SELECT
+            nomeObra,
+            SUM(volumeProjetado), SUM(volumeFabricado), SUM(volumeAcabado),
+            SUM(volumeExpedido), SUM(volumeMontado), AVG(peso_frouxo_por_volume)
+        FROM {tabela}
+        WHERE {where}
+        GROUP BY nomeObra
+    """
+
+def sql_inserir_familias(incremental, tabela=TABELA_PLANNIX):
+    # Mesmo agrupamento de QUERY_FAMILIAS (prazos.banco), gravado por nome original
+    where = "nomeObra IS NOT NULL AND familia IS NOT NULL AND nomePeca IS NOT NULL AND volumeReal IS NOT NULL"
+    if incremental:
+        where += f" AND nomeObra IN (SELECT nomeObra FROM {tabela} WHERE {{alteracao}} >= %(watermark)s)"
+    return f"""
+        INSERT INTO {tabela_rollup_familias.name} (Obra, Familia, unidade, Volume)
+        SELECT nomeObra, familia, COUNT(*), SUM(volumeReal)
+        FROM {tabela}
+        WHERE {where}
+        GROUP BY nomeObra, familia
+    """
+
+def sql_apagar_alterados(tabela_rollup, tabela=TABELA_PLANNIX):
+    # Linhas por obra (totais, famílias) das obras com peças alteradas
+    return f"""
+        DELETE FROM {tabela_rollup.name}
+        WHERE Obra IN (SELECT nomeObra FROM {tabela} WHERE {{alteracao}} >= %(watermark)s)
+    """
+
+# ========================================================
+#          JOB DE ATUALIZAÇÃO (COMPLETA / INCREMENTAL)
+# ========================================================
+def atualizar_rollup(engine, coluna_alteracao=None, intervalo_carga_completa=pd.Timedelta(hours=6),
+                     completa=False, agora=None, tabela=TABELA_PLANNIX):
+    """Atualiza o rollup e devolve um resumo {'modo', 'semanas', 'obras'}.
+
+    Incremental: só as semanas tocadas por peças alteradas desde o último
+    watermark são apagadas e recalculadas (e os totais e famílias dessas obras). Peças
+    excluídas ou com data movida para uma semana não tocada só saem na carga
+    completa, que roda sem coluna de alteração ou a cada intervalo_carga_completa.
+    """
+    agora = agora or datetime.datetime.now()
+    garantir_tabelas_rollup(engine)
+
+    with engine.begin() as conn:
+        controle = conn.execute(
+            select(tabela_rollup_controle).where(tabela_rollup_controle.c.id == 1)
+        ).mappings().first()
+        novo_watermark = ler_watermark(conn, coluna_alteracao, tabela) if coluna_alteracao else None
+
+        completa = (
+            completa
+            or not coluna_alteracao
+            or controle is None
+            or controle['watermark'] is None
+            or controle['ultima_completa'] is None
+            or agora - controle['ultima_completa'] >= intervalo_carga_completa
+        )
+
+        if completa:
+            conn.execute(tabela_rollup_semanal.delete())
+            conn.execute(tabela_rollup_totais.delete())
+            conn.execute(tabela_rollup_familias.delete())
+            semanas = conn.exec_driver_sql(sql_inserir_semanal(False, tabela)).rowcount
+            obras = conn.exec_driver_sql(sql_inserir_totais(False, tabela)).rowcount
+            conn.exec_driver_sql(sql_inserir_familias(False, tabela))
+            ultima_completa = agora
+        else:
+            params = {'watermark': controle['watermark']}
+            formatar = lambda sql: sql.replace("{alteracao}", coluna_alteracao)
+            conn.exec_driver_sql(formatar(sql_apagar_semanas_tocadas(tabela)), params)
+            semanas = conn.exec_driver_sql(formatar(sql_inserir_semanal(True, tabela)), params).rowcount
+            conn.exec_driver_sql(formatar(sql_apagar_alterados(tabela_rollup_totais, tabela)), params)
+            obras = conn.exec_driver_sql(formatar(sql_inserir_totais(True, tabela)), params).rowcount
+            conn.exec_driver_sql(formatar(sql_apagar_alterados(tabela_rollup_familias, tabela)), params)
+            conn.exec_driver_sql(formatar(sql_inserir_familias(True, tabela)), params)
+            ultima_completa = controle['ultima_completa']
+
+        valores = {'watermark': novo_watermark, 'ultima_completa': ultima_completa}
+        if controle is None:
+            conn.execute(tabela_rollup_controle.insert().values(id=1, **valores))
+        else:
+            conn.execute(tabela_rollup_controle.update().where(tabela_rollup_controle.c.id == 1).values(**valores))
+
+    return {'modo': 'completa' if completa else 'incremental', 'semanas': semanas, 'obras': obras}
+
+# ========================================================
+#          LEITURA PELO APP (O(OBRAS x SEMANAS))
+# ========================================================
+def ler_semanal_rollup(conn):
+    df = pd.read_sql_query(text(f"SELECT {COLUNAS_SEMANAL} FROM {tabela_rollup_semanal.name}"), conn)
+    cols_vol = ['Volume_Projetado', 'Volume_Fabricado', 'Volume_Montado']
+    df['Semana'] = pd.to_datetime(df['Semana'])
+    df = unificar_obras(df)
+    return df.groupby(['Obra', 'Semana'], as_index=False)[cols_vol].sum()
+
+def ler_gerais_rollup(conn):
+    df = pd.read_sql_query(text(f"SELECT * FROM {tabela_rollup_totais.name}"), conn)
+    return unificar_gerais(df.rename(columns={'Taxa_Aco': 'Taxa de Aço'}))
+
+def ler_familias_rollup(conn):
+    df = pd.read_sql_query(text(f"SELECT * FROM {tabela_rollup_familias.name}"), conn)
+    df = unificar_obras(df)
+    return df.groupby(['Obra', 'Familia'], as_index=False)[['unidade', 'Volume']].sum()
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza o rollup semanal do plannix.")
+    parser.add_argument("--completa", action="store_true", help="reconstrói o rollup inteiro")
+    parser.add_argument("--segredos", default=".streamlit/secrets.toml", help="arquivo com as credenciais do banco")
+    args = parser.parse_args()
+
+    with open(args.segredos, "rb") as f:
+        segredos = tomllib.load(f)
+    engine = criar_engine(url_banco(segredos))
+    resumo = atualizar_rollup(
+        engine,
+        coluna_alteracao=segredos.get("plannix_coluna_alteracao"),
+        intervalo_carga_completa=pd.Timedelta(hours=segredos.get("horas_carga_completa", 6)),
+        completa=args.completa,
+    )
+    print(f"Rollup {resumo['modo']}: {resumo['semanas']} semanas e {resumo['obras']} obras gravadas.")
+
+if __name__ == "__main__":
+    main()